@@ -1,9 +1,12 @@
 # audio_manager_cp.py
+# audiomixer audio backend for the engine model (the interface is listed in engine_core.py).
 import audiocore
 import audiomixer
-import time
 # import os # Not strictly needed if paths are directly from config
 import config_cp as config 
+from ringlog_cp import log
+from fixedpoint_cp import ticks_ms, ticks_diff, ms
+from voice_pool import VoicePool
 
 class AudioManagerCP:
     def __init__(self, audio_output):
@@ -21,21 +24,26 @@ class AudioManagerCP:
 
         self.engine_voice_idx1 = config.ENGINE_LOOP_VOICE_1
         self.engine_voice_idx2 = config.ENGINE_LOOP_VOICE_2
-        self.sfx_startshut_voice_idx = config.SFX_STARTSHUT_VOICE
-        self.sfx_accel_voice_idx = config.SFX_ACCEL_VOICE
-        self.sfx_decel_voice_idx = config.SFX_DECEL_VOICE
+        engine_voices = (self.engine_voice_idx1, self.engine_voice_idx2)
+        self.sfx_voices = VoicePool([i for i in range(config.NUM_MIXER_VOICES) if i not in engine_voices],
+                                    config.VOICE_CATEGORIES, self._voice_busy)
 
         self.active_engine_voice_idx = self.engine_voice_idx1
         self.inactive_engine_voice_idx = self.engine_voice_idx2
 
         self.current_loop_sound_key = None
         self.is_crossfading = False
-        self.crossfade_start_time = 0
+        self.crossfade_start_time = 0 # ticks_ms
+        self.crossfade_duration_ms = ms(config.CROSSFADE_DURATION_S)
+        self.crossfade_started = None # Optional event set on each new fade, for tasks_cp's ramp task
         self.crossfade_from_sound_key = None
         self.crossfade_to_sound_key = None
 
-        self.last_pop_time = 0 # Uses time.monotonic()
-        self.last_accel_burst_time = 0 # Uses time.monotonic()
+        # ticks_ms of the last play; None until the first, since any tick value can be "now"
+        self.last_pop_time = None
+        self.last_accel_burst_time = None
+        self.accel_burst_cooldown_ms = ms(config.ACCEL_BURST_COOLDOWN_S)
+        self.decel_pop_cooldown_ms = ms(config.DECEL_POP_COOLDOWN_S)
         
         self.load_sounds()
         print("AUDIO_MAN_CP: AudioManagerCP initialized.")
@@ -48,51 +56,53 @@ class AudioManagerCP:
                 self.sounds[key] = wave_file
                 # print(f"AUDIO_MAN_CP: Loaded: {key} (Rate: {wave_file.sample_rate}, Ch: {wave_file.channel_count})")
                 if wave_file.sample_rate != config.AUDIO_SAMPLE_RATE:
-                    print(f"AUDIO_MAN_CP: WARNING - Rate mismatch for {key}! Mixer: {config.AUDIO_SAMPLE_RATE}, File: {wave_file.sample_rate}.")
+                    log.warning_limited("AUDIO_MAN_CP", "Rate mismatch for {}! Mixer: {}, File: {}.", key, config.AUDIO_SAMPLE_RATE, wave_file.sample_rate)
                 if wave_file.channel_count > 1 and self.mixer.channel_count == 1:
-                     print(f"AUDIO_MAN_CP: WARNING - {key} is stereo but mixer is mono.")
+                     log.warning_limited("AUDIO_MAN_CP", "{} is stereo but mixer is mono.", key)
             except OSError as e:
-                print(f"AUDIO_MAN_CP: Error loading sound {key} from {path}: {e}")
+                log.error("AUDIO_MAN_CP", "Could not load sound {} from {}: {}", key, path, e)
             except Exception as e:
-                print(f"AUDIO_MAN_CP: Generic error loading {key}: {e}")
+                log.error("AUDIO_MAN_CP", "Generic error loading {}: {}", key, e)
         print("AUDIO_MAN_CP: Sound loading complete.")
 
     def get_sound(self, key):
         if key is None: return None
         return self.sounds.get(key)
 
-    def play_sfx(self, key, voice_idx, volume_multiplier=1.0, loop=False):
+    def _voice_busy(self, voice_idx):
+        return self.mixer.voice[voice_idx].playing
+
+    def play_sfx(self, key, category, volume_multiplier=1.0, loop=False):
+        # One-shot on a pooled voice (config.VOICE_CATEGORIES); False if none was free or stealable
         sound = self.get_sound(key)
-        if sound:
-            if self.mixer.voice[voice_idx].playing and not loop: # Allow interrupting if it's a loop (though SFX rarely loop)
-                # print(f"AUDIO_MAN_CP: SFX Voice {voice_idx} busy with non-loop, '{key}' not played.")
-                return False 
-
-            # print(f"AUDIO_MAN_CP: ---> SFX PLAYING: '{key}' on voice {voice_idx}")
-            self.mixer.voice[voice_idx].level = config.SFX_VOLUME * volume_multiplier
-            self.mixer.play(sound, voice=voice_idx, loop=loop)
-            return True
-        # print(f"AUDIO_MAN_CP: SFX sound '{key}' not found.")
-        return False
+        if not sound: return False
+        level = config.SFX_VOLUME * volume_multiplier
+        voice_idx = self.sfx_voices.acquire(category, level)
+        if voice_idx is None: return False
+        self.mixer.voice[voice_idx].level = level
+        self.mixer.play(sound, voice=voice_idx, loop=loop)
+        return True
+
+    def play_engine_sfx(self, key):
+        # Starter / shutdown one-shot
+        return self.play_sfx(key, "engine_sfx")
 
     def play_accel_burst(self):
         if not config.ENABLE_ACCEL_BURST: return False
-        current_time = time.monotonic()
-        # Use ACCEL_BURST_COOLDOWN_S from config
-        if current_time - self.last_accel_burst_time > config.ACCEL_BURST_COOLDOWN_S:
+        current_time = ticks_ms()
+        if self.last_accel_burst_time is None or ticks_diff(current_time, self.last_accel_burst_time) > self.accel_burst_cooldown_ms:
             vol = config.SFX_VOLUME * config.ACCEL_BURST_SFX_VOLUME_MULTIPLIER
-            if self.play_sfx("accel_burst", self.sfx_accel_voice_idx, volume_multiplier=min(1.0, vol)):
+            if self.play_sfx("accel_burst", "accel_burst", volume_multiplier=min(1.0, vol)):
                 self.last_accel_burst_time = current_time
                 return True
         return False
 
     def play_decel_pop(self):
         if not config.ENABLE_DECEL_POPS: return False
-        current_time = time.monotonic()
-        # Use DECEL_POP_COOLDOWN_S from config
-        if current_time - self.last_pop_time > config.DECEL_POP_COOLDOWN_S:
+        current_time = ticks_ms()
+        if self.last_pop_time is None or ticks_diff(current_time, self.last_pop_time) > self.decel_pop_cooldown_ms:
             vol = config.SFX_VOLUME * config.DECEL_POP_SFX_VOLUME_MULTIPLIER
-            if self.play_sfx("decel_pop", self.sfx_decel_voice_idx, volume_multiplier=min(1.0, vol)):
+            if self.play_sfx("decel_pop", "decel_pop", volume_multiplier=min(1.0, vol)):
                 self.last_pop_time = current_time
                 return True
         return False
@@ -132,7 +142,8 @@ class AudioManagerCP:
             return 
 
         self.is_crossfading = True
-        self.crossfade_start_time = time.monotonic()
+        self.crossfade_start_time = ticks_ms()
+        if self.crossfade_started is not None: self.crossfade_started.set()
         self.crossfade_from_sound_key = from_sound_key_for_fade
         self.crossfade_to_sound_key = new_sound_key
 
@@ -155,8 +166,8 @@ class AudioManagerCP:
     def _handle_crossfade(self):
         if not self.is_crossfading: return
 
-        elapsed_time = time.monotonic() - self.crossfade_start_time
-        progress = min(elapsed_time / config.CROSSFADE_DURATION_S, 1.0)
+        elapsed_ms = ticks_diff(ticks_ms(), self.crossfade_start_time)
+        progress = min(elapsed_ms / self.crossfade_duration_ms, 1.0) # Float: it becomes a voice level
 
         vol_to = config.MAIN_ENGINE_VOLUME * progress
         vol_from = config.MAIN_ENGINE_VOLUME * (1.0 - progress)
@@ -211,6 +222,7 @@ class AudioManagerCP:
     def stop_all_sounds(self):
         for i in range(self.mixer.voice_count): # Use mixer's voice_count
             self.mixer.stop(voice=i)
+        self.sfx_voices.release_all()
         self.current_loop_sound_key = None
         self.is_crossfading = False
 
@@ -225,8 +237,11 @@ class AudioManagerCP:
         if self.is_crossfading:
             self._handle_crossfade()
 
-    def is_sfx_starter_shutdown_busy(self):
-        return self.mixer.voice[self.sfx_startshut_voice_idx].playing
+    def prewarm_engine_layers(self):
+        pass # Two crossfade voices only; nothing to start ahead of time
+
+    def is_engine_sfx_busy(self):
+        return self.sfx_voices.holds("engine_sfx")
 
     def is_any_engine_sound_playing(self, ignore_sfx=False):
         e1_playing = self.mixer.voice[self.engine_voice_idx1].playing
@@ -235,8 +250,4 @@ class AudioManagerCP:
         if ignore_sfx:
             return e1_playing or e2_playing or self.is_crossfading
 
-        sfx_ss_busy = self.mixer.voice[self.sfx_startshut_voice_idx].playing
-        sfx_accel_busy = self.mixer.voice[self.sfx_accel_voice_idx].playing
-        sfx_decel_busy = self.mixer.voice[self.sfx_decel_voice_idx].playing
-        
-        return e1_playing or e2_playing or self.is_crossfading or sfx_ss_busy or sfx_accel_busy or sfx_decel_busy
\ No newline at end of file
+        return e1_playing or e2_playing or self.is_crossfading or self.sfx_voices.any_busy()
\ No newline at end of file
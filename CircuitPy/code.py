@@ -6,10 +6,14 @@ import busio
 import sdcardio
 import storage
 import audiobusio 
+import asyncio
 
 import config_cp as config
 from audio_manager_cp import AudioManagerCP
 from engine_simulator_cp import EngineSimulatorCP, EngineState 
+from ringlog_cp import log
+from loop_monitor_cp import LoopMonitorCP
+from tasks_cp import DeviceTasks
 
 # --- Global Variables ---
 audio_manager = None
@@ -62,7 +66,7 @@ try:
     audio_output_device = i2s_audio
     if audio_output_device:
         audio_manager = AudioManagerCP(audio_output_device)
-        engine_simulator = EngineSimulatorCP(audio_manager)
+        engine_simulator = EngineSimulatorCP(audio_manager, drive_audio=False) # The ramp task steps crossfades
         print("MAIN_APP: Audio Manager and Engine Simulator initialized.")
     else:
         raise RuntimeError("Audio output device not initialized (I2S failed).")
@@ -86,40 +90,13 @@ except Exception as e:
         print(f"MAIN_APP: Error with NeoPixel indication: {e_led}")
         while True: time.sleep(1) # Halt
 
-# --- Main Loop ---
+# --- Main Loop (asyncio tasks, see tasks_cp.py) ---
 if engine_simulator and engine_simulator.get_state() == EngineState.OFF:
     print("MAIN_APP: Auto-starting engine for testing...")
     engine_simulator.start_engine()
 
-TARGET_FPS = 60 
-TARGET_SLEEP_TIME = 1.0 / TARGET_FPS
-last_loop_print_time = time.monotonic()
-loop_counter = 0
-
-print("MAIN_APP: Entering main loop...")
-while True:
-    loop_start_time = time.monotonic()
-    loop_counter += 1
-
-    throttle_input = 0.0
-    if potentiometer:
-        raw_adc = potentiometer.value
-        throttle_input = raw_adc / 65535.0
-        throttle_input = max(0.0, min(1.0, throttle_input))
-    
-    if engine_simulator:
-        engine_simulator.set_throttle(throttle_input)
-        engine_simulator.update() 
-    
-    current_time_mono = time.monotonic()
-    if current_time_mono - last_loop_print_time >= 5.0: # Print every 5 seconds
-        if engine_simulator:
-             print(f"Loop {loop_counter}: RPM={engine_simulator.get_rpm():.0f} Thr={throttle_input:.2f} State={engine_simulator.get_state()}")
-        last_loop_print_time = current_time_mono
-
-    processing_time = time.monotonic() - loop_start_time
-    sleep_time = TARGET_SLEEP_TIME - processing_time
-    if sleep_time > 0:
-        time.sleep(sleep_time)
-    # else:
-    #     print(f"MAIN_APP: Loop {loop_counter} took too long: {processing_time*1000:.2f} ms")
\ No newline at end of file
+log.flush(max_lines=config.LOG_RING_SIZE) # Everything logged during setup
+loop_monitor = LoopMonitorCP(1.0 / config.SIM_TICK_HZ) # Takes over GC scheduling; collects once before the tasks start
+device_tasks = DeviceTasks(engine_simulator, audio_manager, potentiometer, loop_monitor)
+print("MAIN_APP: Starting device tasks...")
+asyncio.run(device_tasks.run())
@@ -42,6 +42,27 @@ RPM_RANGES = {
     "high_rpm": (4500, MAX_RPM),
 }
 
+# --- Throttle Response (throttle_curves.py, shared with the desktop build) ---
+# Throttle (0..1) -> fraction of the idle-to-max RPM span. Kinds: "power" (exponent),
+# "breakpoints" and "spline" (points [(throttle, effect), ...] from 0.0 to 1.0).
+THROTTLE_CURVES = {
+    "default": {"kind": "power", "exponent": 0.7},
+    "eco": {"kind": "breakpoints", "points": [(0.0, 0.0), (0.3, 0.12), (0.7, 0.45), (1.0, 0.8)]},
+    "sport": {"kind": "spline", "points": [(0.0, 0.0), (0.2, 0.35), (0.5, 0.75), (1.0, 1.0)]},
+}
+THROTTLE_PROFILE = "default"
+THROTTLE_CURVE_TABLE_SIZE = 101 # Table entries over 0..1, built once at boot
+
+# --- Throttle Input Conditioning (throttle_input.py, run by tasks_cp's ADC task) ---
+# Stages in order; see throttle_input.py. These settings keep flick gestures (full scale in
+# ~0.2 s) intact while stopping ADC noise from dithering across band edges and thresholds.
+THROTTLE_INPUT_FILTER = [
+    {"kind": "oversample", "count": 4},
+    {"kind": "deadband", "width": 0.0, "snap_low": 0.01, "snap_high": 0.99},
+    {"kind": "hysteresis", "width": 0.012},
+    {"kind": "ema", "tau_s": 0.015},
+]
+
 RPM_ACCEL_RATE = 7000 
 RPM_DECEL_RATE = 6000 
 RPM_IDLE_RETURN_RATE = 1500 
@@ -56,14 +77,18 @@ AUDIO_SAMPLE_RATE = 22050
 NUM_MIXER_VOICES = 6      
 ENGINE_LOOP_VOICE_1 = 0   
 ENGINE_LOOP_VOICE_2 = 1   
-SFX_STARTSHUT_VOICE = 2   
-SFX_ACCEL_VOICE = 3       
-SFX_DECEL_VOICE = 4       
+# Every other voice is a pooled SFX voice (voice_pool.py): (priority, max voices or None) per
+# category; a play with none free steals the quietest, then oldest, lower-priority voice
+VOICE_CATEGORIES = {
+    "engine_sfx": (3, 1), # Starter / shutdown; a new one replaces the old
+    "accel_burst": (2, None),
+    "decel_pop": (2, None),
+}
 
 # --- Optional Features ---
 ENABLE_ACCEL_BURST = True
 # New Accel Burst Config (Gesture Based)
-ACCEL_BURST_HISTORY_DURATION_S = 0.3  # How long to keep throttle history for flick detection
+ACCEL_BURST_HISTORY_SLOTS = 32       # Preallocated window ring of the rise gesture; >= flick window x loop rate (0.2 s x 60 FPS = 12)
 ACCEL_BURST_FLICK_WINDOW_S = 0.2    # Max duration of a "flick" gesture (e.g., 0 to 100% in < 0.2s)
 ACCEL_BURST_MIN_END_THROTTLE = 0.90   # Throttle must end at/above this for flick burst (e.g., 90%)
 ACCEL_BURST_MAX_START_THROTTLE = 0.60 # Throttle must have started at/below this in the flick window (e.g., 60% or less)
@@ -95,4 +120,27 @@ CRUISE_HIGH_RPM_SUSTAIN_S = SOUND_DURATIONS["high_rpm"] * 0.8
 
 # --- General Throttle Jitter Tolerance ---
 THROTTLE_EFFECTIVELY_ZERO = 0.05
-THROTTLE_SIGNIFICANTLY_OPEN = 0.10 # Used to cancel decel pop linger effect
\ No newline at end of file
+THROTTLE_SIGNIFICANTLY_OPEN = 0.10 # Used to cancel decel pop linger effect
+
+# --- Logging (ringlog_cp.py) ---
+LOG_LEVEL = "INFO"            # DEBUG / INFO / WARNING / ERROR
+LOG_RING_SIZE = 64            # Records kept between flushes; the oldest are dropped (and counted) when full
+LOG_FLUSH_MAX_LINES = 4       # Lines printed per main-loop flush, so a burst never stalls one loop
+LOG_RATE_LIMIT_S = 5.0        # Minimum spacing of repeated rate-limited warnings
+
+# --- Main-loop budget and GC (loop_monitor_cp.py) ---
+LOOP_REPORT_INTERVAL_S = 5.0  # How often loop jitter, work time, free heap and GC stats are logged
+GC_DISABLE_AUTO = True        # Collect only when scheduled (the VM still collects if an allocation would fail)
+GC_MIN_INTERVAL_S = 1.0       # Quiet-window collections at most this often
+GC_QUIET_SETTLE_S = 0.5       # Steady idle must have lasted this long before collecting
+GC_MIN_SLACK_MS = 8.0         # ...and the loop must have at least this much of its frame left
+GC_FORCE_BELOW_BYTES = 16384  # Collect after the loop's work in any state when free heap falls below this
+
+# --- Device tasks (tasks_cp.py) ---
+ADC_SAMPLE_HZ = 200           # Potentiometer sampling rate
+SIM_TICK_HZ = 60              # Engine simulation rate
+SIM_IDLE_TICK_HZ = 10         # Rate while the engine sits in steady idle...
+THROTTLE_WAKE_DELTA = 0.02    # ...until the throttle moves by this much
+CROSSFADE_RAMP_HZ = 100       # Crossfade level steps while a fade runs
+LOG_FLUSH_HZ = 20             # Log ring flushes (LOG_FLUSH_MAX_LINES each)
+STATUS_INTERVAL_S = 5.0       # Engine status line
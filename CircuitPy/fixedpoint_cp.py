@@ -0,0 +1,47 @@
+# fixedpoint_cp.py
+# Integer timebase and fixed-point units for the CircuitPython simulator.
+# CircuitPython's float time.monotonic() loses resolution as uptime grows (its floats carry
+# far fewer mantissa bits than CPython's), and float arithmetic costs a software-float call
+# per operation. The simulator instead keeps:
+#   time      integer milliseconds from supervisor.ticks_ms(), which wraps at 2**29;
+#             ticks_diff() gives the signed difference across the wrap
+#   throttle  Q12 integers, 0..THROTTLE_ONE for 0.0..1.0
+#   RPM       integer milli-RPM, so rate (RPM/s) x dt (ms) is an exact integer step
+# All values stay below 2**30, CircuitPython's small-int range, so none are heap-allocated.
+import time
+
+TICKS_PERIOD = 1 << 29
+TICKS_MAX = TICKS_PERIOD - 1
+TICKS_HALFPERIOD = TICKS_PERIOD // 2
+
+THROTTLE_BITS = 12
+THROTTLE_ONE = 1 << THROTTLE_BITS
+
+try:
+    from supervisor import ticks_ms
+except ImportError: # Builds without supervisor.ticks_ms: same wrapping counter from monotonic_ns
+    def ticks_ms():
+        return (time.monotonic_ns() // 1000000) & TICKS_MAX
+
+
+def ticks_diff(end, start):
+    # Signed end - start in ms; correct across the wrap for spans under half the period (~3 days)
+    diff = (end - start) & TICKS_MAX
+    return ((diff + TICKS_HALFPERIOD) & TICKS_MAX) - TICKS_HALFPERIOD
+
+
+def ms(seconds):
+    return int(seconds * 1000 + 0.5)
+
+
+def throttle_q(fraction):
+    return int(fraction * THROTTLE_ONE + 0.5)
+
+
+def throttle_q_from_adc(value):
+    # 16-bit ADC reading (0..65535) -> Q12 throttle, rounded
+    return (value * THROTTLE_ONE + 32767) // 65535
+
+
+def milli_rpm(rpm):
+    return int(rpm * 1000 + 0.5)
@@ -0,0 +1,100 @@
+# loop_monitor_cp.py
+# Sim-tick budget for the device tasks (tasks_cp.py). Measures how far each tick start lands
+# from its schedule (jitter), the work time per tick and the free heap, and decides when
+# gc.collect() runs. With GC_DISABLE_AUTO the collector no longer fires at whatever allocation
+# happens to cross the threshold; it runs in the slack after a tick's work, while the engine
+# sits in steady idle, or in any state once free heap falls below GC_FORCE_BELOW_BYTES.
+# Stats are logged every LOOP_REPORT_INTERVAL_S and reset, so each line covers one window.
+# Timing uses supervisor.ticks_ms() (fixedpoint_cp) rather than time.monotonic_ns(): the ns
+# values sit far above 2**30, so every read and subtraction would heap-allocate a long int
+# in the very tick whose allocations this monitor is meant to keep down. Durations are kept
+# in whole us (ms differences x 1000, so 1 ms resolution), all small ints.
+import gc
+import config_cp as config
+from ringlog_cp import log
+from fixedpoint_cp import ticks_ms, ticks_diff
+
+_mem_free = getattr(gc, "mem_free", None) # CircuitPython only; None on the host emulator
+
+
+class LoopMonitorCP:
+    def __init__(self, target_period_s, report_interval_s=config.LOOP_REPORT_INTERVAL_S):
+        self.period_us = int(target_period_s * 1000000)
+        self.report_interval_ms = int(report_interval_s * 1000)
+        self.gc_min_interval_ms = int(config.GC_MIN_INTERVAL_S * 1000)
+        self.gc_quiet_settle_ms = int(config.GC_QUIET_SETTLE_S * 1000)
+        self.gc_min_slack_us = int(config.GC_MIN_SLACK_MS * 1000)
+        self.last_start_ms = None
+        self.quiet_since_ms = None
+        self.total_gc_runs = 0
+        self._reset_window()
+
+        if config.GC_DISABLE_AUTO: gc.disable()
+        gc.collect() # Start the loop from a clean heap
+        now = ticks_ms()
+        self.last_collect_ms = now
+        self.last_report_ms = now
+
+    def _reset_window(self):
+        self.loops = 0
+        self.jitter_samples = 0
+        self.jitter_sum_us = 0
+        self.jitter_max_us = 0
+        self.late_loops = 0 # Loops whose work alone overran the frame
+        self.work_max_us = 0
+        self.gc_runs = 0
+        self.gc_forced = 0
+        self.gc_max_us = 0
+        self.heap_min = None
+
+    def loop_started(self, now_ms, on_schedule=True):
+        # on_schedule False: the previous wait was not a regular period, so no jitter sample
+        if on_schedule and self.last_start_ms is not None:
+            jitter_us = ticks_diff(now_ms, self.last_start_ms) * 1000 - self.period_us
+            if jitter_us < 0: jitter_us = -jitter_us
+            self.jitter_samples += 1
+            self.jitter_sum_us += jitter_us
+            if jitter_us > self.jitter_max_us: self.jitter_max_us = jitter_us
+        self.last_start_ms = now_ms
+
+    def work_done(self, start_ms, quiet):
+        # Called after the tick's work, before it sleeps; returns ticks_ms after any collection
+        now = ticks_ms()
+        work_us = ticks_diff(now, start_ms) * 1000
+        self.loops += 1
+        if work_us > self.work_max_us: self.work_max_us = work_us
+        if work_us > self.period_us: self.late_loops += 1
+
+        free = _mem_free() if _mem_free else None
+        if free is not None and (self.heap_min is None or free < self.heap_min): self.heap_min = free
+
+        if not quiet: self.quiet_since_ms = None
+        elif self.quiet_since_ms is None: self.quiet_since_ms = now
+
+        forced = free is not None and free < config.GC_FORCE_BELOW_BYTES
+        if forced or (self.quiet_since_ms is not None and
+                      ticks_diff(now, self.quiet_since_ms) >= self.gc_quiet_settle_ms and
+                      ticks_diff(now, self.last_collect_ms) >= self.gc_min_interval_ms and
+                      self.period_us - work_us >= self.gc_min_slack_us):
+            gc.collect()
+            after = ticks_ms()
+            gc_us = ticks_diff(after, now) * 1000
+            self.gc_runs += 1
+            self.total_gc_runs += 1
+            if forced: self.gc_forced += 1
+            if gc_us > self.gc_max_us: self.gc_max_us = gc_us
+            self.last_collect_ms = now = after
+
+        if ticks_diff(now, self.last_report_ms) >= self.report_interval_ms:
+            self.report()
+            self.last_report_ms = now
+        return now
+
+    def report(self):
+        if not self.loops: return
+        log.info("LOOP", "{} ticks: jitter mean {:.2f} ms max {:.2f} ms, work max {:.2f} ms ({} over budget), heap free {} (min {}), gc {} ({} forced) max {:.2f} ms",
+                 self.loops, self.jitter_sum_us / max(1, self.jitter_samples) / 1000.0, self.jitter_max_us / 1000.0,
+                 self.work_max_us / 1000.0, self.late_loops,
+                 _mem_free() if _mem_free else "n/a", self.heap_min if self.heap_min is not None else "n/a",
+                 self.gc_runs, self.gc_forced, self.gc_max_us / 1000.0)
+        self._reset_window()
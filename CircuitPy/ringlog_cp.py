@@ -0,0 +1,72 @@
+# ringlog_cp.py
+# CircuitPython counterpart of ringlog.py. There are no threads on the board, so log calls
+# store (level, tag, template, args) in a fixed ring and code.py's main loop calls
+# log.flush() once per iteration, after the audio work; flush prints at most
+# LOG_FLUSH_MAX_LINES records, so a burst of messages is spread over several loops
+# instead of stalling one on the serial console.
+import time
+import config_cp as config
+
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+LEVELS = {"DEBUG": DEBUG, "INFO": INFO, "WARNING": WARNING, "ERROR": ERROR}
+LEVEL_PREFIX = {DEBUG: "", INFO: "", WARNING: "WARNING - ", ERROR: "ERROR - "}
+
+
+class RingLoggerCP:
+    def __init__(self, level=config.LOG_LEVEL, capacity=config.LOG_RING_SIZE,
+                 max_lines_per_flush=config.LOG_FLUSH_MAX_LINES, rate_limit_s=config.LOG_RATE_LIMIT_S):
+        self.level = LEVELS[level] if isinstance(level, str) else level
+        self.capacity = capacity
+        self.max_lines_per_flush = max_lines_per_flush
+        self.rate_limit_s = rate_limit_s
+        self.slots = [None] * capacity # Preallocated; a log call only stores a tuple in a slot
+        self.head = 0 # Next slot to print
+        self.count = 0
+        self.dropped = 0
+        self.rate_limits = {} # (tag, template) -> [last emitted (monotonic), suppressed since]
+
+    def log(self, level, tag, template, args, suppressed=0):
+        if level < self.level: return
+        if self.count == self.capacity: # Overwrite the oldest
+            self.head = (self.head + 1) % self.capacity
+            self.count -= 1
+            self.dropped += 1
+        self.slots[(self.head + self.count) % self.capacity] = (level, tag, template, args, suppressed)
+        self.count += 1
+
+    def debug(self, tag, template, *args): self.log(DEBUG, tag, template, args)
+    def info(self, tag, template, *args): self.log(INFO, tag, template, args)
+    def warning(self, tag, template, *args): self.log(WARNING, tag, template, args)
+    def error(self, tag, template, *args): self.log(ERROR, tag, template, args)
+
+    def warning_limited(self, tag, template, *args):
+        if WARNING < self.level: return
+        now = time.monotonic()
+        key = (tag, template)
+        entry = self.rate_limits.get(key)
+        if entry is not None and now - entry[0] < self.rate_limit_s:
+            entry[1] += 1
+            return
+        self.rate_limits[key] = [now, 0]
+        self.log(WARNING, tag, template, args, entry[1] if entry else 0)
+
+    def flush(self, max_lines=None):
+        budget = self.max_lines_per_flush if max_lines is None else max_lines
+        while self.count and budget:
+            level, tag, template, args, suppressed = self.slots[self.head]
+            self.slots[self.head] = None
+            self.head = (self.head + 1) % self.capacity
+            self.count -= 1
+            budget -= 1
+            try:
+                message = template.format(*args) if args else template
+            except (IndexError, KeyError, ValueError) as e:
+                message = "{!r} {!r} (bad log format: {})".format(template, args, e)
+            if suppressed: message += " ({} similar suppressed)".format(suppressed)
+            print(tag + ": " + LEVEL_PREFIX[level] + message)
+        if self.dropped and not self.count:
+            print("LOG: WARNING - {} messages dropped (ring full)".format(self.dropped))
+            self.dropped = 0
+
+
+log = RingLoggerCP()
@@ -0,0 +1,136 @@
+# tasks_cp.py
+# The device main loop as cooperative asyncio tasks (needs the asyncio and adafruit_ticks
+# libraries in /lib), each on its own schedule so one slow part no longer holds up the rest:
+#   adc      samples the potentiometer at ADC_SAMPLE_HZ through the THROTTLE_INPUT_FILTER
+#            chain (throttle_input.py: oversampling, deadband, hysteresis, EMA, ...)
+#   sim      set_throttle + update at SIM_TICK_HZ; while the engine sits in steady idle it
+#            ticks at SIM_IDLE_TICK_HZ, and opening the throttle (or a move of
+#            THROTTLE_WAKE_DELTA) wakes it early
+#   ramp     steps a running crossfade at CROSSFADE_RAMP_HZ, independent of the sim tick;
+#            between fades it waits on an event and costs nothing
+#   status   flushes the log ring at LOG_FLUSH_HZ and logs the engine status and SFX voice
+#            stats every STATUS_INTERVAL_S
+# Each task keeps its own ticks_ms deadlines, so a late wakeup shortens the next sleep
+# instead of shifting every later one.
+import asyncio
+import config_cp as config
+from ringlog_cp import log
+from fixedpoint_cp import ticks_ms, ticks_diff, throttle_q, throttle_q_from_adc
+import throttle_input
+
+
+class _Schedule:
+    # Deadlines at start + k * 1000 // hz ms, so rates that do not divide 1000 (60 Hz) keep
+    # their exact average. A task that falls a whole period behind restarts from now rather
+    # than running a burst of catch-up iterations.
+    def __init__(self, hz):
+        self.hz = hz
+        self.period_ms = 1000 // hz
+        self.restart()
+
+    def restart(self):
+        self.start = ticks_ms()
+        self.k = 0
+
+    async def wait(self):
+        self.k += 1
+        if self.k == self.hz: # Re-base every second so k * 1000 stays small
+            self.start += 1000
+            self.k = 0
+        delay = ticks_diff(self.start + self.k * 1000 // self.hz, ticks_ms())
+        if delay < -self.period_ms:
+            self.restart()
+            delay = 0
+        await asyncio.sleep(delay / 1000 if delay > 0 else 0)
+
+
+class DeviceTasks:
+    def __init__(self, engine_simulator, audio_manager, potentiometer, loop_monitor):
+        self.engine_simulator = engine_simulator
+        self.audio_manager = audio_manager
+        self.potentiometer = potentiometer
+        self.loop_monitor = loop_monitor
+        self.throttle_filter = throttle_input.compile_filter(config.THROTTLE_INPUT_FILTER)
+        self.throttle_q = 0 # Latest conditioned ADC reading, Q12
+        self.wake_delta_q = throttle_q(config.THROTTLE_WAKE_DELTA)
+        self.throttle_moved = asyncio.Event()
+        self.crossfade_started = asyncio.Event()
+        audio_manager.crossfade_started = self.crossfade_started
+        self.sim_ticks = 0
+
+    async def adc(self):
+        schedule = _Schedule(config.ADC_SAMPLE_HZ)
+        pot, sim = self.potentiometer, self.engine_simulator
+        throttle_filter = self.throttle_filter
+        read = self._read_potentiometer # Bound once, not per sample
+        while True:
+            if pot:
+                value_q = throttle_filter.sample(read, ticks_ms())
+                # Ends the sim's idle wait: any opening past "effectively zero" or a small move
+                if value_q > sim.effectively_zero_q or abs(value_q - sim.throttle_position) >= self.wake_delta_q:
+                    self.throttle_moved.set()
+                self.throttle_q = value_q
+            await schedule.wait()
+
+    def _read_potentiometer(self):
+        return throttle_q_from_adc(self.potentiometer.value)
+
+    async def sim(self):
+        schedule = _Schedule(config.SIM_TICK_HZ)
+        idle_period_s = 1.0 / config.SIM_IDLE_TICK_HZ
+        sim, monitor = self.engine_simulator, self.loop_monitor
+        on_schedule = False # Jitter is only measured for ticks that followed a scheduled wait
+        while True:
+            start_ms = ticks_ms()
+            monitor.loop_started(start_ms, on_schedule)
+            self.sim_ticks += 1
+            sim.set_throttle_q(self.throttle_q)
+            sim.update()
+            quiet = sim.is_steady_idle()
+            monitor.work_done(start_ms, quiet) # May gc.collect() in this tick's slack
+            if quiet:
+                self.throttle_moved.clear()
+                try:
+                    await asyncio.wait_for(self.throttle_moved.wait(), idle_period_s)
+                except asyncio.TimeoutError:
+                    pass
+                sim.resume_after_idle_wait()
+                schedule.restart()
+                on_schedule = False
+            else:
+                await schedule.wait()
+                on_schedule = True
+
+    async def ramp(self):
+        schedule = _Schedule(config.CROSSFADE_RAMP_HZ)
+        am = self.audio_manager
+        while True:
+            await self.crossfade_started.wait()
+            self.crossfade_started.clear()
+            schedule.restart()
+            while am.is_crossfading:
+                am.update()
+                await schedule.wait()
+
+    async def status(self):
+        schedule = _Schedule(config.LOG_FLUSH_HZ)
+        status_ms = int(config.STATUS_INTERVAL_S * 1000)
+        sim = self.engine_simulator
+        last_status = ticks_ms()
+        while True:
+            now = ticks_ms()
+            if ticks_diff(now, last_status) >= status_ms:
+                log.info("MAIN_APP", "Tick {}: RPM={:.0f} Thr={:.2f} State={}", self.sim_ticks, sim.get_rpm(), sim.get_throttle(), sim.get_state())
+                pool = self.audio_manager.sfx_voices
+                log.info("VOICES", "{} SFX voices: plays {} drops {} steals {}", len(pool), pool.plays, pool.drops, pool.steals)
+                last_status = now
+            log.flush() # Prints at most LOG_FLUSH_MAX_LINES lines
+            await schedule.wait()
+
+    async def run(self):
+        await asyncio.gather(
+            asyncio.create_task(self.adc()),
+            asyncio.create_task(self.sim()),
+            asyncio.create_task(self.ramp()),
+            asyncio.create_task(self.status()),
+        )
@@ -1,154 +1,343 @@
 # audio_manager.py
+# pygame / soft_mixer audio backend for the engine model (the interface is listed in engine_core.py).
 import pygame
 import time
-import os
 import config # Import config to use its values directly
+import config_snapshot
+import events
+from ringlog import log
+from voice_pool import VoicePool
+from sound_pack import SoundPack, PackLoader
 
 class AudioManager:
     def __init__(self, mixer_frequency, mixer_size, mixer_channels, mixer_buffer,
                  num_audio_channels, sound_files, sfx_volume, main_engine_volume,
                  crossfade_duration_ms, accel_burst_cooldown_ms, decel_pop_cooldown_ms,
-                 enable_accel_burst, enable_decel_pops):
+                 enable_accel_burst, enable_decel_pops, mixer_module=None, clock=time.time, event_bus=None):
         
-        self.sounds = {}
+        # pygame.mixer by default; soft_mixer (or anything with the same API) for offline rendering
+        self.mixer = mixer_module or pygame.mixer
+        self.mixer_error = getattr(self.mixer, "error", pygame.error)
+        self.clock = clock
+        self.events = event_bus or events.EventBus() # Shared with EngineSimulator
+        self.sounds = {} # The active sound pack's Sound objects
+        self.sound_pack = None
+        self.pack_loader = None # sound_pack.PackLoader, created on the first hot-swap request
+        self.retiring_pack = None # Previous pack, released once pack_fade_channel has stopped
+        self.pack_fade_channel = None # Channel still playing the previous pack's loop
+        self.pack_fade_layer_key = None # Layer that channel takes over afterwards (layer mode)
+        self.pack_fade_start_time = 0
+        self.sound_pack_swaps = 0
         self.engine_channel1 = None 
         self.engine_channel2 = None 
-        self.sfx_channel = None     
-        self.burst_pop_channel = None 
-        self.pop_channel = None 
+        self.sfx_voices = VoicePool((), config.VOICE_CATEGORIES, _channel_busy) # Every channel the engine loops leave free
 
         self.active_engine_channel = None
         self.inactive_engine_channel = None
+        self.engine_channels = [] # Every channel that may carry an engine loop
+        self.layer_channels = {} # Loop key -> channel, only in pre-warmed layer mode
+        self.layers_prewarmed = False
+        self.voice_usage = {}
         self.current_loop_sound_key = None
         self.is_crossfading = False
         self.crossfade_start_time = 0
         self.crossfade_from_sound_key = None
         self.crossfade_to_sound_key = None
+        self.crossfade_progress = 0.0
+        self.crossfade_from_start_volume = 0.0 # Gains the current fade started from (retargeted fades
+        self.crossfade_to_start_volume = 0.0   # start from wherever the previous one had got to)
+        self.crossfade_tail_channel = None # Third voice still fading out after a retarget (layer mode only)
+        self.crossfade_tail_start_volume = 0.0
         self.last_pop_time = 0
         self.last_accel_burst_time = 0
         self.xfade_log_counter = 0 
 
-        self.sound_files_config = config.SOUND_FILES
-        self.sfx_volume_config = config.SFX_VOLUME 
-        self.main_engine_volume_config = config.MAIN_ENGINE_VOLUME
-        self.crossfade_duration_ms_config = config.CROSSFADE_DURATION_MS
-        self.accel_burst_cooldown_ms_config = config.ACCEL_BURST_COOLDOWN_MS
-        self.decel_pop_cooldown_ms_config = config.DECEL_POP_COOLDOWN_MS
-        self.enable_accel_burst_config = config.ENABLE_ACCEL_BURST
-        self.enable_decel_pops_config = config.ENABLE_DECEL_POPS
+        # Plain counters read by metrics.py when scraped (keys pre-created so scrapes never see the dicts resize)
+        self.crossfades_started = 0
+        self.crossfades_aborted = 0
+        self.crossfade_retargets = 0
+        self.crossfade_reversals = 0
+        self.channel_restarts_avoided = 0 # Channel.play calls a stop-and-restart would have needed
+        # Crossfades-per-minute as 60 one-second buckets (start second, count): fixed memory
+        # and no cap on how many starts a minute can hold
+        self.crossfade_bucket_seconds = [-1] * 60
+        self.crossfade_bucket_counts = [0] * 60
+        self.sfx_play_counts = {key: 0 for key in ("starter", "shutdown", "accel_burst", "decel_pop")}
+        self.sfx_suppressed_counts = {(key, reason): 0 for key in ("accel_burst", "decel_pop")
+                                      for reason in ("cooldown", "no_voice")}
+        self.sound_load_time_s = 0.0
+        self.mixer_buffer_size = mixer_buffer
+        self.output_pump = None # audio_sinks.MixerPump when rendering through soft_mixer into output sinks
+
+        self.apply_config(config_snapshot.current())
 
         try:
-            if not pygame.mixer.get_init():
-                 pygame.mixer.init(
+            if not self.mixer.get_init():
+                 self.mixer.init(
                     frequency=config.MIXER_FREQUENCY,
                     size=config.MIXER_SIZE,
                     channels=config.MIXER_CHANNELS,
-                    buffer=config.MIXER_BUFFER_SIZE
+                    buffer=mixer_buffer
                 )
             
-            current_num_channels = pygame.mixer.get_num_channels()
+            current_num_channels = self.mixer.get_num_channels()
             if current_num_channels < config.NUM_AUDIO_CHANNELS:
-                 pygame.mixer.set_num_channels(config.NUM_AUDIO_CHANNELS)
+                 self.mixer.set_num_channels(config.NUM_AUDIO_CHANNELS)
 
-        except pygame.error as e:
-            print(f"AUDIO_MAN: FATAL Error initializing pygame.mixer: {e}")
+        except self.mixer_error as e:
+            log.error("AUDIO_MAN", "FATAL - Could not initialize pygame.mixer: {}", e)
             return 
 
         self.load_sounds()
 
-        if pygame.mixer.get_init():
-            total_channels = pygame.mixer.get_num_channels()
-            if total_channels >= 4:
-                self.engine_channel1 = pygame.mixer.Channel(0)
-                self.engine_channel2 = pygame.mixer.Channel(1)
-                self.sfx_channel = pygame.mixer.Channel(2)
-                self.burst_pop_channel = pygame.mixer.Channel(3)
-                self.pop_channel = self.burst_pop_channel 
+        if self.mixer.get_init():
+            # Engine loops take the lowest channels (the crossfade pair, or one per pre-warmed
+            # layer); every other channel goes to the SFX voice pool
+            total_channels = self.mixer.get_num_channels()
+            engine_indices = []
+            if total_channels >= 2:
+                self.engine_channel1 = self.mixer.Channel(0)
+                self.engine_channel2 = self.mixer.Channel(1)
                 self.active_engine_channel = self.engine_channel1
                 self.inactive_engine_channel = self.engine_channel2
-            else: 
-                print(f"AUDIO_MAN: WARNING - Not enough audio channels available ({total_channels}). Need at least 4 for all features.")
-                if total_channels >= 2:
-                    self.engine_channel1 = pygame.mixer.Channel(0)
-                    self.engine_channel2 = pygame.mixer.Channel(1)
-                    self.active_engine_channel = self.engine_channel1
-                    self.inactive_engine_channel = self.engine_channel2
-                    if total_channels >= 3: 
-                        self.sfx_channel = pygame.mixer.Channel(2)
-                        self.burst_pop_channel = self.sfx_channel 
-                        self.pop_channel = self.sfx_channel
-                    else: 
-                        print("AUDIO_MAN: WARNING - Only 2 channels. SFX (starter, burst, pop) might conflict or not play.")
-                        self.sfx_channel = self.engine_channel1 
-                        self.burst_pop_channel = self.engine_channel2
-                        self.pop_channel = self.engine_channel2
+                engine_indices = [0, 1]
+                if config.ENABLE_PREWARMED_ENGINE_LAYERS:
+                    engine_indices = self._allocate_engine_layers(total_channels) or engine_indices
+            else:
+                log.warning("AUDIO_MAN", "Only {} audio channel(s); the engine loops need 2.", total_channels)
+            if not self.engine_channels:
+                self.engine_channels = [ch for ch in (self.engine_channel1, self.engine_channel2) if ch]
+            self.sfx_voices = VoicePool([self.mixer.Channel(i) for i in range(total_channels) if i not in engine_indices],
+                                        config.VOICE_CATEGORIES, _channel_busy)
+            if len(self.sfx_voices) < 2:
+                log.warning("AUDIO_MAN", "Only {} SFX voice(s); lower-priority SFX will be cut off or dropped.", len(self.sfx_voices))
+            self.voice_usage = {"engine": len(self.engine_channels), "sfx": len(self.sfx_voices)}
+            log.info("AUDIO_MAN", "Voice usage {} of {} channels.", self.voice_usage, total_channels)
+
+    def _allocate_engine_layers(self, total_channels):
+        # One always-running voice per loop on the lowest channels; returns their indices, or None
+        # to keep the crossfade pair. At least two channels stay free for SFX.
+        layer_keys = [key for key in config.ENGINE_LAYER_KEYS if key in self.sounds]
+        needed = len(layer_keys) + 2
+        if total_channels < needed:
+            log.warning("AUDIO_MAN", "Pre-warmed engine layers need {} channels, only {}. Using crossfade pair.", needed, total_channels)
+            return None
+        layer_indices = list(range(len(layer_keys)))
+        for key, index in zip(layer_keys, layer_indices):
+            self.layer_channels[key] = self.mixer.Channel(index)
+        self.engine_channels = list(self.layer_channels.values())
+        return layer_indices
+
+    def prewarm_engine_layers(self):
+        # Start every loop muted so that band switches are gain changes only
+        if not self.layer_channels or self.layers_prewarmed or not self.mixer.get_init(): return
+        for key, channel in self.layer_channels.items():
+            channel.set_volume(0)
+            channel.play(self.sounds[key], loops=-1)
+        self.layers_prewarmed = True
+        if self.current_loop_sound_key in self.layer_channels:
+            self.active_engine_channel = self.layer_channels[self.current_loop_sound_key]
+            self.active_engine_channel.set_volume(self.main_engine_volume_config)
 
     def load_sounds(self):
-        if not pygame.mixer.get_init(): return
-        for key, path in self.sound_files_config.items():
-            if os.path.exists(path):
-                try:
-                    sound_obj = pygame.mixer.Sound(path)
-                    if sound_obj.get_length() > 0: 
-                        self.sounds[key] = sound_obj
-                    else: print(f"AUDIO_MAN: WARNING - ZERO LENGTH: {key} from {path}") # Added this warning
-                except pygame.error as e: print(f"AUDIO_MAN: Error loading sound {key} from {path}: {e}")
-            else: print(f"AUDIO_MAN: Sound file NOT FOUND: {path} for key: {key}")
+        # The configured pack, loaded in place before anything plays
+        if not self.mixer.get_init(): return
+        self.sound_pack = SoundPack(self.cfg.sound_pack, self.cfg.sound_files).load(
+            self.mixer, self.mixer_error, self._frame_bytes())
+        self.sounds = self.sound_pack.sounds
+        self.sound_load_time_s = self.sound_pack.load_time_s
+
+    def _frame_bytes(self):
+        frequency, size, channels = self.mixer.get_init()
+        return frequency * channels * abs(size) // 8
+
+    # --- Sound pack hot swap (sound_pack.py) ---
+    def request_sound_pack(self, name, files):
+        # Starts loading in the background; the current pack keeps playing meanwhile
+        if not self.mixer.get_init(): return
+        if self.pack_loader is None:
+            self.pack_loader = PackLoader(self.mixer, self.mixer_error, self._frame_bytes())
+        log.info("AUDIO_MAN", "Loading sound pack '{}' in the background.", name)
+        self.pack_loader.request(name, files)
+
+    def cancel_sound_pack_request(self):
+        if self.pack_loader: self.pack_loader.cancel()
+
+    def take_loaded_sound_pack(self):
+        return self.pack_loader.take() if self.pack_loader else None
+
+    def can_swap_sound_pack(self):
+        # Idle moment: no band fade, pack fade or SFX running, and if no loop is current, no
+        # engine channel still fading out either (every old Sound must be silent or on the loop)
+        if self.is_crossfading or self.pack_fade_channel is not None or self.sfx_voices.any_busy(): return False
+        if self.current_loop_sound_key is None:
+            return not any(channel.get_busy() for channel in self.engine_channels)
+        return True
+
+    def swap_sound_pack(self, pack):
+        # Sim thread, when can_swap_sound_pack(). Every lookup switches to the new pack at once;
+        # the loop that is playing crossfades into the new pack's recording of the same key.
+        old_pack = self.sound_pack
+        self.sound_pack, self.sounds = pack, pack.sounds
+        self.sound_load_time_s = pack.load_time_s
+        self.sound_pack_swaps += 1
+        if self.events.listeners[events.SOUND_PACK_SWAPPED]:
+            self.events.emit(events.SOUND_PACK_SWAPPED, self.clock(), old_pack.name if old_pack else None, pack.name)
+        old_channel = self.active_engine_channel
+        key = self.current_loop_sound_key
+        if key is None or old_channel is None or not old_channel.get_busy():
+            self._release_pack(old_pack); return
+
+        if self.layers_prewarmed:
+            # The new recording starts on a muted layer's channel; the two layers trade channels
+            spare_key, spare = next(((k, ch) for k, ch in self.layer_channels.items() if ch is not old_channel), (None, None))
+            for layer_key, channel in self.layer_channels.items():
+                if channel is not old_channel and channel is not spare: self._restart_layer(layer_key, channel)
+            if key not in self.layer_channels: spare = None
+            if spare is not None:
+                self.layer_channels[key], self.layer_channels[spare_key] = spare, old_channel
+                self.pack_fade_layer_key = spare_key
+            elif spare_key is not None:
+                self._restart_layer(spare_key, self.layer_channels[spare_key])
+        else:
+            spare = self.inactive_engine_channel
+        new_sound = self.get_sound(key)
+        if spare is None or new_sound is None:
+            # Nowhere to fade from (or nothing to fade to): cut over on the same channel
+            if new_sound: old_channel.play(new_sound, loops=-1)
+            else: old_channel.stop(); self.current_loop_sound_key = None
+            self._release_pack(old_pack); return
+        spare.set_volume(0)
+        spare.play(new_sound, loops=-1)
+        self.active_engine_channel, self.inactive_engine_channel = spare, old_channel
+        self.pack_fade_channel = old_channel
+        self.retiring_pack = old_pack
+        self.pack_fade_start_time = self.clock() * 1000
+
+    def _restart_layer(self, key, channel):
+        sound = self.get_sound(key)
+        channel.set_volume(0)
+        if sound: channel.play(sound, loops=-1)
+        else: channel.stop()
+
+    def _handle_pack_fade(self):
+        progress = min((self.clock() * 1000 - self.pack_fade_start_time) / self.cfg.pack_crossfade_ms, 1.0)
+        volume = self.main_engine_volume_config
+        self.active_engine_channel.set_volume(volume * progress)
+        self.pack_fade_channel.set_volume(volume * (1.0 - progress))
+        if progress < 1.0: return
+        channel, layer_key = self.pack_fade_channel, self.pack_fade_layer_key
+        self._end_pack_fade()
+        if layer_key is not None and self.layers_prewarmed: self._restart_layer(layer_key, channel)
+
+    def _end_pack_fade(self):
+        if self.pack_fade_channel is None: return
+        self.pack_fade_channel.stop()
+        self.pack_fade_channel = None
+        self.pack_fade_layer_key = None
+        old_pack, self.retiring_pack = self.retiring_pack, None
+        self._release_pack(old_pack)
+
+    def _release_pack(self, pack):
+        if pack is None: return
+        freed = pack.release()
+        log.info("AUDIO_MAN", "Sound pack '{}' released ({:.1f} MB); now playing '{}'.",
+                 pack.name, freed / 1e6, self.sound_pack.name)
+
+    def apply_config(self, cfg):
+        # Live-tunable values (config_snapshot.py); EngineSimulator calls this between ticks
+        self.cfg = cfg
+        self.sfx_volume_config = cfg.sfx_volume
+        self.main_engine_volume_config = cfg.main_engine_volume
+        self.crossfade_duration_ms_config = cfg.crossfade_duration_ms
+        self.accel_burst_cooldown_ms_config = cfg.accel_burst_cooldown_ms
+        self.decel_pop_cooldown_ms_config = cfg.decel_pop_cooldown_ms
+        self.enable_accel_burst_config = cfg.accel_burst_enabled
+        self.enable_decel_pops_config = cfg.decel_pops_enabled
 
     def get_sound(self, key):
         if key is None: return None
         return self.sounds.get(key)
 
-    def play_sfx(self, key, volume_multiplier=1.0, loops=0, on_channel=None):
-        if not pygame.mixer.get_init() : return False
-        channel_to_use = on_channel or self.sfx_channel 
-        if not channel_to_use: return False
+    def play_sfx(self, key, category="gesture", volume_multiplier=1.0, loops=0):
+        # One-shot on a voice from the SFX pool (config.VOICE_CATEGORIES); False if none was free or stealable
+        if not self.mixer.get_init(): return False
         sound = self.get_sound(key)
-        if sound:
-            sound.set_volume(config.SFX_VOLUME * volume_multiplier)
-            channel_to_use.play(sound, loops=loops)
-            # print(f"AUDIO_MAN: ---> SFX PLAYING: '{key}' on {channel_to_use}")
-            return True
-        return False
+        if not sound: return False
+        volume = self.sfx_volume_config * volume_multiplier
+        channel = self.sfx_voices.acquire(category, volume)
+        if channel is None: return False
+        sound.set_volume(volume)
+        channel.play(sound, loops=loops)
+        self.sfx_play_counts[key] = self.sfx_play_counts.get(key, 0) + 1
+        if self.events.listeners[events.SFX_PLAYED]: self.events.emit(events.SFX_PLAYED, self.clock(), key)
+        return True
+
+    def play_engine_sfx(self, key):
+        # Starter / shutdown one-shot
+        return self.play_sfx(key, category="engine_sfx")
 
     def play_accel_burst(self):
-        if not pygame.mixer.get_init() or not self.burst_pop_channel: return False
-        if not config.ENABLE_ACCEL_BURST: return False
-        current_time_ms = time.time() * 1000
-        if current_time_ms - self.last_accel_burst_time > self.accel_burst_cooldown_ms_config:
-            sound = self.get_sound("accel_burst")
-            if sound and not self.burst_pop_channel.get_busy():
-                vol = config.SFX_VOLUME * config.ACCEL_BURST_SFX_VOLUME_MULTIPLIER
-                sound.set_volume(min(1.0, vol))
-                self.burst_pop_channel.play(sound)
-                self.last_accel_burst_time = current_time_ms
-                return True
-        return False
+        if not self.mixer.get_init() or not self.enable_accel_burst_config: return False
+        current_time_ms = self.clock() * 1000
+        if current_time_ms - self.last_accel_burst_time <= self.accel_burst_cooldown_ms_config:
+            self._note_sfx_suppressed("accel_burst", "cooldown", current_time_ms)
+            return False
+        if not self._play_effect("accel_burst", self.cfg.accel_burst_volume, current_time_ms): return False
+        self.last_accel_burst_time = current_time_ms
+        return True
 
     def play_decel_pop(self):
-        if not pygame.mixer.get_init() or not self.pop_channel: return False
-        if not config.ENABLE_DECEL_POPS: return False
-        current_time_ms = time.time() * 1000
-        if current_time_ms - self.last_pop_time > self.decel_pop_cooldown_ms_config:
-            sound = self.get_sound("decel_pop")
-            if sound and not self.pop_channel.get_busy(): # Ensure channel is free for this specific SFX
-                vol = config.SFX_VOLUME * config.DECEL_POP_SFX_VOLUME_MULTIPLIER
-                sound.set_volume(min(1.0, vol))
-                self.pop_channel.play(sound)
-                self.last_pop_time = current_time_ms
-                return True
-        return False
+        if not self.mixer.get_init() or not self.enable_decel_pops_config: return False
+        current_time_ms = self.clock() * 1000
+        if current_time_ms - self.last_pop_time <= self.decel_pop_cooldown_ms_config:
+            self._note_sfx_suppressed("decel_pop", "cooldown", current_time_ms)
+            return False
+        if not self._play_effect("decel_pop", self.cfg.decel_pop_volume, current_time_ms): return False
+        self.last_pop_time = current_time_ms
+        return True
+
+    def _play_effect(self, key, volume, current_time_ms):
+        # Burst / pop on a pooled voice; the category is the key
+        sound = self.get_sound(key)
+        if not sound: return False
+        channel = self.sfx_voices.acquire(key, volume)
+        if channel is None:
+            self._note_sfx_suppressed(key, "no_voice", current_time_ms)
+            return False
+        sound.set_volume(volume)
+        channel.play(sound)
+        self.sfx_play_counts[key] += 1
+        if self.events.listeners[events.SFX_PLAYED]: self.events.emit(events.SFX_PLAYED, current_time_ms / 1000.0, key)
+        return True
+
+    def _note_sfx_suppressed(self, key, reason, current_time_ms):
+        self.sfx_suppressed_counts[(key, reason)] += 1
+        if self.events.listeners[events.SFX_SUPPRESSED]:
+            self.events.emit(events.SFX_SUPPRESSED, current_time_ms / 1000.0, key, reason)
+
+    def crossfades_last_minute(self, now):
+        # Starts in the 60 one-second buckets that end with the current second
+        now_second = int(now)
+        return sum(count for second, count in zip(self.crossfade_bucket_seconds, self.crossfade_bucket_counts)
+                   if 0 <= now_second - second < 60)
 
     def update_engine_sound(self, target_sound_key):
-        if not pygame.mixer.get_init() or not self.active_engine_channel or not self.inactive_engine_channel:
+        if not self.mixer.get_init() or not self.active_engine_channel or not self.inactive_engine_channel:
             return
+        if self.pack_fade_channel is not None: return # Band changes wait for the pack crossfade (one fade long)
         sound_to_play_obj = self.get_sound(target_sound_key)
         if not sound_to_play_obj: 
             return
+        if self.layer_channels and not self.layers_prewarmed: self.prewarm_engine_layers()
 
         if self.is_crossfading and self.crossfade_to_sound_key == target_sound_key: return
         if self.is_crossfading and self.crossfade_to_sound_key != target_sound_key:
-            self.active_engine_channel.stop(); self.inactive_engine_channel.stop()
+            if self.cfg.crossfade_retarget:
+                self._retarget_crossfade(target_sound_key); return
+            self.crossfades_aborted += 1 # Cut to silence and restarted; retargets are counted on their own
+            if self.layers_prewarmed: self.active_engine_channel.set_volume(0); self.inactive_engine_channel.set_volume(0)
+            else: self.active_engine_channel.stop(); self.inactive_engine_channel.stop()
             self.is_crossfading = False 
             self._start_crossfade(target_sound_key); return
 
@@ -159,22 +348,36 @@ class AudioManager:
             return
 
         if self.current_loop_sound_key is None and not self.is_crossfading:
+            if self.layers_prewarmed: self.active_engine_channel = self.layer_channels.get(target_sound_key, self.active_engine_channel)
             self.active_engine_channel.set_volume(self.main_engine_volume_config)
-            self.active_engine_channel.play(sound_to_play_obj, loops=-1)
+            if not self.active_engine_channel.get_busy() or self.active_engine_channel.get_sound() != sound_to_play_obj:
+                self.active_engine_channel.play(sound_to_play_obj, loops=-1)
             self.current_loop_sound_key = target_sound_key; return
 
         if target_sound_key != self.current_loop_sound_key and not self.is_crossfading:
             self._start_crossfade(target_sound_key); return
 
     def _start_crossfade(self, new_sound_key):
-        if not pygame.mixer.get_init() or not self.active_engine_channel or not self.inactive_engine_channel : return
+        if not self.mixer.get_init() or not self.active_engine_channel or not self.inactive_engine_channel : return
         from_sound_key_for_fade = self.current_loop_sound_key 
         new_sound_obj = self.get_sound(new_sound_key)
         if not new_sound_obj or from_sound_key_for_fade == new_sound_key: return
 
-        self.is_crossfading = True; self.crossfade_start_time = time.time() * 1000
+        self.is_crossfading = True; self.crossfade_start_time = self.clock() * 1000
         self.crossfade_from_sound_key = from_sound_key_for_fade 
         self.crossfade_to_sound_key = new_sound_key; self.xfade_log_counter = 0
+        self.crossfade_progress = 0.0
+        self.crossfade_from_start_volume = self.main_engine_volume_config; self.crossfade_to_start_volume = 0.0
+        self._finish_crossfade_tail()
+        self.crossfades_started += 1
+        second = int(self.clock()); bucket = second % 60
+        if self.crossfade_bucket_seconds[bucket] != second:
+            self.crossfade_bucket_seconds[bucket] = second; self.crossfade_bucket_counts[bucket] = 0
+        self.crossfade_bucket_counts[bucket] += 1
+        if self.events.listeners[events.CROSSFADE_STARTED]:
+            self.events.emit(events.CROSSFADE_STARTED, self.clock(), from_sound_key_for_fade, new_sound_key)
+        if self.layers_prewarmed and new_sound_key in self.layer_channels:
+            self._start_layer_crossfade(new_sound_key); return
         previous_active_channel = self.active_engine_channel
         self.active_engine_channel = self.inactive_engine_channel 
         self.inactive_engine_channel = previous_active_channel    
@@ -190,11 +393,75 @@ class AudioManager:
         elif self.inactive_engine_channel.get_busy(): # If no old sound but channel was busy, ensure it's set to full volume before fading out
             self.inactive_engine_channel.set_volume(self.main_engine_volume_config)
 
+    def _start_layer_crossfade(self, new_sound_key):
+        # Both loops are already running; only their gains move from here on
+        from_channel = self.layer_channels.get(self.crossfade_from_sound_key)
+        self.active_engine_channel = self.layer_channels[new_sound_key]
+        self.active_engine_channel.set_volume(0)
+        if from_channel and from_channel is not self.active_engine_channel:
+            self.inactive_engine_channel = from_channel
+            from_channel.set_volume(self.main_engine_volume_config)
+        else: # Nothing audible to fade out; park the other side on a muted layer
+            self.inactive_engine_channel = next(ch for ch in self.engine_channels if ch is not self.active_engine_channel)
+            self.inactive_engine_channel.set_volume(0)
+
+    def _retarget_crossfade(self, new_sound_key):
+        # Re-aim a running fade from the gains it has reached instead of stopping both voices
+        main_volume = self.main_engine_volume_config
+        progress = self.crossfade_progress
+        gain_to = self.crossfade_to_start_volume + (main_volume - self.crossfade_to_start_volume) * progress
+        gain_from = self.crossfade_from_start_volume * (1.0 - progress)
+        channel_plays = 0
+
+        if new_sound_key == self.crossfade_from_sound_key:
+            # Straight reversal: both voices keep playing, they just swap direction
+            self.active_engine_channel, self.inactive_engine_channel = self.inactive_engine_channel, self.active_engine_channel
+            self.crossfade_from_sound_key, self.crossfade_to_sound_key = self.crossfade_to_sound_key, new_sound_key
+            self.crossfade_from_start_volume, self.crossfade_to_start_volume = gain_to, gain_from
+            self.crossfade_reversals += 1
+        else:
+            # The louder voice becomes the one fading out; the new sound takes over the quieter side
+            if gain_to >= gain_from:
+                out_channel, out_key, out_gain = self.active_engine_channel, self.crossfade_to_sound_key, gain_to
+                spare_channel, spare_gain = self.inactive_engine_channel, gain_from
+            else:
+                out_channel, out_key, out_gain = self.inactive_engine_channel, self.crossfade_from_sound_key, gain_from
+                spare_channel, spare_gain = self.active_engine_channel, gain_to
+            self._finish_crossfade_tail()
+            if self.layers_prewarmed and new_sound_key in self.layer_channels:
+                new_channel = self.layer_channels[new_sound_key]
+                new_gain = 0.0 # Its layer is already running muted
+                if spare_channel is not new_channel and spare_channel is not out_channel and spare_gain > 0.0:
+                    self.crossfade_tail_channel, self.crossfade_tail_start_volume = spare_channel, spare_gain
+            else:
+                new_channel, new_gain = spare_channel, spare_gain
+                new_channel.play(self.get_sound(new_sound_key), loops=-1); channel_plays += 1
+                new_channel.set_volume(new_gain)
+            self.inactive_engine_channel, self.active_engine_channel = out_channel, new_channel
+            self.crossfade_from_sound_key, self.crossfade_to_sound_key = out_key, new_sound_key
+            self.crossfade_from_start_volume, self.crossfade_to_start_volume = out_gain, new_gain
+
+        self.current_loop_sound_key = self.crossfade_from_sound_key
+        self.crossfade_start_time = self.clock() * 1000; self.crossfade_progress = 0.0
+        self.crossfade_retargets += 1
+        if self.events.listeners[events.CROSSFADE_STARTED]:
+            self.events.emit(events.CROSSFADE_STARTED, self.clock(), self.crossfade_from_sound_key, new_sound_key)
+        self.channel_restarts_avoided += 2 - channel_plays # A restart plays both the old and the new loop again
+
+    def _finish_crossfade_tail(self):
+        if self.crossfade_tail_channel is None: return
+        self.crossfade_tail_channel.set_volume(0)
+        self.crossfade_tail_channel = None
+
     def _handle_crossfade(self):
-        if not self.is_crossfading or not pygame.mixer.get_init() or not self.active_engine_channel or not self.inactive_engine_channel: return
-        elapsed_time_ms = (time.time() * 1000) - self.crossfade_start_time
+        if not self.is_crossfading or not self.mixer.get_init() or not self.active_engine_channel or not self.inactive_engine_channel: return
+        elapsed_time_ms = (self.clock() * 1000) - self.crossfade_start_time
         progress = min(elapsed_time_ms / self.crossfade_duration_ms_config, 1.0)
-        vol_to = self.main_engine_volume_config * progress; vol_from = self.main_engine_volume_config * (1.0 - progress)
+        self.crossfade_progress = progress
+        vol_to = self.crossfade_to_start_volume + (self.main_engine_volume_config - self.crossfade_to_start_volume) * progress
+        vol_from = self.crossfade_from_start_volume * (1.0 - progress)
+        if self.crossfade_tail_channel is not None:
+            self.crossfade_tail_channel.set_volume(self.crossfade_tail_start_volume * (1.0 - progress))
         sound_to_obj = self.get_sound(self.crossfade_to_sound_key); sound_from_obj = self.get_sound(self.crossfade_from_sound_key)
         
         if sound_to_obj :
@@ -211,53 +478,67 @@ class AudioManager:
         self.xfade_log_counter +=1
 
         if progress >= 1.0:
-            if sound_from_obj and self.inactive_engine_channel.get_busy() and self.inactive_engine_channel.get_sound() == sound_from_obj:
+            self._finish_crossfade_tail()
+            if self.layers_prewarmed: self.inactive_engine_channel.set_volume(0) # Keep the layer running, muted
+            elif sound_from_obj and self.inactive_engine_channel.get_busy() and self.inactive_engine_channel.get_sound() == sound_from_obj:
                 self.inactive_engine_channel.stop()
             elif not sound_from_obj and self.inactive_engine_channel.get_busy(): self.inactive_engine_channel.stop() # Stop if no specific from_sound but was busy
             
             self.current_loop_sound_key = self.crossfade_to_sound_key; self.is_crossfading = False
+            if self.events.listeners[events.CROSSFADE_FINISHED]:
+                self.events.emit(events.CROSSFADE_FINISHED, self.clock(), self.crossfade_from_sound_key, self.crossfade_to_sound_key)
             if sound_to_obj:
                 if self.active_engine_channel.get_sound() != sound_to_obj or not self.active_engine_channel.get_busy():
                     self.active_engine_channel.play(sound_to_obj, loops=-1)
                 self.active_engine_channel.set_volume(self.main_engine_volume_config)
 
     def stop_engine_sounds_for_shutdown(self):
-        if not pygame.mixer.get_init(): return
+        if not self.mixer.get_init(): return
+        self._end_pack_fade()
         fade_time_ms = self.crossfade_duration_ms_config // 2 
-        if self.engine_channel1 and self.engine_channel1.get_busy(): self.engine_channel1.fadeout(fade_time_ms) 
-        if self.engine_channel2 and self.engine_channel2.get_busy(): self.engine_channel2.fadeout(fade_time_ms) 
-        self.current_loop_sound_key = None; self.is_crossfading = False 
+        for channel in self.engine_channels:
+            if channel.get_busy(): channel.fadeout(fade_time_ms) 
+        self.current_loop_sound_key = None; self.is_crossfading = False; self.layers_prewarmed = False; self.crossfade_tail_channel = None
 
     def stop_all_engine_sounds(self): 
-        if not pygame.mixer.get_init(): return
-        if self.engine_channel1 and self.engine_channel1.get_busy(): self.engine_channel1.stop()
-        if self.engine_channel2 and self.engine_channel2.get_busy(): self.engine_channel2.stop()
-        self.current_loop_sound_key = None; self.is_crossfading = False
+        if not self.mixer.get_init(): return
+        self._end_pack_fade()
+        for channel in self.engine_channels:
+            if channel.get_busy(): channel.stop()
+        self.current_loop_sound_key = None; self.is_crossfading = False; self.layers_prewarmed = False; self.crossfade_tail_channel = None
 
     def stop_all_sounds(self): 
-        if not pygame.mixer.get_init(): return
-        pygame.mixer.stop(); self.current_loop_sound_key = None; self.is_crossfading = False
+        if not self.mixer.get_init(): return
+        self._end_pack_fade()
+        self.mixer.stop(); self.current_loop_sound_key = None; self.is_crossfading = False; self.layers_prewarmed = False; self.crossfade_tail_channel = None
+        self.sfx_voices.release_all()
 
     def quit(self):
-        if pygame.mixer.get_init(): pygame.mixer.quit()
+        self.cancel_sound_pack_request()
+        if self.output_pump:
+            self.output_pump.close()
+            self.output_pump = None
+        if self.mixer.get_init(): self.mixer.quit()
 
     def update(self):
-        if not pygame.mixer.get_init(): return
+        if not self.mixer.get_init(): return
         if self.is_crossfading: self._handle_crossfade()
+        if self.pack_fade_channel is not None: self._handle_pack_fade()
+        if self.output_pump: self.output_pump.pump()
     
-    def is_sfx_channel_busy(self):
-        if not pygame.mixer.get_init() or not self.sfx_channel: return False
-        return self.sfx_channel.get_busy()
+    def is_engine_sfx_busy(self):
+        if not self.mixer.get_init(): return False
+        return self.sfx_voices.holds("engine_sfx")
 
     def is_any_engine_sound_playing(self, ignore_sfx=False):
-        if not pygame.mixer.get_init(): return False
-        c1_busy = self.engine_channel1 and self.engine_channel1.get_busy()
-        c2_busy = self.engine_channel2 and self.engine_channel2.get_busy()
+        if not self.mixer.get_init(): return False
+        engine_busy = any(channel.get_busy() for channel in self.engine_channels)
         
         if ignore_sfx:
-            return c1_busy or c2_busy or self.is_crossfading
+            return engine_busy or self.is_crossfading
 
-        sfx_ch_busy = self.sfx_channel and self.sfx_channel.get_busy()
-        burst_pop_ch_busy = self.burst_pop_channel and self.burst_pop_channel.get_busy()
-        
-        return c1_busy or c2_busy or self.is_crossfading or sfx_ch_busy or burst_pop_ch_busy
\ No newline at end of file
+        return engine_busy or self.is_crossfading or self.sfx_voices.any_busy()
+
+
+def _channel_busy(channel):
+    return channel.get_busy()
@@ -0,0 +1,269 @@
+# audio_sinks.py
+# Output sinks for the software mixer (soft_mixer.py): speakers, WAV file, raw PCM on
+# stdout, a null sink for benchmarking and the scope tap feeding the UI's waveform and
+# spectrum (scope_panel.py). Several sinks can be active at once.
+#
+# MixerPump is called from AudioManager.update() on the sim thread. It renders whatever
+# mixer buffers are due and hands the bytes to each sink with a non-blocking put; file
+# and pipe sinks write from their own thread, so a slow disk drops blocks (counted)
+# instead of stalling the tick.
+import queue
+import sys
+import threading
+import wave
+from collections import deque
+
+import numpy as np
+
+import config
+from ringlog import log
+
+
+class NullSink:
+    name = "null"
+
+    def __init__(self):
+        self.frames_written = 0
+        self.dropped_blocks = 0
+
+    def write(self, block):
+        self.frames_written += len(block)
+
+    def close(self):
+        pass
+
+
+class ThreadedSink:
+    name = "threaded"
+
+    def __init__(self, max_queued_blocks=config.SINK_QUEUE_BLOCKS):
+        self.blocks = queue.Queue(maxsize=max_queued_blocks)
+        self.frames_written = 0
+        self.dropped_blocks = 0
+        self.thread = threading.Thread(target=self._writer_loop, name=f"sink-{self.name}", daemon=True)
+        self.thread.start()
+
+    def write(self, block):
+        try:
+            self.blocks.put_nowait(block.tobytes())
+        except queue.Full:
+            self.dropped_blocks += 1
+            return
+        self.frames_written += len(block)
+
+    def _writer_loop(self):
+        while True:
+            data = self.blocks.get()
+            if data is None: break
+            try:
+                self._write_bytes(data)
+            except (OSError, ValueError) as e:
+                log.warning("AUDIO_SINK", "{} write failed, sink disabled: {}", self.name, e)
+                break
+        self._close_output()
+
+    def close(self):
+        self.blocks.put(None) # Blocking here is fine: only called at shutdown
+        self.thread.join(timeout=5)
+
+    def _write_bytes(self, data):
+        raise NotImplementedError
+
+    def _close_output(self):
+        pass
+
+
+class WavFileSink(ThreadedSink):
+    name = "wav"
+
+    def __init__(self, path=config.WAV_SINK_PATH, frequency=config.MIXER_FREQUENCY, channels=config.MIXER_CHANNELS):
+        self.path = path
+        self.wav = wave.open(path, "wb")
+        self.wav.setnchannels(channels)
+        self.wav.setsampwidth(2)
+        self.wav.setframerate(frequency)
+        super().__init__()
+        log.info("AUDIO_SINK", "Recording to {}", path)
+
+    def _write_bytes(self, data):
+        self.wav.writeframesraw(data)
+
+    def _close_output(self):
+        self.wav.close() # Patches the RIFF header with the final length
+        log.info("AUDIO_SINK", "Closed {} ({} frames, {} blocks dropped)", self.path, self.frames_written, self.dropped_blocks)
+
+
+class RawPcmSink(ThreadedSink):
+    name = "pcm_stdout"
+
+    def __init__(self):
+        # Take the real stdout for PCM and send everything printed from now on to stderr
+        self.stream = sys.stdout.buffer
+        sys.stdout = sys.stderr
+        super().__init__()
+        log.info("AUDIO_SINK", "Writing s16le {}ch {} Hz PCM to stdout", config.MIXER_CHANNELS, config.MIXER_FREQUENCY)
+
+    def _write_bytes(self, data):
+        self.stream.write(data)
+
+    def _close_output(self):
+        try:
+            self.stream.flush()
+        except (OSError, ValueError):
+            pass
+
+
+class SpeakerSink:
+    name = "speakers"
+
+    def __init__(self, frequency=config.MIXER_FREQUENCY, channels=config.MIXER_CHANNELS, buffer_size=config.MIXER_BUFFER_SIZE):
+        import pygame
+        from pygame._sdl2 import audio as sdl_audio
+        if not pygame.get_init(): pygame.init()
+        self.pending = deque()
+        self.pending_bytes = 0
+        self.max_pending_bytes = buffer_size * channels * 2 * config.SINK_QUEUE_BLOCKS
+        self.frames_written = 0
+        self.dropped_blocks = 0
+        self.underruns = 0 # Device callbacks that found less audio than they needed
+        self.lock = threading.Lock()
+        device_names = sdl_audio.get_audio_device_names(False)
+        if not device_names:
+            raise RuntimeError("AUDIO_SINK: No audio output device found.")
+        self.device = sdl_audio.AudioDevice(devicename=device_names[0], iscapture=False, frequency=frequency,
+                                            audioformat=sdl_audio.AUDIO_S16, numchannels=channels,
+                                            chunksize=buffer_size, allowed_changes=0, callback=self._callback)
+        self.device.pause(0)
+
+    def write(self, block):
+        data = block.tobytes()
+        with self.lock:
+            if self.pending_bytes + len(data) > self.max_pending_bytes:
+                self.dropped_blocks += 1
+                return
+            self.pending.append(data)
+            self.pending_bytes += len(data)
+        self.frames_written += len(block)
+
+    def _callback(self, audio_device, stream):
+        needed = len(stream)
+        out = bytearray()
+        with self.lock:
+            while self.pending and len(out) < needed:
+                data = self.pending.popleft()
+                take = needed - len(out)
+                out += data[:take]
+                if len(data) > take: self.pending.appendleft(data[take:])
+            self.pending_bytes -= len(out)
+        if len(out) < needed:
+            self.underruns += 1
+            out += bytes(needed - len(out))
+        stream[:] = bytes(out)
+
+    def close(self):
+        self.device.pause(1)
+        self.device.close()
+
+
+class ScopeSink:
+    # Ring of the newest output blocks for the UI thread. Same seqlock scheme as telemetry.py:
+    # the writer marks a slot odd, copies the block into preallocated memory and marks it even;
+    # a reader that sees the sequence change under it drops that block (dropped_blocks), so
+    # neither side waits.
+    name = "scope"
+
+    def __init__(self, buffer_size=config.MIXER_BUFFER_SIZE, channels=config.MIXER_CHANNELS,
+                 min_frames=config.SCOPE_FFT_SIZE):
+        # Enough whole blocks for min_frames, plus the one being written and one spare
+        capacity = -(-min_frames // buffer_size) + 2
+        self.capacity = capacity
+        self.block_frames = buffer_size
+        self.blocks = np.zeros((capacity, buffer_size, channels), dtype=np.int16)
+        self.seq = [0] * capacity
+        self.write_count = 0
+        self.frames_written = 0
+        self.dropped_blocks = 0 # Counted by the reader: blocks rewritten before it could copy them
+
+    def write(self, block):
+        n = self.write_count
+        slot = n % self.capacity
+        self.seq[slot] = 2 * n + 1
+        frames = min(len(block), self.block_frames)
+        self.blocks[slot, :frames] = block[:frames]
+        self.seq[slot] = 2 * n + 2
+        self.write_count = n + 1
+        self.frames_written += frames
+
+    def read_latest(self, out):
+        # Mono mix (summed channels) of the newest len(out) frames, written right-aligned into
+        # out; returns how many frames at the end of out are valid. Never touches the slot
+        # being written.
+        count = self.write_count
+        frames = self.block_frames
+        filled = 0
+        for m in range(count - 1, max(-1, count - self.capacity), -1):
+            if filled >= len(out): break
+            slot = m % self.capacity
+            if self.seq[slot] != 2 * m + 2:
+                self.dropped_blocks += 1
+                break
+            take = min(frames, len(out) - filled)
+            dest = out[len(out) - filled - take:len(out) - filled]
+            block = self.blocks[slot, frames - take:]
+            np.copyto(dest, block[:, 0])
+            for ch in range(1, block.shape[1]): dest += block[:, ch]
+            if self.seq[slot] != 2 * m + 2: # Overwritten while we copied it
+                self.dropped_blocks += 1
+                break
+            filled += take
+        return filled
+
+    def close(self):
+        pass
+
+
+class MixerPump:
+    def __init__(self, mixer_module, sinks, clock, buffer_size=config.MIXER_BUFFER_SIZE, frequency=config.MIXER_FREQUENCY):
+        self.mixer = mixer_module
+        self.sinks = list(sinks)
+        self.clock = clock
+        self.buffer_size = buffer_size
+        self.buffer_period = buffer_size / float(frequency)
+        self.start_time = None
+        self.buffers_rendered = 0
+
+    def pump(self):
+        now = self.clock()
+        if self.start_time is None: self.start_time = now - self.buffer_period # Keep one buffer ahead
+        due = int((now - self.start_time) / self.buffer_period)
+        # After a long stall, skip ahead rather than bursting out a backlog
+        if due - self.buffers_rendered > config.SINK_QUEUE_BLOCKS:
+            self.buffers_rendered = due - 1
+        while self.buffers_rendered < due:
+            block = self.mixer.render(self.buffer_size)
+            for sink in self.sinks:
+                sink.write(block)
+            self.buffers_rendered += 1
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+def create_sinks(names, buffer_size=config.MIXER_BUFFER_SIZE):
+    sink_factories = {
+        "speakers": lambda: SpeakerSink(buffer_size=buffer_size),
+        "wav": WavFileSink,
+        "pcm_stdout": RawPcmSink,
+        "null": NullSink,
+    }
+    sinks = []
+    for name in names:
+        if name not in sink_factories:
+            log.warning("AUDIO_SINK", "Unknown sink '{}', ignored.", name)
+            continue
+        try:
+            sinks.append(sink_factories[name]())
+        except (OSError, RuntimeError) as e:
+            log.warning("AUDIO_SINK", "Could not open sink '{}': {}", name, e)
+    return sinks
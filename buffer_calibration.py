@@ -0,0 +1,255 @@
+# buffer_calibration.py
+# Picks the smallest mixer buffer that plays without underruns on this machine.
+#
+# Calibration (python buffer_calibration.py) measures each candidate size under the app's
+# own audio load: the engine runs on soft_mixer, a 120 Hz sim loop ticks it through a
+# throttle sweep and pumps rendered blocks into an SDL output device opened with that size,
+# as with AUDIO_OUTPUT_SINKS = ("speakers",). Every device callback is timestamped. A
+# callback that falls more than one buffer behind the ideal schedule, or finds no rendered
+# audio waiting, is an underrun; the spread of callback intervals is the jitter. The
+# smallest size that stays free of underruns with acceptable jitter in every one of
+# BUFFER_CALIBRATION_TRIALS runs is written to config.BUFFER_CALIBRATION_FILE for this host.
+#
+# At runtime UnderrunMonitor reads the real starvation counters of the output sinks that
+# have a device callback (audio_sinks.SpeakerSink.underruns) and warns, at most every
+# UNDERRUN_WARNING_INTERVAL_S, when they grow, since the calibrated size is then too small.
+# pygame.mixer does not expose its callback, so on that path it can only watch the sim loop:
+# a tick arriving more than one mixer buffer later than scheduled means at least one buffer
+# went out with stale crossfade gains. Counted as suspected underruns so degraded hosts stand
+# out in the metrics.
+import json
+import os
+import socket
+import statistics
+import sys
+import time
+from array import array
+
+import config
+from audio_sinks import SpeakerSink, MixerPump
+from ringlog import log
+
+SIM_TICK_S = 1.0 / 120 # main.py's sim loop rate
+WARMUP_S = 0.5 # Per run, before callbacks count: the device and the pump settle in
+
+
+def _buffer_period_s(buffer_size, frequency):
+    return buffer_size / float(frequency)
+
+
+class _TimedSpeakerSink(SpeakerSink):
+    # SpeakerSink that timestamps its device callbacks
+    def __init__(self, buffer_size, max_callbacks, frequency, channels):
+        self.stamps = array("d", bytes(8 * max_callbacks))
+        self.count = 0
+        super().__init__(frequency=frequency, channels=channels, buffer_size=buffer_size)
+
+    def _callback(self, audio_device, stream):
+        n = self.count
+        if n < len(self.stamps):
+            self.stamps[n] = time.perf_counter()
+            self.count = n + 1
+        SpeakerSink._callback(self, audio_device, stream)
+
+
+class CalibrationLoad:
+    # The engine on soft_mixer, started once and kept running across every candidate
+    def __init__(self, frequency=config.MIXER_FREQUENCY, channels=config.MIXER_CHANNELS):
+        import soft_mixer
+        from audio_manager import AudioManager
+        from engine_simulator import EngineSimulator, EngineState
+        if soft_mixer.get_init(): soft_mixer.quit()
+        soft_mixer.init(frequency=frequency, size=config.MIXER_SIZE, channels=channels, buffer=config.MIXER_BUFFER_SIZE)
+        self.mixer = soft_mixer
+        self.frequency = frequency
+        self.audio_manager = AudioManager(
+            mixer_frequency=frequency, mixer_size=config.MIXER_SIZE, mixer_channels=channels,
+            mixer_buffer=config.MIXER_BUFFER_SIZE, num_audio_channels=config.NUM_AUDIO_CHANNELS,
+            sound_files=config.SOUND_FILES, sfx_volume=config.SFX_VOLUME, main_engine_volume=config.MAIN_ENGINE_VOLUME,
+            crossfade_duration_ms=config.CROSSFADE_DURATION_MS, accel_burst_cooldown_ms=config.ACCEL_BURST_COOLDOWN_MS,
+            decel_pop_cooldown_ms=config.DECEL_POP_COOLDOWN_MS, enable_accel_burst=config.ENABLE_ACCEL_BURST,
+            enable_decel_pops=config.ENABLE_DECEL_POPS, mixer_module=soft_mixer)
+        self.engine_simulator = EngineSimulator(self.audio_manager)
+        self.started_at = time.perf_counter()
+        self.engine_simulator.start_engine()
+        # The starter has to finish before the loops (and the throttle) come in
+        deadline = self.started_at + config.STARTER_TIMEOUT_S + 1.0
+        while self.engine_simulator.get_state() != EngineState.IDLE and time.perf_counter() < deadline:
+            self.tick()
+            time.sleep(SIM_TICK_S)
+
+    def tick(self):
+        # Triangle sweep, 0 -> 1 -> 0 every 4 s: band crossfades, bursts and pops keep coming
+        phase = ((time.perf_counter() - self.started_at) % 4.0) / 2.0
+        self.engine_simulator.set_throttle(phase if phase <= 1.0 else 2.0 - phase)
+        self.engine_simulator.update()
+
+    def run(self, sink, buffer_size, duration_s):
+        # main.py's loop: tick, then sleep out the rest of the tick period
+        self.audio_manager.output_pump = MixerPump(self.mixer, [sink], self.audio_manager.clock, buffer_size, self.frequency)
+        end = time.perf_counter() + duration_s
+        try:
+            while True:
+                loop_start = time.perf_counter()
+                if loop_start >= end: break
+                self.tick()
+                sleep_time = SIM_TICK_S - (time.perf_counter() - loop_start)
+                if sleep_time > 0: time.sleep(sleep_time)
+        finally:
+            self.audio_manager.output_pump = None
+
+    def close(self):
+        self.audio_manager.stop_all_sounds()
+        self.audio_manager.quit()
+
+
+def measure_buffer_size(buffer_size, load, duration_s=config.BUFFER_CALIBRATION_SECONDS,
+                        frequency=config.MIXER_FREQUENCY, channels=config.MIXER_CHANNELS):
+    max_callbacks = int((duration_s + WARMUP_S) * frequency / buffer_size) * 2 + 16
+    sink = _TimedSpeakerSink(buffer_size, max_callbacks, frequency, channels)
+    try:
+        load.run(sink, buffer_size, WARMUP_S)
+        sink.count = 0
+        sink.underruns = 0
+        load.run(sink, buffer_size, duration_s)
+    finally:
+        sink.close()
+
+    stamps = sink.stamps
+    n = min(sink.count, max_callbacks)
+    period = _buffer_period_s(buffer_size, frequency)
+    intervals = [stamps[i + 1] - stamps[i] for i in range(n - 1)]
+    underruns = 0
+    origin = stamps[0] if n else 0.0
+    expected_index = 0
+    for i in range(n):
+        # How far this callback is behind where a perfectly regular device would be
+        lateness = (stamps[i] - origin) - expected_index * period
+        if lateness > period:
+            underruns += 1
+            origin, expected_index = stamps[i], 0 # Re-sync after the dropout
+        expected_index += 1
+    return {
+        "buffer_size": buffer_size,
+        "callbacks": n,
+        "period_ms": period * 1000.0,
+        "underruns": underruns,
+        "starved_callbacks": sink.underruns, # Found less rendered audio than the device asked for
+        "jitter_ms": statistics.pstdev(intervals) * 1000.0 if len(intervals) > 1 else 0.0,
+        "max_interval_ms": max(intervals) * 1000.0 if intervals else 0.0,
+    }
+
+
+def is_stable(result):
+    if result["callbacks"] < 2 or result["underruns"] > 0 or result["starved_callbacks"] > 0: return False
+    return result["jitter_ms"] <= result["period_ms"] * config.BUFFER_CALIBRATION_MAX_JITTER_FRACTION
+
+
+def calibrate(candidates=config.BUFFER_CALIBRATION_CANDIDATES, duration_s=config.BUFFER_CALIBRATION_SECONDS,
+              trials=config.BUFFER_CALIBRATION_TRIALS):
+    import pygame
+    from pygame._sdl2 import sdl2
+    pygame.init()
+    if pygame.mixer.get_init(): pygame.mixer.quit() # The calibration device needs the audio output to itself
+    sdl2.init_subsystem(sdl2.INIT_AUDIO) # mixer.quit() took SDL audio down with it
+    print("BUFFER_CAL: Starting the engine for the calibration load...")
+    load = CalibrationLoad()
+    results = []
+    chosen = None
+    try:
+        for buffer_size in sorted(candidates):
+            stable_runs = 0
+            for trial in range(trials):
+                result = measure_buffer_size(buffer_size, load, duration_s)
+                result["trial"] = trial + 1
+                result["stable"] = is_stable(result)
+                results.append(result)
+                print(f"BUFFER_CAL: {buffer_size:5d} frames ({result['period_ms']:.1f} ms) run {trial + 1}/{trials}: "
+                      f"underruns={result['underruns']} starved={result['starved_callbacks']} "
+                      f"jitter={result['jitter_ms']:.2f} ms max_interval={result['max_interval_ms']:.1f} ms "
+                      f"-> {'OK' if result['stable'] else 'unstable'}")
+                if not result["stable"]: break
+                stable_runs += 1
+            if stable_runs == trials:
+                chosen = buffer_size
+                break
+    finally:
+        load.close()
+    if chosen is None:
+        chosen = max(candidates)
+        print(f"BUFFER_CAL: WARNING - No candidate was stable, falling back to the largest ({chosen}).")
+    return chosen, results
+
+
+def save_calibration(buffer_size, results, path=config.BUFFER_CALIBRATION_FILE):
+    data = {
+        "host": socket.gethostname(),
+        "frequency": config.MIXER_FREQUENCY,
+        "channels": config.MIXER_CHANNELS,
+        "buffer_size": buffer_size,
+        "calibrated_at": time.time(),
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+    print(f"BUFFER_CAL: Saved buffer size {buffer_size} for host '{data['host']}' to {path}")
+
+
+def load_calibrated_buffer_size(default=config.MIXER_BUFFER_SIZE, path=config.BUFFER_CALIBRATION_FILE):
+    if not config.USE_CALIBRATED_BUFFER_SIZE or not os.path.exists(path): return default
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        log.warning("BUFFER_CAL", "Could not read {}: {}", path, e)
+        return default
+    if data.get("host") != socket.gethostname() or data.get("frequency") != config.MIXER_FREQUENCY or \
+       data.get("channels") != config.MIXER_CHANNELS:
+        log.info("BUFFER_CAL", "{} was calibrated for another host/format, using default buffer {}.", path, default)
+        return default
+    return int(data.get("buffer_size", default))
+
+
+class UnderrunMonitor:
+    def __init__(self, buffer_size, frequency=config.MIXER_FREQUENCY, sinks=(),
+                 warning_interval_s=config.UNDERRUN_WARNING_INTERVAL_S):
+        self.buffer_size = buffer_size
+        self.buffer_period_s = _buffer_period_s(buffer_size, frequency)
+        self.last_tick_time = None
+        self.suspected_underruns = 0
+        self.worst_gap_s = 0.0
+        # Sinks whose device callback counts real starvation (written on the audio thread)
+        self.sinks = [sink for sink in sinks if hasattr(sink, "underruns")]
+        self.warning_interval_s = warning_interval_s
+        self.next_check_time = None
+        self.reported_underruns = 0
+
+    def device_underruns(self):
+        # Total device callbacks that found less audio than they needed, over every sink
+        return sum(sink.underruns for sink in self.sinks)
+
+    def record_tick(self, now, expected_interval_s):
+        last = self.last_tick_time
+        self.last_tick_time = now
+        if self.sinks: self._check_sinks(now)
+        if last is None: return
+        gap = now - last
+        if gap > expected_interval_s + self.buffer_period_s:
+            self.suspected_underruns += 1
+            if gap > self.worst_gap_s: self.worst_gap_s = gap
+
+    def _check_sinks(self, now):
+        if self.next_check_time is not None and now < self.next_check_time: return
+        self.next_check_time = now + self.warning_interval_s
+        total = self.device_underruns()
+        new = total - self.reported_underruns
+        if new <= 0: return
+        self.reported_underruns = total
+        log.warning("BUFFER_CAL", "Output device starved {} times ({} total) with a {}-frame buffer; "
+                    "re-run python buffer_calibration.py or raise MIXER_BUFFER_SIZE.", new, total, self.buffer_size)
+
+
+if __name__ == "__main__":
+    candidate_sizes = [int(arg) for arg in sys.argv[1:]] or list(config.BUFFER_CALIBRATION_CANDIDATES)
+    best_size, calibration_results = calibrate(candidate_sizes)
+    save_calibration(best_size, calibration_results)
@@ -45,15 +45,58 @@ RPM_RANGES = {
 RPM_ACCEL_RATE = 7000
 RPM_DECEL_RATE = 6000
 RPM_IDLE_RETURN_RATE = 1500
+SIMULATION_RNG_SEED = None # Set an int to make random effects (decel pop chance) repeat run to run
+
+# --- Throttle Response (throttle_curves.py) ---
+# Throttle (0..1) -> fraction of the idle-to-max RPM span, per vehicle profile. Kinds: "power"
+# (exponent), "breakpoints" and "spline" (points [(throttle, effect), ...] from 0.0 to 1.0).
+THROTTLE_CURVES = {
+    "default": {"kind": "power", "exponent": 0.7},
+    "eco": {"kind": "breakpoints", "points": [(0.0, 0.0), (0.3, 0.12), (0.7, 0.45), (1.0, 0.8)]},
+    "sport": {"kind": "spline", "points": [(0.0, 0.0), (0.2, 0.35), (0.5, 0.75), (1.0, 1.0)]},
+}
+THROTTLE_PROFILE = "default"
+THROTTLE_CURVE_TABLE_SIZE = 101 # Table entries over 0..1; 101 puts every 1% slider step on an exact entry
+
+# --- Throttle Input Conditioning (throttle_input.py) ---
+# Applied to the slider value once per sim tick, before set_throttle. Stages in order (see
+# throttle_input.py); the CircuitPython build declares its own chain in config_cp.py.
+# Hysteresis absorbs a one-step wobble of the hand at a band edge, the short EMA rounds off
+# pixel steps; both leave a flick fast enough for the accel/decel gestures.
+THROTTLE_INPUT_FILTER = [
+    {"kind": "hysteresis", "width": 0.012},
+    {"kind": "ema", "tau_s": 0.015},
+]
 
 # --- Audio Playback ---
 MAIN_ENGINE_VOLUME = 0.7
 SFX_VOLUME = 0.8
 CROSSFADE_DURATION_MS = 450
+ENABLE_CROSSFADE_RETARGET = True # New target mid-fade: continue from current gains instead of restarting both channels
+ENABLE_PREDICTIVE_CROSSFADE = False # Start band crossfades early from the RPM trajectory
+PREDICTIVE_CROSSFADE_TOLERANCE_S = 0.1 # Slack before an unconfirmed prediction counts as a miss
+ENABLE_PREWARMED_ENGINE_LAYERS = False # Keep every loop running muted from IDLE on; band switches only change gains
+ENGINE_LAYER_KEYS = ("idle", "low_rpm", "mid_rpm", "high_rpm", "cruise") # Needs len + 2 channels (2 left for SFX)
+
+# --- Sound Packs / Vehicle Profiles (sound_pack.py) ---
+# A pack is a set of sound files plus optional "config" overrides of the tuning in this file
+# (RPM table, rates, throttle profile, SOUND_DURATIONS, ...). Switching SOUND_PACK (or editing
+# the active pack) while the app runs loads the new pack in the background; it takes over,
+# together with its overrides, at the next idle moment (engine off, or idling with no fade or
+# SFX playing), crossfading the running loop over SOUND_PACK_CROSSFADE_MS.
+SOUND_PACKS = {
+    "default": {"sound_files": SOUND_FILES},
+    "sport": {"sound_files": SOUND_FILES, # Same recordings, revvier tuning
+              "config": {"MAX_RPM": 8500, "RPM_ACCEL_RATE": 9000, "THROTTLE_PROFILE": "sport",
+                         "RPM_RANGES": {"idle": (MIN_RPM, 1200), "low_rpm": (1000, 3200),
+                                        "mid_rpm": (2900, 5800), "high_rpm": (5500, 8500)},
+                         "CRUISE_RPM_THRESHOLD": 8500 - 150}},
+}
+SOUND_PACK = "default"
+SOUND_PACK_CROSSFADE_MS = 800
 
 # --- Optional Features ---
 ENABLE_ACCEL_BURST = True
-ACCEL_BURST_HISTORY_DURATION_S = 0.3
 ACCEL_BURST_FLICK_WINDOW_S = 0.2
 ACCEL_BURST_MIN_END_THROTTLE = 0.90
 ACCEL_BURST_MAX_START_THROTTLE = 0.60
@@ -75,6 +118,24 @@ DECEL_POP_LINGER_DURATION_S = 4.0
 DECEL_POP_RPM_FALL_RATE_MODIFIER = 0.35
 DECEL_POP_SFX_VOLUME_MULTIPLIER = 0.95
 
+# --- Gestures (compiled to state machines by gestures.py) ---
+# Kinds and their parameters are listed at the top of gestures.py. accel_burst and decel_pop drive
+# the effects above; any other enabled gesture plays its "sfx" on a pooled voice (category "gesture",
+# or its "voice_category" option) when one is free or stealable.
+GESTURES = {
+    "accel_burst": {"kind": "rise", "enabled": ENABLE_ACCEL_BURST,
+                    "from_max": ACCEL_BURST_MAX_START_THROTTLE, "to_min": ACCEL_BURST_MIN_END_THROTTLE,
+                    "min_jump": ACCEL_BURST_MIN_JUMP_VALUE, "within_s": ACCEL_BURST_FLICK_WINDOW_S},
+    "decel_pop": {"kind": "drop_then_rpm", "enabled": ENABLE_DECEL_POPS,
+                  "from_min": DECEL_POP_HIGH_THROTTLE_THRESHOLD, "to_max": DECEL_POP_LOW_THROTTLE_THRESHOLD,
+                  "min_drop": DECEL_POP_MIN_DROP_VALUE, "within_s": DECEL_POP_MAX_FLICK_DURATION_S,
+                  "rpm_above": DECEL_POP_RPM_THRESHOLD, "rpm_within_s": DECEL_POP_RPM_CHECK_WINDOW_S,
+                  "cancel_above": DECEL_POP_LOW_THROTTLE_THRESHOLD + 0.05}, # Hysteresis
+    "double_blip": {"kind": "double_blip", "enabled": False,
+                    "low": 0.15, "high": 0.60, "within_s": 0.6,
+                    "sfx": "accel_burst", "volume_multiplier": 0.8},
+}
+
 # --- Cruise Feature ---
 ENABLE_CRUISE_SOUND = True
 CRUISE_THROTTLE_ENTER_THRESHOLD = 0.98
@@ -90,5 +151,115 @@ THROTTLE_SIGNIFICANTLY_OPEN = 0.10 # Restored: Used to cancel decel pop linger e
 MIXER_FREQUENCY = 44100
 MIXER_SIZE = -16
 MIXER_CHANNELS = 2
-MIXER_BUFFER_SIZE = 1024
-NUM_AUDIO_CHANNELS = 8
\ No newline at end of file
+MIXER_BUFFER_SIZE = 1024 # Default; replaced by the per-host value from buffer_calibration.py when present
+NUM_AUDIO_CHANNELS = 8
+
+# --- SFX Voices (voice_pool.py) ---
+# Channels the engine loops do not use form one SFX pool. Per category: (priority, max voices
+# or None). A play with no free voice steals the quietest, then oldest, voice of a lower
+# priority; with nothing lower it is dropped. A category at its max voices replaces its own
+# oldest voice. More channels simply mean more overlapping SFX.
+VOICE_CATEGORIES = {
+    "engine_sfx": (3, 1),     # Starter / shutdown; the engine state waits on it, a new one replaces the old
+    "accel_burst": (2, None),
+    "decel_pop": (2, None),
+    "gesture": (1, None),     # Declared gestures' "sfx"
+}
+
+# --- Mixer Buffer Calibration (python buffer_calibration.py) ---
+USE_CALIBRATED_BUFFER_SIZE = True
+BUFFER_CALIBRATION_FILE = "audio_calibration.json"
+BUFFER_CALIBRATION_CANDIDATES = (256, 512, 1024, 2048, 4096)
+BUFFER_CALIBRATION_SECONDS = 3.0 # Per run, with the engine sweeping through its bands as load
+BUFFER_CALIBRATION_TRIALS = 2 # A candidate has to pass every run
+BUFFER_CALIBRATION_MAX_JITTER_FRACTION = 0.5 # Callback interval std-dev allowed, relative to one buffer period
+UNDERRUN_WARNING_INTERVAL_S = 10.0 # At most one "device starved" warning per interval at runtime
+
+# --- Telemetry (shared-memory ring for external dashboards) ---
+ENABLE_TELEMETRY_RING = False
+TELEMETRY_RING_NAME = "scooter_engine_telemetry"
+TELEMETRY_RING_SLOTS = 4096 # ~34 s of history at the 120 Hz sim rate
+
+# --- Engine Events (events.py) ---
+LOG_ENGINE_EVENTS = False # Print every engine event (state/band/crossfade/SFX) to the console
+
+# --- Tick Trace (tick_trace.py; press F9 in the window to dump) ---
+ENABLE_TICK_TRACE = True
+TRACE_CAPACITY = 4096 # Ticks kept (~34 s at 120 Hz)
+TRACE_DUMP_DIR = "traces"
+TRACE_DUMP_ON_ANOMALY = True
+TRACE_ANOMALY_TICK_GAP_S = 0.1 # A sim tick this late means buffers went out with stale gains
+TRACE_ANOMALY_COOLDOWN_S = 30.0
+
+# --- Metrics (Prometheus text endpoint) ---
+ENABLE_METRICS_ENDPOINT = False
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9109
+METRICS_TICK_WINDOW = 1024 # Ticks kept for the latency percentiles
+
+# --- Latency Harness (python latency_harness.py) ---
+LATENCY_HARNESS_TRIALS = 8 # Per scenario; input phases are spread across one tick period
+LATENCY_ONSET_THRESHOLD_DBFS = -50.0 # Difference power (2 ms windows) that counts as audible
+
+# --- Output Sinks ---
+# () keeps the plain pygame.mixer path. Any of "speakers", "wav", "pcm_stdout", "null" switches
+# to the software mixer (soft_mixer.py) and sends its output to every listed sink,
+# e.g. ("speakers", "wav") to listen and record at the same time.
+AUDIO_OUTPUT_SINKS = ()
+WAV_SINK_PATH = "engine_output.wav"
+SINK_QUEUE_BLOCKS = 64 # Mixer buffers a sink may fall behind before blocks are dropped
+
+# --- Live Gauge and Scope Panel (scope_panel.py) ---
+# RPM gauge plus waveform and spectrum of the mixed output, redrawn at SCOPE_FPS on the Tk
+# thread. Waveform and spectrum need the software mixer (AUDIO_OUTPUT_SINKS not empty), whose
+# blocks are tapped into a lock-free ring (audio_sinks.ScopeSink); on the plain pygame.mixer
+# path only the gauge runs. The panel never switches the audio path by itself: pygame.mixer
+# stays the default, and the scope only shows output once a sink is opted into here.
+ENABLE_SCOPE_PANEL = True
+SCOPE_FPS = 30
+SCOPE_FFT_SIZE = 2048 # Output frames analysed per display frame; the waveform shows the first half
+SCOPE_WAVEFORM_POINTS = 256
+SCOPE_SPECTRUM_BANDS = 48 # Log-spaced from 40 Hz to Nyquist (narrow low bands may merge)
+SCOPE_SPECTRUM_FLOOR_DB = -90
+
+# --- Golden Audio Regression (python golden_audio.py [--update]) ---
+GOLDEN_AUDIO_FILE = "golden_audio.json"
+GOLDEN_AUDIO_ENVELOPE_WINDOW_S = 0.25 # RMS envelope resolution stored alongside the exact hash, for diagnosis
+
+# --- Logging (ringlog.py) ---
+LOG_LEVEL = "INFO" # DEBUG / INFO / WARNING / ERROR
+LOG_RING_SIZE = 2048 # Records buffered before the oldest are dropped
+LOG_FLUSH_INTERVAL_S = 0.05
+LOG_RATE_LIMIT_S = 5.0 # Window for log.warning_limited() repeats
+
+# --- Live Config Reload (config_snapshot.py) ---
+ENABLE_CONFIG_RELOAD = True # Edit and save this file while the app runs to retune it
+CONFIG_RELOAD_INTERVAL_S = 1.0 # How often the file's mtime is checked
+
+# --- CircuitPython Emulator (python -m cp_emulator) ---
+CP_EMU_DEVICE_DIR = "CircuitPy" # Where code.py and the *_cp modules live
+CP_EMU_SD_ROOT = "CircuitPy" # Host directory mounted at /sd (so /sd/sounds is CircuitPy/sounds)
+CP_EMU_OUTPUT_WAV = "cp_emulator_output.wav"
+CP_EMU_CPU_SCALE = 0.0 # Host-to-device CPU time factor charged to the virtual clock; 0 keeps runs deterministic
+CP_EMU_SD_BYTES_PER_S = 1_000_000 # Sustained SPI SD read rate on the ESP32
+CP_EMU_SD_READ_LATENCY_S = 0.0003 # Per voice per mixer buffer (command + seek)
+CP_EMU_MIX_S_PER_VOICE_FRAME = 0.2e-6 # audiomixer cost per voice per output frame
+CP_EMU_DESKTOP_TICK_HZ = 60 # code.py's TARGET_FPS, for --compare-desktop
+CP_EMU_TICKS_START_MS = (1 << 29) - 10_000 # supervisor.ticks_ms at boot; 10 s before its 2**29 wrap so runs cross it
+
+# --- Device Sound Packs (python device_pack.py) ---
+DEVICE_PACK_TARGETS = {
+    # Rate and voice count come from the device config, so the pack always matches its mixer
+    # --stage-code copies code_dir plus the portable root modules in shared_modules to drive_out_dir
+    "circuitpy": {"device_config": "CircuitPy/config_cp.py", "channels": 1, "out_dir": os.path.join("build", "circuitpy_pack"),
+                  "code_dir": "CircuitPy", "shared_modules": ["throttle_input.py", "engine_core.py", "gestures.py", "voice_pool.py", "throttle_curves.py"],
+                  "drive_out_dir": os.path.join("build", "circuitpy_drive")},
+}
+DEVICE_PACK_DEFAULT_TARGET = "circuitpy"
+DEVICE_PACK_LOOP_POINTS = {} # key -> (start_s, end_s); overrides a 'smpl' chunk, otherwise loops keep the whole file
+DEVICE_PACK_LOOP_RMS_DBFS = -20.0
+DEVICE_PACK_SFX_RMS_DBFS = -16.0
+DEVICE_PACK_GAIN_OFFSETS_DB = {} # key -> dB on top of its loop/SFX target
+DEVICE_PACK_PEAK_CEILING_DBFS = -1.0
+DEVICE_PACK_TRIM_THRESHOLD_DBFS = -60.0 # One-shots are trimmed to where they cross this
+DEVICE_PACK_TRIM_PAD_S = 0.05
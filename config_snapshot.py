@@ -0,0 +1,201 @@
+# config_snapshot.py
+# Compiled, immutable view of the tuning values in config.py. The sim tick reads one
+# ConfigSnapshot through a local (cfg = self.cfg) instead of doing module-attribute lookups,
+# and values derived from config (band thresholds, starter ramp rate, effect durations,
+# SFX gains) are computed once here instead of on every tick. The engine-model fields carry the
+# names engine_core.py reads (times in seconds, RPM, 0..1 throttle; the device build fills
+# the same names in its integer units).
+#
+# Live tuning: ConfigReloader watches config.py and compiles a fresh snapshot whenever the
+# file changes. EngineSimulator.apply_config() only stages it; the sim thread swaps it in
+# between ticks, so a tick never mixes old and new values. Only what is in the snapshot
+# (engine model, effects, gestures, fades, volumes, the sound pack) goes live; mixer format
+# and channel layout still need a restart, and a reload that changes them says so. A snapshot
+# with a different sound pack waits for that pack to load and goes live together with it.
+# The active pack's "config" overrides (config.SOUND_PACKS) are applied on top of the
+# file's values before anything is derived from them.
+import os
+import runpy
+import threading
+
+import config
+import throttle_curves
+from ringlog import log
+
+# Changing these in config.py only takes effect on the next start
+RESTART_KEYS = ("MIXER_FREQUENCY", "MIXER_SIZE", "MIXER_CHANNELS", "MIXER_BUFFER_SIZE",
+                "NUM_AUDIO_CHANNELS", "VOICE_CATEGORIES", "ENABLE_PREWARMED_ENGINE_LAYERS", "ENGINE_LAYER_KEYS", "AUDIO_OUTPUT_SINKS")
+
+
+class ConfigSnapshot:
+    __slots__ = (
+        # Engine model
+        "idle_rpm", "min_rpm", "max_rpm", "rpm_span", "idle_settle_rpm", "shutdown_cutoff_rpm", "shutdown_floor_rpm",
+        "throttle_curve", "rpm_accel_rate", "rpm_decel_rate", "rpm_idle_return_rate", "shutdown_decel_rate",
+        "pop_decel_rate", "pop_idle_return_rate", "starter_rate",
+        "starter_min_time", "starter_timeout", "shutdown_min_time", "shutdown_max_time", "min_dt", "fallback_dt",
+        "throttle_effectively_zero", "throttle_fully_closed", "throttle_significantly_open",
+        # RPM bands: upper bounds when picking fresh, hold windows for the band already playing
+        "idle_below", "low_below", "mid_below", "idle_hold_below",
+        "low_hold_above", "low_hold_below", "mid_hold_above", "mid_hold_below",
+        # Cruise
+        "cruise_enabled", "cruise_enter_throttle", "cruise_maintain_throttle", "cruise_rpm", "cruise_sustain",
+        # Effects and gestures
+        "accel_burst_enabled", "accel_burst_effect", "accel_burst_cooldown_ms", "accel_burst_volume",
+        "decel_pops_enabled", "decel_pop_chance", "decel_pop_linger", "decel_pop_fall_rate_modifier",
+        "decel_pop_cooldown_ms", "decel_pop_volume", "gestures",
+        # Audio
+        "sfx_volume", "main_engine_volume", "crossfade_duration_ms", "crossfade_retarget",
+        "predictive_crossfade", "prediction_lead_s", "prediction_tolerance_s",
+        "sound_pack", "sound_files", "pack_crossfade_ms",
+        "trace_tick_gap_s",
+    )
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            object.__setattr__(self, name, values[name])
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ConfigSnapshot is immutable; compile a new one")
+
+    def __eq__(self, other):
+        return isinstance(other, ConfigSnapshot) and \
+            all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    __hash__ = None
+
+    def changed_fields(self, other):
+        return [name for name in self.__slots__ if getattr(self, name) != getattr(other, name)]
+
+
+def compile_config(values):
+    # values: vars(config), or the namespace of a freshly executed config file
+    pack = values["SOUND_PACKS"][values["SOUND_PACK"]]
+    v = {**values, **pack["config"]} if pack.get("config") else values
+    ranges = v["RPM_RANGES"]
+    durations = v["SOUND_DURATIONS"]
+    return ConfigSnapshot(
+        idle_rpm=v["IDLE_RPM"],
+        min_rpm=v["MIN_RPM"],
+        max_rpm=v["MAX_RPM"],
+        rpm_span=v["MAX_RPM"] - v["IDLE_RPM"],
+        idle_settle_rpm=v["IDLE_RPM"] + 50, # RUNNING drops back to IDLE at or below this with the throttle closed
+        shutdown_cutoff_rpm=v["MIN_RPM"] / 4,
+        shutdown_floor_rpm=5, # Shutdown always ends here, sound or not
+        throttle_curve=throttle_curves.compile_profile(v["THROTTLE_CURVES"], v["THROTTLE_PROFILE"],
+                                                       v["THROTTLE_CURVE_TABLE_SIZE"]),
+        rpm_accel_rate=v["RPM_ACCEL_RATE"],
+        rpm_decel_rate=v["RPM_DECEL_RATE"],
+        rpm_idle_return_rate=v["RPM_IDLE_RETURN_RATE"],
+        shutdown_decel_rate=v["RPM_DECEL_RATE"] * 2.0,
+        pop_decel_rate=v["RPM_DECEL_RATE"] * v["DECEL_POP_RPM_FALL_RATE_MODIFIER"], # While a decel pop lingers
+        pop_idle_return_rate=v["RPM_IDLE_RETURN_RATE"] * v["DECEL_POP_RPM_FALL_RATE_MODIFIER"],
+        starter_rate=v["IDLE_RPM"] / max(0.1, v["STARTER_SOUND_DURATION_TARGET_S"] - 0.3),
+        starter_min_time=0.5, # Starter/shutdown sound has to play at least this long before the state moves on
+        starter_timeout=v["STARTER_TIMEOUT_S"],
+        shutdown_min_time=0.5,
+        shutdown_max_time=durations.get("shutdown", 5.0) + 2.0,
+        min_dt=0.0001, # A tick closer than this to the last one counts as fallback_dt
+        fallback_dt=0.001,
+        throttle_effectively_zero=v["THROTTLE_EFFECTIVELY_ZERO"],
+        throttle_fully_closed=0.01,
+        throttle_significantly_open=v["THROTTLE_SIGNIFICANTLY_OPEN"],
+        idle_below=ranges["low_rpm"][0] + 50,
+        low_below=ranges["low_rpm"][1] - 100,
+        mid_below=ranges["mid_rpm"][1] - 150,
+        idle_hold_below=ranges["low_rpm"][1] * 0.95,
+        low_hold_above=ranges["low_rpm"][0] * 0.9,
+        low_hold_below=ranges["mid_rpm"][0] * 1.05,
+        mid_hold_above=ranges["mid_rpm"][0] * 0.95,
+        mid_hold_below=ranges["high_rpm"][0] * 1.05,
+        cruise_enabled=v["ENABLE_CRUISE_SOUND"],
+        cruise_enter_throttle=v["CRUISE_THROTTLE_ENTER_THRESHOLD"],
+        cruise_maintain_throttle=v["CRUISE_THROTTLE_MAINTAIN_THRESHOLD"],
+        cruise_rpm=v["CRUISE_RPM_THRESHOLD"],
+        cruise_sustain=v["CRUISE_HIGH_RPM_SUSTAIN_S"],
+        accel_burst_enabled=v["ENABLE_ACCEL_BURST"],
+        accel_burst_effect=durations["accel_burst"] * v["ACCEL_BURST_EFFECT_DURATION_MULTIPLIER"],
+        accel_burst_cooldown_ms=v["ACCEL_BURST_COOLDOWN_MS"],
+        accel_burst_volume=min(1.0, v["SFX_VOLUME"] * v["ACCEL_BURST_SFX_VOLUME_MULTIPLIER"]),
+        decel_pops_enabled=v["ENABLE_DECEL_POPS"],
+        decel_pop_chance=v["DECEL_POP_CHANCE"],
+        decel_pop_linger=v["DECEL_POP_LINGER_DURATION_S"],
+        decel_pop_fall_rate_modifier=v["DECEL_POP_RPM_FALL_RATE_MODIFIER"],
+        decel_pop_cooldown_ms=v["DECEL_POP_COOLDOWN_MS"],
+        decel_pop_volume=min(1.0, v["SFX_VOLUME"] * v["DECEL_POP_SFX_VOLUME_MULTIPLIER"]),
+        gestures=v["GESTURES"], # Declarations; compiled into state machines by gestures.py
+        sfx_volume=v["SFX_VOLUME"],
+        main_engine_volume=v["MAIN_ENGINE_VOLUME"],
+        crossfade_duration_ms=v["CROSSFADE_DURATION_MS"],
+        crossfade_retarget=v["ENABLE_CROSSFADE_RETARGET"],
+        predictive_crossfade=v["ENABLE_PREDICTIVE_CROSSFADE"],
+        prediction_lead_s=v["CROSSFADE_DURATION_MS"] / 2000.0, # Centre the fade on the band crossing
+        prediction_tolerance_s=v["PREDICTIVE_CROSSFADE_TOLERANCE_S"],
+        trace_tick_gap_s=v["TRACE_ANOMALY_TICK_GAP_S"],
+        sound_pack=v["SOUND_PACK"],
+        sound_files=pack["sound_files"],
+        pack_crossfade_ms=v["SOUND_PACK_CROSSFADE_MS"],
+    )
+
+
+def current():
+    # Snapshot of the config module as imported
+    return compile_config(vars(config))
+
+
+def load_config_file(path):
+    # Runs the file in a fresh namespace; the imported config module is left alone
+    namespace = runpy.run_path(path)
+    return compile_config(namespace), namespace
+
+
+class ConfigReloader:
+    def __init__(self, path, on_reload, interval_s=config.CONFIG_RELOAD_INTERVAL_S):
+        self.path = path
+        self.on_reload = on_reload # Called with each new ConfigSnapshot, from the reloader thread
+        self.interval_s = interval_s
+        self.last_mtime = self._mtime()
+        self.last_snapshot = current()
+        self.reloads = 0
+        self.failures = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def _mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="config-reload", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread: self.thread.join(timeout=2)
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval_s):
+            self.poll()
+
+    def poll(self):
+        mtime = self._mtime()
+        if mtime is None or mtime == self.last_mtime: return None
+        self.last_mtime = mtime
+        try:
+            snapshot, namespace = load_config_file(self.path)
+        except Exception as e: # A half-saved or broken file must not take the running engine down
+            self.failures += 1
+            log.warning("CONFIG", "Reload of {} failed, keeping the current values: {}: {}", self.path, type(e).__name__, e)
+            return None
+        changed = snapshot.changed_fields(self.last_snapshot)
+        restart_needed = [key for key in RESTART_KEYS if namespace.get(key) != getattr(config, key, None)]
+        if restart_needed:
+            log.warning("CONFIG", "{} changed; takes effect after a restart.", ", ".join(restart_needed))
+        if not changed: return None
+        self.last_snapshot = snapshot
+        self.reloads += 1
+        log.info("CONFIG", "Reloaded {}: {}", self.path, ", ".join(changed))
+        self.on_reload(snapshot)
+        return snapshot
@@ -0,0 +1,9 @@
+# cp_emulator
+# Host-side CircuitPython emulation: runs CircuitPy/code.py unmodified on Linux with shim
+# board/analogio/busio/sdcardio/storage/audiobusio/audiocore/audiomixer modules
+# (cp_emulator/shims), a scripted potentiometer, a directory-backed SD card and a mixer
+# that renders to a WAV file while modelling SD read and mixing cost per voice.
+#
+# Usage: python -m cp_emulator [--scenario NAME | --throttle T:V,...] [--duration S] [--compare-desktop]
+from cp_emulator.runtime import Emulation, EmulationFinished, ScriptedThrottle, DeviceCostModel
+from cp_emulator.runner import run_device, desktop_reference, compare_with_desktop
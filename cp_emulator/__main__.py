@@ -0,0 +1,76 @@
+# python -m cp_emulator: run CircuitPy/code.py on the host and report loop timing, audio
+# cost and (optionally) how it differs from the desktop build on the same throttle script.
+import argparse
+import contextlib
+import csv
+import json
+import sys
+
+import config
+from ringlog import log
+from cp_emulator.runtime import Emulation, ScriptedThrottle
+from cp_emulator.runner import STATE_NAMES, run_device, desktop_reference, compare_with_desktop
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the CircuitPython build on the host.")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--throttle", help="Throttle keyframes as T:V,T:V,... (seconds:0..1)")
+    source.add_argument("--scenario", help="Take keyframes and length from a golden_audio.py scenario")
+    parser.add_argument("--duration", type=float, help="Virtual seconds to run (default: scenario length or 20)")
+    parser.add_argument("--sd-root", default=config.CP_EMU_SD_ROOT, help="Host directory mounted as the SD card")
+    parser.add_argument("--wav", default=config.CP_EMU_OUTPUT_WAV, help="Where to write the I2S output ('' for none)")
+    parser.add_argument("--cpu-scale", type=float, default=config.CP_EMU_CPU_SCALE,
+                        help="Charge host time in device code to the clock, times this factor (0: deterministic)")
+    parser.add_argument("--adc-noise", type=float, default=0.0, help="Gaussian ADC noise in LSB")
+    parser.add_argument("--strict-formats", action="store_true", help="Reject mismatched WAVs like the device does")
+    parser.add_argument("--trace", help="Write every device tick (t, throttle, rpm, state, loop) to this CSV")
+    parser.add_argument("--compare-desktop", action="store_true", help="Run the same script on the desktop build and diff")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    duration_s = args.duration
+    if args.scenario:
+        import golden_audio
+        if args.scenario not in golden_audio.SCENARIOS:
+            parser.error(f"unknown scenario '{args.scenario}' (have {sorted(golden_audio.SCENARIOS)})")
+        _, run_s, keyframes, _ = golden_audio.SCENARIOS[args.scenario]
+        throttle = ScriptedThrottle(keyframes)
+        duration_s = duration_s or run_s
+    elif args.throttle:
+        throttle = ScriptedThrottle.parse(args.throttle)
+    else:
+        throttle = ScriptedThrottle([(0.0, 0.0), (7.0, 0.0), (10.0, 1.0), (14.0, 1.0), (16.0, 0.0)])
+    duration_s = duration_s or 20.0
+
+    emulation = Emulation(throttle, duration_s, sd_root=args.sd_root, output_path=args.wav or None,
+                          cpu_scale=args.cpu_scale, strict_formats=args.strict_formats, adc_noise_lsb=args.adc_noise)
+    # With --json the device console goes to stderr so stdout stays parseable
+    with contextlib.redirect_stdout(sys.stderr) if args.json else contextlib.nullcontext():
+        run_device(emulation)
+    report = {"device": emulation.summary()}
+    if args.compare_desktop:
+        with contextlib.redirect_stdout(sys.stderr) if args.json else contextlib.nullcontext():
+            desktop_ticks = desktop_reference(throttle, duration_s, config.CP_EMU_DESKTOP_TICK_HZ)
+            log.flush() # The desktop build's log lines, before stdout is restored
+        report["desktop_diff"] = compare_with_desktop(emulation.ticks, desktop_ticks)
+
+    if args.trace:
+        with open(args.trace, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(("t", "throttle", "rpm", "state", "loop"))
+            for t, throttle_value, rpm, state, loop_key in emulation.ticks:
+                writer.writerow((f"{t:.4f}", f"{throttle_value:.4f}", f"{rpm:.1f}", STATE_NAMES.get(state, state), loop_key or ""))
+
+    if args.json:
+        json.dump(report, sys.stdout, indent=1)
+        print()
+        return 0
+    for section, values in report.items():
+        for key, value in values.items():
+            print(f"CP_EMU: {section}.{key} = {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
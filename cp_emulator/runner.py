@@ -0,0 +1,101 @@
+# cp_emulator/runner.py
+# Runs the device code under an Emulation and, for comparison, the same throttle script on
+# the desktop build (offline_render.OfflineRig at the device loop rate).
+import os
+import runpy
+import sys
+
+import numpy as np
+
+import config
+
+SHIM_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "shims")
+SHIM_MODULES = ("board", "analogio", "busio", "sdcardio", "storage", "audiobusio", "audiocore", "audiomixer", "supervisor")
+STATE_NAMES = {0: "OFF", 1: "STARTING", 2: "IDLE", 3: "RUNNING", 4: "SHUTTING_DOWN"}
+
+
+def _forget_device_modules(device_dir):
+    # Fresh device modules and shims for every run, as after a board reset
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, "__file__", None) or ""
+        if name in SHIM_MODULES or (path and os.path.dirname(os.path.abspath(path)) == device_dir):
+            del sys.modules[name]
+
+
+def run_device(emulation, device_dir=config.CP_EMU_DEVICE_DIR):
+    device_dir = os.path.abspath(device_dir)
+    added = [SHIM_DIR, device_dir]
+    sys.path[:0] = added
+    _forget_device_modules(device_dir)
+    try:
+        with emulation:
+            import engine_simulator_cp
+            update = engine_simulator_cp.EngineSimulatorCP.update
+
+            def traced_update(sim):
+                update(sim)
+                emulation.record_tick(sim)
+
+            engine_simulator_cp.EngineSimulatorCP.update = traced_update
+
+            import audio_manager_cp
+            for name in ("play_accel_burst", "play_decel_pop"):
+                def counted(am, play=getattr(audio_manager_cp.AudioManagerCP, name), name=name):
+                    played = play(am)
+                    if played: emulation.record_sfx(name)
+                    return played
+                setattr(audio_manager_cp.AudioManagerCP, name, counted)
+            runpy.run_path(os.path.join(device_dir, "code.py"), run_name="__main__")
+    finally:
+        for path in added:
+            sys.path.remove(path)
+        _forget_device_modules(device_dir)
+    return emulation
+
+
+def desktop_reference(throttle, duration_s, tick_hz):
+    # Same script on the desktop simulator: engine started at t=0, throttle set every tick
+    from offline_render import OfflineRig
+    rig = OfflineRig(tick_hz=tick_hz, seed=0)
+    try:
+        sim = rig.engine_simulator
+        origin = rig.clock.now
+        sim.start_engine()
+        ticks = []
+        while rig.next_tick_time - origin < duration_s:
+            t = rig.next_tick_time - origin
+            sim.set_throttle(throttle.at(t))
+            rig.tick()
+            ticks.append((t, sim.throttle_position, sim.current_rpm, sim.state, rig.audio_manager.current_loop_sound_key))
+        return ticks
+    finally:
+        rig.close()
+
+
+def _transitions(ticks, column):
+    changes = []
+    last = object()
+    for tick in ticks:
+        if tick[column] != last:
+            last = tick[column]
+            changes.append((tick[0], last))
+    return changes
+
+
+def compare_with_desktop(device_ticks, desktop_ticks):
+    if not device_ticks or not desktop_ticks: return {}
+    desktop_t = np.array([tick[0] for tick in desktop_ticks])
+    desktop_rpm = np.array([tick[2] for tick in desktop_ticks])
+    device_t = np.array([tick[0] for tick in device_ticks])
+    device_rpm = np.array([tick[2] for tick in device_ticks])
+    nearest = np.clip(np.searchsorted(desktop_t, device_t), 0, len(desktop_t) - 1)
+    diff = np.abs(device_rpm - desktop_rpm[nearest])
+    return {
+        "rpm_abs_diff_mean": round(float(diff.mean()), 1),
+        "rpm_abs_diff_max": round(float(diff.max()), 1),
+        "rpm_abs_diff_max_at_s": round(float(device_t[int(diff.argmax())]), 3),
+        "device_states": [(round(t, 3), STATE_NAMES.get(s, s)) for t, s in _transitions(device_ticks, 3)],
+        "desktop_states": [(round(t, 3), STATE_NAMES.get(s, s)) for t, s in _transitions(desktop_ticks, 3)],
+        "device_loops": [(round(t, 3), key) for t, key in _transitions(device_ticks, 4)],
+        "desktop_loops": [(round(t, 3), key) for t, key in _transitions(desktop_ticks, 4)],
+    }
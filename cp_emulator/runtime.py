@@ -0,0 +1,288 @@
+# cp_emulator/runtime.py
+# The running emulation that the shim modules (cp_emulator/shims) talk to: a virtual
+# monotonic clock, the scripted potentiometer, SD card mounts and the I2S output.
+#
+# Time is virtual. time.sleep() on the device thread advances the clock instead of waiting,
+# and each I2S buffer that falls due on the way is rendered from the attached mixer and
+# appended to the output WAV. Rendering a buffer charges the device cost model (SD reads
+# per voice, mixing per voice-frame) to the clock, as the audio DMA refill steals that time
+# from the main loop on the board; a buffer whose cost exceeds its own play time is counted
+# as an underrun. With cpu_scale > 0 the host time spent in device code between clock reads
+# is also charged, scaled, so heavier loops run late the way they would on the ESP32.
+# cpu_scale 0 keeps runs deterministic for diffing.
+#
+# asyncio runs on the same clock: the emulation installs an event loop policy whose loops
+# wait in a selector that advances virtual time instead of blocking (loop.time() already
+# reads the patched time.monotonic).
+import asyncio
+import builtins
+import os
+import random
+import selectors
+import threading
+import time
+import wave
+
+import numpy as np
+
+import config
+
+
+class EmulationFinished(BaseException):
+    # BaseException so code.py's "except Exception" setup guards cannot swallow it
+    pass
+
+
+class ScriptedThrottle:
+    def __init__(self, keyframes):
+        # [(t, throttle)], throttle interpolated linearly between keyframes
+        self.keyframes = sorted(keyframes)
+
+    def at(self, t):
+        keyframes = self.keyframes
+        if t <= keyframes[0][0]: return keyframes[0][1]
+        for (t0, v0), (t1, v1) in zip(keyframes, keyframes[1:]):
+            if t <= t1:
+                return v0 + (v1 - v0) * (t - t0) / (t1 - t0)
+        return keyframes[-1][1]
+
+    @classmethod
+    def parse(cls, text):
+        # "0:0,2:0,4:1" -> [(0.0, 0.0), (2.0, 0.0), (4.0, 1.0)]
+        keyframes = []
+        for item in text.split(","):
+            t, value = item.split(":")
+            keyframes.append((float(t), float(value)))
+        return cls(keyframes)
+
+
+class DeviceCostModel:
+    def __init__(self, sd_bytes_per_s=config.CP_EMU_SD_BYTES_PER_S, sd_read_latency_s=config.CP_EMU_SD_READ_LATENCY_S,
+                 mix_s_per_voice_frame=config.CP_EMU_MIX_S_PER_VOICE_FRAME):
+        self.sd_bytes_per_s = sd_bytes_per_s
+        self.sd_read_latency_s = sd_read_latency_s
+        self.mix_s_per_voice_frame = mix_s_per_voice_frame
+
+    def buffer_cost_s(self, frames, voices, sd_bytes, sd_reads):
+        return sd_reads * self.sd_read_latency_s + sd_bytes / self.sd_bytes_per_s + \
+            frames * voices * self.mix_s_per_voice_frame
+
+
+class _VirtualTimeSelector(selectors.SelectSelector):
+    def __init__(self, emulation):
+        super().__init__()
+        self.emulation = emulation
+
+    def select(self, timeout=None):
+        # The loop only waits for its next timer; nothing external can arrive in between
+        if timeout is not None and timeout > 0: self.emulation.sleep(timeout)
+        return super().select(0)
+
+
+class _VirtualTimePolicy(asyncio.DefaultEventLoopPolicy):
+    def __init__(self, emulation):
+        super().__init__()
+        self.emulation = emulation
+
+    def new_event_loop(self):
+        return asyncio.SelectorEventLoop(_VirtualTimeSelector(self.emulation))
+
+
+class Emulation:
+    current = None # The emulation the shims are attached to
+
+    def __init__(self, throttle, duration_s, sd_root=config.CP_EMU_SD_ROOT, output_path=config.CP_EMU_OUTPUT_WAV,
+                 cpu_scale=config.CP_EMU_CPU_SCALE, strict_formats=False, adc_noise_lsb=0, seed=0, cost=None):
+        self.throttle = throttle
+        self.duration_s = duration_s
+        self.sd_root = sd_root
+        self.output_path = output_path
+        self.cpu_scale = cpu_scale
+        self.strict_formats = strict_formats # Reject mismatched WAVs in Mixer.play like the device does
+        self.adc_noise_lsb = adc_noise_lsb
+        self.rng = random.Random(seed)
+        self.cost = cost or DeviceCostModel()
+
+        self.now = 0.0
+        self.mounts = {} # Device path prefix -> host directory
+        self.output_source = None
+        self.output_wav = None
+        self.next_buffer_time = 0.0
+        self.device_thread = None
+        self.host_mark = 0.0
+        self.loop_host_s = 0.0
+
+        # Stats
+        self.loop_host_times = [] # Host seconds of device code between sleeps (main-loop iterations or event-loop waits)
+        self.loop_intervals = [] # Virtual seconds between consecutive sleeps
+        self.last_sleep_at = None
+        self.buffers_rendered = 0
+        self.underruns = 0
+        self.audio_cost_s = 0.0
+        self.peak_buffer_cost_fraction = 0.0
+        self.sd_bytes = 0
+        self.voice_seconds = 0.0
+        self.format_mismatches = set()
+        self.ticks = [] # (t, throttle, rpm, state, loop key), appended by the EngineSimulatorCP.update hook
+        self.sfx_plays = {} # Gesture SFX actually played, by AudioManagerCP method name
+
+    # --- Clock ---
+    def _charge_host_time(self):
+        host_now = time.perf_counter()
+        elapsed = host_now - self.host_mark
+        self.host_mark = host_now
+        self.loop_host_s += elapsed
+        if self.cpu_scale: self._advance(self.now + elapsed * self.cpu_scale)
+
+    def _advance(self, t):
+        while self.output_source is not None and self.next_buffer_time <= t:
+            t += self._render_buffer()
+        self.now = t
+        self.host_mark = time.perf_counter() # The emulator's own rendering is not device time
+        if self.now >= self.duration_s: raise EmulationFinished()
+
+    def monotonic(self):
+        self._charge_host_time()
+        return self.now
+
+    def monotonic_ns(self):
+        return int(round(self.monotonic() * 1e9))
+
+    def ticks_ms(self):
+        # supervisor.ticks_ms: whole ms, wrapping at 2**29, from an offset so runs cross the wrap
+        return (int(self.monotonic() * 1000) + config.CP_EMU_TICKS_START_MS) & ((1 << 29) - 1)
+
+    def sleep(self, seconds):
+        self._charge_host_time()
+        if self.last_sleep_at is not None:
+            self.loop_intervals.append(self.now - self.last_sleep_at)
+            self.loop_host_times.append(self.loop_host_s)
+        self.last_sleep_at = self.now
+        self.loop_host_s = 0.0
+        self._advance(self.now + max(0.0, seconds))
+
+    # --- Potentiometer ---
+    def adc_value(self):
+        value = self.throttle.at(self.now) * 65535.0
+        if self.adc_noise_lsb: value += self.rng.gauss(0.0, self.adc_noise_lsb)
+        return max(0, min(65535, int(round(value))))
+
+    # --- SD card ---
+    def mount(self, path, host_root):
+        self.mounts[path.rstrip("/")] = host_root
+
+    def unmount(self, path):
+        self.mounts.pop(path.rstrip("/"), None)
+
+    def host_path(self, path):
+        if isinstance(path, str):
+            for prefix, root in self.mounts.items():
+                if path == prefix or path.startswith(prefix + "/"):
+                    return os.path.join(root, path[len(prefix):].lstrip("/"))
+        return path
+
+    # --- I2S output ---
+    def attach_output(self, source):
+        self.output_source = source
+        self.next_buffer_time = self.now
+        if self.output_path and self.output_wav is None:
+            self.output_wav = wave.open(self.output_path, "wb")
+            self.output_wav.setnchannels(source.channel_count)
+            self.output_wav.setsampwidth(2)
+            self.output_wav.setframerate(source.sample_rate)
+
+    def detach_output(self):
+        self.output_source = None
+
+    def _render_buffer(self):
+        source = self.output_source
+        frames = source.buffer_frames
+        block, voices, sd_bytes, sd_reads = source.render(frames)
+        period = frames / float(source.sample_rate)
+        cost = self.cost.buffer_cost_s(frames, voices, sd_bytes, sd_reads)
+        if cost > period: self.underruns += 1
+        self.peak_buffer_cost_fraction = max(self.peak_buffer_cost_fraction, cost / period)
+        self.audio_cost_s += cost
+        self.sd_bytes += sd_bytes
+        self.voice_seconds += voices * period
+        self.buffers_rendered += 1
+        if self.output_wav is not None: self.output_wav.writeframesraw(block.tobytes())
+        self.next_buffer_time += period
+        return cost
+
+    def note_format_mismatch(self, description):
+        self.format_mismatches.add(description)
+        if self.strict_formats: raise ValueError(description)
+
+    # --- Instrumentation ---
+    def record_tick(self, sim):
+        am = sim.audio_manager
+        self.ticks.append((self.now, sim.get_throttle(), sim.get_rpm(), sim.state,
+                           am.current_loop_sound_key if am else None))
+
+    # --- Host patching ---
+    def __enter__(self):
+        self.device_thread = threading.get_ident()
+        self.real_monotonic, self.real_monotonic_ns, self.real_sleep = time.monotonic, time.monotonic_ns, time.sleep
+        self.real_open = builtins.open
+        device_thread, real_open = self.device_thread, self.real_open
+        real_monotonic, real_monotonic_ns, real_sleep = self.real_monotonic, self.real_monotonic_ns, self.real_sleep
+
+        # Other host threads (e.g. ringlog's flusher) keep the real functions
+        def monotonic():
+            return self.monotonic() if threading.get_ident() == device_thread else real_monotonic()
+
+        def monotonic_ns():
+            return self.monotonic_ns() if threading.get_ident() == device_thread else real_monotonic_ns()
+
+        def sleep(seconds):
+            if threading.get_ident() == device_thread: self.sleep(seconds)
+            else: real_sleep(seconds)
+
+        def open_(file, *args, **kwargs):
+            return real_open(self.host_path(file), *args, **kwargs)
+
+        time.monotonic, time.monotonic_ns, time.sleep = monotonic, monotonic_ns, sleep
+        builtins.open = open_
+        self.real_policy = asyncio.get_event_loop_policy()
+        asyncio.set_event_loop_policy(_VirtualTimePolicy(self))
+        Emulation.current = self
+        self.host_mark = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        time.monotonic, time.monotonic_ns, time.sleep = self.real_monotonic, self.real_monotonic_ns, self.real_sleep
+        builtins.open = self.real_open
+        asyncio.set_event_loop_policy(self.real_policy)
+        Emulation.current = None
+        if self.output_wav is not None:
+            self.output_wav.close()
+            self.output_wav = None
+        return exc_type is EmulationFinished # A finished run is the normal way out
+
+    def record_sfx(self, name):
+        self.sfx_plays[name] = self.sfx_plays.get(name, 0) + 1
+
+    # --- Report ---
+    def summary(self):
+        loop_changes = sum(1 for prev, tick in zip(self.ticks, self.ticks[1:]) if tick[4] != prev[4] and prev[4])
+        host = np.array(self.loop_host_times) if self.loop_host_times else np.zeros(1)
+        intervals = np.array(self.loop_intervals) if self.loop_intervals else np.zeros(1)
+        return {
+            "virtual_s": round(self.now, 3),
+            "loops": len(self.loop_host_times),
+            "loop_host_us_mean": round(float(host.mean()) * 1e6, 1),
+            "loop_host_us_p99": round(float(np.percentile(host, 99)) * 1e6, 1),
+            "loop_host_us_max": round(float(host.max()) * 1e6, 1),
+            "loop_interval_ms_mean": round(float(intervals.mean()) * 1e3, 3),
+            "loop_interval_ms_max": round(float(intervals.max()) * 1e3, 3),
+            "buffers": self.buffers_rendered,
+            "underruns": self.underruns,
+            "audio_cost_fraction": round(self.audio_cost_s / self.now, 4) if self.now else 0.0,
+            "peak_buffer_cost_fraction": round(self.peak_buffer_cost_fraction, 3),
+            "sd_kbytes_per_s": round(self.sd_bytes / self.now / 1024.0, 1) if self.now else 0.0,
+            "mean_voices": round(self.voice_seconds / self.now, 2) if self.now else 0.0,
+            "loop_changes_per_min": round(loop_changes * 60.0 / self.now, 1) if self.now else 0.0,
+            "sfx_plays": dict(sorted(self.sfx_plays.items())),
+            "format_mismatches": sorted(self.format_mismatches),
+        }
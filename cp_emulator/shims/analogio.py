@@ -0,0 +1,23 @@
+# analogio.py (host shim, cp_emulator)
+# AnalogIn reads the emulation's scripted throttle as a 16-bit value.
+from cp_emulator.runtime import Emulation
+
+
+class AnalogIn:
+    reference_voltage = 3.3
+
+    def __init__(self, pin):
+        self.pin = pin
+
+    @property
+    def value(self):
+        return Emulation.current.adc_value()
+
+    def deinit(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.deinit()
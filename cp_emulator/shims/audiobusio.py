@@ -0,0 +1,34 @@
+# audiobusio.py (host shim, cp_emulator)
+# I2SOut hands its source (normally an audiomixer.Mixer) to the emulation, which renders it
+# buffer by buffer as virtual time passes and writes the result to the output WAV.
+from cp_emulator.runtime import Emulation
+
+
+class I2SOut:
+    def __init__(self, bit_clock, word_select, data, *, left_justified=False):
+        self.pins = (bit_clock, word_select, data)
+        self.source = None
+        self.paused = False
+
+    def play(self, sample, *, loop=False):
+        self.source = sample
+        Emulation.current.attach_output(sample)
+
+    def stop(self):
+        self.source = None
+        Emulation.current.detach_output()
+
+    def pause(self):
+        self.paused = True
+        Emulation.current.detach_output()
+
+    def resume(self):
+        self.paused = False
+        if self.source is not None: Emulation.current.attach_output(self.source)
+
+    @property
+    def playing(self):
+        return self.source is not None and not self.paused
+
+    def deinit(self):
+        if self.source is not None: self.stop()
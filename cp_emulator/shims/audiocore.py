@@ -0,0 +1,38 @@
+# audiocore.py (host shim, cp_emulator)
+# WaveFile decodes the whole file up front; the mixer charges SD reads as it consumes frames,
+# the way the device streams them from the card.
+import wave
+
+import numpy as np
+
+
+class WaveFile:
+    def __init__(self, file, buffer=None):
+        with wave.open(file, "rb") as wav:
+            self.sample_rate = wav.getframerate()
+            self.channel_count = wav.getnchannels()
+            sample_width = wav.getsampwidth()
+            raw = wav.readframes(wav.getnframes())
+        if sample_width == 2:
+            frames = np.frombuffer(raw, dtype="<i2").astype(np.float32)
+        elif sample_width == 1:
+            frames = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) * 256.0
+        else:
+            raise ValueError(f"Unsupported WAV sample width {sample_width * 8} bits")
+        self.bits_per_sample = sample_width * 8
+        self.bytes_per_frame = sample_width * self.channel_count
+        self.frames = frames.reshape(-1, self.channel_count)
+        self.file = file
+
+    def deinit(self):
+        self.frames = None
+        try:
+            self.file.close()
+        except (AttributeError, OSError):
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.deinit()
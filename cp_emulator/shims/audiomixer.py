@@ -0,0 +1,94 @@
+# audiomixer.py (host shim, cp_emulator)
+# Mixer with per-voice level, looping and one-shot playback. render() is called by the
+# emulation once per I2S buffer and reports voices in use and SD bytes/reads consumed.
+# The device rejects samples whose format differs from the mixer's; the shim records the
+# mismatch (and raises only with strict formats) and plays them converted, so a run with
+# the stock 48 kHz stereo files still gets through.
+import numpy as np
+
+from cp_emulator.runtime import Emulation
+
+
+class MixerVoice:
+    def __init__(self, mixer):
+        self.mixer = mixer
+        self.level = 1.0
+        self.sample = None
+        self.loop = False
+        self.position = 0.0 # In source frames
+
+    @property
+    def playing(self):
+        return self.sample is not None
+
+    def play(self, sample, *, loop=False):
+        self.mixer._check_format(sample)
+        self.sample = sample
+        self.loop = loop
+        self.position = 0.0
+
+    def stop(self):
+        self.sample = None
+
+
+class Mixer:
+    def __init__(self, voice_count=2, buffer_size=1024, channel_count=2, bits_per_sample=16,
+                 samples_signed=True, sample_rate=8000):
+        self.voice_count = voice_count
+        self.buffer_size = buffer_size # Bytes, as on the device
+        self.channel_count = channel_count
+        self.bits_per_sample = bits_per_sample
+        self.samples_signed = samples_signed
+        self.sample_rate = sample_rate
+        self.buffer_frames = max(1, buffer_size // (channel_count * bits_per_sample // 8))
+        self.voice = tuple(MixerVoice(self) for _ in range(voice_count))
+
+    @property
+    def playing(self):
+        return any(voice.playing for voice in self.voice)
+
+    def play(self, sample, *, voice=0, loop=False):
+        self.voice[voice].play(sample, loop=loop)
+
+    def stop_voice(self, voice=0):
+        self.voice[voice].stop()
+
+    stop = stop_voice
+
+    def deinit(self):
+        for voice in self.voice: voice.stop()
+
+    def _check_format(self, sample):
+        for field in ("sample_rate", "channel_count", "bits_per_sample"):
+            if getattr(sample, field) != getattr(self, field):
+                Emulation.current.note_format_mismatch(
+                    f"The sample's {field} does not match the mixer's ({getattr(sample, field)} vs {getattr(self, field)})")
+
+    def render(self, frames):
+        out = np.zeros((frames, self.channel_count), dtype=np.float32)
+        voices = sd_bytes = sd_reads = 0
+        offsets = np.arange(frames, dtype=np.float64)
+        for voice in self.voice:
+            sample = voice.sample
+            if sample is None: continue
+            total = len(sample.frames)
+            step = sample.sample_rate / float(self.sample_rate)
+            index = (voice.position + offsets * step).astype(np.int64)
+            if voice.loop:
+                index %= total
+                played = frames
+            else:
+                played = int(np.searchsorted(index, total))
+                index = index[:played]
+            data = sample.frames[index]
+            if sample.channel_count != self.channel_count:
+                data = data.mean(axis=1, keepdims=True) if self.channel_count == 1 else np.repeat(data[:, :1], self.channel_count, axis=1)
+            out[:played] += data * voice.level
+            consumed = played * step
+            voices += 1
+            sd_bytes += int(consumed) * sample.bytes_per_frame
+            sd_reads += 1
+            voice.position += consumed
+            if voice.loop: voice.position %= total
+            elif voice.position >= total: voice.sample = None
+        return np.clip(out, -32768, 32767).astype(np.int16), voices, sd_bytes, sd_reads
@@ -0,0 +1,15 @@
+# board.py (host shim, cp_emulator)
+# Any pin name the real board defines resolves to a Pin; the shims only use it as a label.
+class Pin:
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return f"board.{self.name}"
+
+
+def __getattr__(name):
+    if name.startswith("__"): raise AttributeError(name)
+    pin = Pin(name)
+    globals()[name] = pin
+    return pin
@@ -0,0 +1,19 @@
+# busio.py (host shim, cp_emulator)
+class SPI:
+    def __init__(self, clock, MOSI=None, MISO=None):
+        self.pins = (clock, MOSI, MISO)
+        self.locked = False
+
+    def try_lock(self):
+        if self.locked: return False
+        self.locked = True
+        return True
+
+    def unlock(self):
+        self.locked = False
+
+    def configure(self, baudrate=100000, polarity=0, phase=0, bits=8):
+        self.baudrate = baudrate
+
+    def deinit(self):
+        pass
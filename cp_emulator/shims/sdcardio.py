@@ -0,0 +1,25 @@
+# sdcardio.py (host shim, cp_emulator)
+# The card is a host directory (the emulation's sd_root); read costs are modelled by the
+# emulation per mixer buffer, not here.
+import os
+
+from cp_emulator.runtime import Emulation
+
+
+class SDCard:
+    def __init__(self, spi, cs, baudrate=8000000):
+        self.spi = spi
+        self.cs = cs
+        self.baudrate = baudrate
+        self.root = Emulation.current.sd_root
+        if not os.path.isdir(self.root):
+            raise OSError(f"SD root {self.root} does not exist")
+
+    def count(self):
+        total = 0
+        for directory, _, files in os.walk(self.root):
+            total += sum(os.path.getsize(os.path.join(directory, name)) for name in files)
+        return (total + 511) // 512
+
+    def deinit(self):
+        pass
@@ -0,0 +1,21 @@
+# storage.py (host shim, cp_emulator)
+# mount() maps a device path (e.g. "/sd") onto the card's host directory; open() on the
+# device thread is redirected through that mapping while the emulation runs.
+from cp_emulator.runtime import Emulation
+
+
+class VfsFat:
+    def __init__(self, block_device):
+        self.block_device = block_device
+
+
+def mount(filesystem, mount_path, *, readonly=False):
+    Emulation.current.mount(mount_path, filesystem.block_device.root)
+
+
+def umount(mount):
+    Emulation.current.unmount(mount)
+
+
+def remount(mount_path, readonly=False, *, disable_concurrent_write_protection=False):
+    pass
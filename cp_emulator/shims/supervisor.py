@@ -0,0 +1,7 @@
+# supervisor.py (host shim, cp_emulator)
+# ticks_ms() from the emulation's virtual clock, wrapping at 2**29 like the board's.
+from cp_emulator.runtime import Emulation
+
+
+def ticks_ms():
+    return Emulation.current.ticks_ms()
@@ -0,0 +1,248 @@
+# device_pack.py
+# Offline asset pipeline: turns the studio WAVs in config.SOUND_FILES into a device-ready
+# sound pack for a target in config.DEVICE_PACK_TARGETS (by default the CircuitPython build,
+# whose mixer runs mono at config_cp.AUDIO_SAMPLE_RATE). Per sound:
+#   trim      loops to their loop points (WAV 'smpl' chunk, or DEVICE_PACK_LOOP_POINTS),
+#             one-shots to where they rise above / fall below DEVICE_PACK_TRIM_THRESHOLD_DBFS
+#   downmix   to the target channel count
+#   resample  FFT resampling; loops are treated as periodic so the seam stays clean
+#   normalize RMS to the loop or SFX target, capped by the peak ceiling
+# and a report of pack size against SD read bandwidth per voice.
+#
+# The build is incremental: pack_manifest.json records the hash of every source and of the
+# settings it was built with, and only sounds whose inputs changed are processed again.
+#
+# Usage: python device_pack.py [--target NAME] [--out DIR] [--force] [--stage-code]
+# --stage-code also copies the target's device code (code_dir) and the portable root modules
+# it shares with the desktop build (shared_modules, e.g. throttle_input.py) to drive_out_dir,
+# the layout of the CIRCUITPY drive. Only files whose contents changed are copied.
+# The pack's layout matches the SD card (sounds/<file>.wav), so it can be copied to the card
+# as-is or tried on the host with: python -m cp_emulator --sd-root <out dir>
+import argparse
+import hashlib
+import json
+import os
+import runpy
+import shutil
+import struct
+import sys
+import wave
+
+import numpy as np
+
+import config
+
+PIPELINE_VERSION = 1 # Bump when processing changes, so every sound is rebuilt
+MANIFEST_NAME = "pack_manifest.json"
+
+
+def read_wav(path):
+    with wave.open(path, "rb") as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM sources are supported")
+        rate, channels = wav.getframerate(), wav.getnchannels()
+        data = np.frombuffer(wav.readframes(wav.getnframes()), dtype="<i2")
+    return data.reshape(-1, channels).astype(np.float64) / 32768.0, rate
+
+
+def read_smpl_loop(path):
+    # First loop of a RIFF 'smpl' chunk as (start_frame, end_frame_exclusive), or None
+    with open(path, "rb") as f:
+        data = f.read()
+    pos = 12
+    while pos + 8 <= len(data):
+        chunk_id, size = struct.unpack_from("<4sI", data, pos)
+        if chunk_id == b"smpl" and size >= 36 + 24:
+            loop_count = struct.unpack_from("<I", data, pos + 8 + 28)[0]
+            if loop_count:
+                start, end = struct.unpack_from("<II", data, pos + 8 + 36 + 8)
+                return start, end + 1
+        pos += 8 + size + (size & 1)
+    return None
+
+
+def trim_loop(frames, rate, key, path):
+    points = config.DEVICE_PACK_LOOP_POINTS.get(key)
+    if points is not None:
+        start, end = int(round(points[0] * rate)), int(round(points[1] * rate))
+    else:
+        loop = read_smpl_loop(path)
+        if loop is None: return frames
+        start, end = loop
+    return frames[max(0, start):min(len(frames), end)]
+
+
+def trim_silence(frames, rate):
+    threshold = 10.0 ** (config.DEVICE_PACK_TRIM_THRESHOLD_DBFS / 20.0)
+    loud = np.flatnonzero(np.abs(frames).max(axis=1) > threshold)
+    if len(loud) == 0: return frames
+    tail = int(config.DEVICE_PACK_TRIM_PAD_S * rate) # Keep a little decay after the last loud frame
+    return frames[loud[0]:min(len(frames), loud[-1] + 1 + tail)]
+
+
+def resample(frames, rate, target_rate, periodic):
+    if rate == target_rate: return frames
+    pad = 0 if periodic else int(0.05 * rate) # Zero guard so a one-shot's end does not wrap into its start
+    if pad: frames = np.concatenate([frames, np.zeros((pad, frames.shape[1]))])
+    n = len(frames)
+    target_n = int(round(n * target_rate / float(rate)))
+    spectrum = np.fft.rfft(frames, axis=0)
+    bins = target_n // 2 + 1
+    if bins <= spectrum.shape[0]: spectrum = spectrum[:bins]
+    else: spectrum = np.concatenate([spectrum, np.zeros((bins - spectrum.shape[0], frames.shape[1]), dtype=complex)])
+    out = np.fft.irfft(spectrum, n=target_n, axis=0) * (target_n / float(n))
+    if pad: out = out[:target_n - int(round(pad * target_rate / float(rate)))]
+    return out
+
+
+def normalize(frames, target_rms_dbfs, ceiling_dbfs):
+    rms = float(np.sqrt(np.mean(frames ** 2))) if len(frames) else 0.0
+    peak = float(np.abs(frames).max()) if len(frames) else 0.0
+    if rms <= 0.0: return frames, 0.0
+    gain = 10.0 ** (target_rms_dbfs / 20.0) / rms
+    gain = min(gain, 10.0 ** (ceiling_dbfs / 20.0) / peak)
+    return frames * gain, 20.0 * np.log10(gain)
+
+
+def write_wav(path, frames, rate):
+    pcm = np.clip(np.round(frames * 32767.0), -32768, 32767).astype("<i2")
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(frames.shape[1])
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(pcm.tobytes())
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_target(name):
+    target = dict(config.DEVICE_PACK_TARGETS[name])
+    device = runpy.run_path(target.pop("device_config")) if "device_config" in target else {}
+    target.setdefault("sample_rate", device.get("AUDIO_SAMPLE_RATE"))
+    target.setdefault("voices", device.get("NUM_MIXER_VOICES", 1))
+    target["durations"] = device.get("SOUND_DURATIONS", {})
+    return target
+
+
+def build_pack(target_name, out_dir=None, force=False):
+    target = load_target(target_name)
+    out_dir = out_dir or target["out_dir"]
+    sound_dir = os.path.join(out_dir, "sounds")
+    os.makedirs(sound_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    manifest = {}
+    if os.path.exists(manifest_path) and not force:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    previous = manifest.get("sounds", {})
+    rate, channels = target["sample_rate"], target["channels"]
+    sounds = {}
+    rebuilt = 0
+
+    for key, source_path in config.SOUND_FILES.items():
+        is_loop = key in config.ENGINE_LAYER_KEYS
+        settings = {
+            "version": PIPELINE_VERSION, "rate": rate, "channels": channels, "loop": is_loop,
+            "loop_points": config.DEVICE_PACK_LOOP_POINTS.get(key),
+            "rms_dbfs": (config.DEVICE_PACK_LOOP_RMS_DBFS if is_loop else config.DEVICE_PACK_SFX_RMS_DBFS)
+                        + config.DEVICE_PACK_GAIN_OFFSETS_DB.get(key, 0.0),
+            "ceiling_dbfs": config.DEVICE_PACK_PEAK_CEILING_DBFS,
+            "trim_dbfs": None if is_loop else config.DEVICE_PACK_TRIM_THRESHOLD_DBFS,
+        }
+        settings_hash = hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()
+        source_hash = _sha256(source_path)
+        out_name = os.path.basename(source_path)
+        out_path = os.path.join(sound_dir, out_name)
+        entry = previous.get(key)
+        if entry and entry["source_sha256"] == source_hash and entry["settings_sha256"] == settings_hash \
+           and os.path.exists(out_path):
+            sounds[key] = entry
+            continue
+
+        frames, source_rate = read_wav(source_path)
+        frames = trim_loop(frames, source_rate, key, source_path) if is_loop else trim_silence(frames, source_rate)
+        if channels == 1 and frames.shape[1] > 1: frames = frames.mean(axis=1, keepdims=True)
+        elif frames.shape[1] != channels: frames = np.repeat(frames[:, :1], channels, axis=1)
+        frames = resample(frames, source_rate, rate, periodic=is_loop)
+        frames, gain_db = normalize(frames, settings["rms_dbfs"], settings["ceiling_dbfs"])
+        write_wav(out_path, frames, rate)
+        rebuilt += 1
+        sounds[key] = {
+            "file": f"sounds/{out_name}",
+            "source_sha256": source_hash,
+            "settings_sha256": settings_hash,
+            "frames": len(frames),
+            "duration_s": round(len(frames) / float(rate), 3),
+            "gain_db": round(gain_db, 2),
+            "peak_dbfs": round(20.0 * np.log10(max(float(np.abs(frames).max()), 1e-9)), 2),
+            "bytes": os.path.getsize(out_path),
+        }
+
+    manifest = {"target": target_name, "sample_rate": rate, "channels": channels, "sounds": sounds}
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+        f.write("\n")
+    return manifest, target, rebuilt
+
+
+def stage_code(target):
+    # Returns (copied, total) file counts
+    drive_dir = target["drive_out_dir"]
+    sources = []
+    code_dir = target["code_dir"]
+    for name in sorted(os.listdir(code_dir)):
+        path = os.path.join(code_dir, name)
+        if name.endswith(".py") and os.path.isfile(path): sources.append(path)
+    sources.extend(target.get("shared_modules", []))
+    os.makedirs(drive_dir, exist_ok=True)
+    copied = 0
+    for path in sources:
+        out_path = os.path.join(drive_dir, os.path.basename(path))
+        if os.path.exists(out_path) and _sha256(out_path) == _sha256(path): continue
+        shutil.copyfile(path, out_path)
+        copied += 1
+    return copied, len(sources)
+
+
+def report(manifest, target, rebuilt):
+    rate, channels = manifest["sample_rate"], manifest["channels"]
+    bytes_per_s = rate * channels * 2
+    print(f"PACK: Target '{manifest['target']}': {rate} Hz, {channels} ch, 16-bit; {rebuilt} of {len(manifest['sounds'])} sounds rebuilt")
+    print(f"PACK: {'sound':12s} {'secs':>7s} {'KB':>8s} {'gain dB':>8s} {'peak dBFS':>9s}")
+    total = 0
+    for key, entry in sorted(manifest["sounds"].items()):
+        total += entry["bytes"]
+        print(f"PACK: {key:12s} {entry['duration_s']:7.2f} {entry['bytes'] / 1024.0:8.0f} {entry['gain_db']:8.1f} {entry['peak_dbfs']:9.1f}")
+        expected = target["durations"].get(key)
+        if expected is not None and abs(expected - entry["duration_s"]) > 0.05:
+            print(f"PACK:   WARNING - device SOUND_DURATIONS['{key}'] is {expected} s, pack file is {entry['duration_s']} s")
+    voices = target["voices"]
+    needed = voices * bytes_per_s
+    print(f"PACK: Total {total / 1024.0:.0f} KB. Streaming {bytes_per_s / 1024.0:.1f} KB/s per voice, "
+          f"{needed / 1024.0:.1f} KB/s for all {voices} voices = {100.0 * needed / config.CP_EMU_SD_BYTES_PER_S:.0f}% "
+          f"of the {config.CP_EMU_SD_BYTES_PER_S / 1024.0:.0f} KB/s SD budget")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a device-ready sound pack.")
+    parser.add_argument("--target", default=config.DEVICE_PACK_DEFAULT_TARGET, choices=sorted(config.DEVICE_PACK_TARGETS))
+    parser.add_argument("--out", help="Output directory (default: the target's out_dir)")
+    parser.add_argument("--force", action="store_true", help="Rebuild every sound")
+    parser.add_argument("--stage-code", action="store_true", help="Also stage the device code and shared modules for the drive")
+    args = parser.parse_args()
+    manifest, target, rebuilt = build_pack(args.target, args.out, args.force)
+    report(manifest, target, rebuilt)
+    if args.stage_code:
+        copied, total = stage_code(target)
+        print(f"PACK: Staged device code in {target['drive_out_dir']}: {copied} of {total} files updated")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
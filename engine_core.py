@@ -0,0 +1,379 @@
+# engine_core.py
+# The engine model shared by both builds: state machine, RPM integration, band choice with
+# hold windows, cruise, and what an accel burst / decel pop does to the sound. The desktop
+# EngineSimulator (engine_simulator.py) and the CircuitPython EngineSimulatorCP
+# (CircuitPy/engine_simulator_cp.py) are thin subclasses; like throttle_input.py this module is
+# portable on purpose (no config import, nothing CPython-specific) and is copied to the drive
+# by device_pack.py --stage-code.
+#
+# Units are the build's own, so the same arithmetic runs on floats or integers:
+#   desktop  time in s, RPM, throttle 0.0..1.0            (cfg: a config_snapshot.ConfigSnapshot)
+#   device   time in ms, milli-RPM, throttle Q12 0..4096  (cfg: engine_simulator_cp.DeviceEngineConfig)
+# Rates are RPM/s either way: RPM/s x s is RPM, RPM/s x ms is milli-RPM.
+#
+# cfg fields read here (same names in both builds):
+#   idle_rpm min_rpm max_rpm idle_settle_rpm shutdown_cutoff_rpm shutdown_floor_rpm
+#   rpm_accel_rate rpm_decel_rate rpm_idle_return_rate pop_decel_rate pop_idle_return_rate
+#   shutdown_decel_rate starter_rate                         RPM/s
+#   starter_min_time starter_timeout shutdown_min_time shutdown_max_time cruise_sustain
+#   accel_burst_effect decel_pop_linger min_dt fallback_dt   time units
+#   throttle_effectively_zero throttle_fully_closed throttle_significantly_open
+#   cruise_enter_throttle cruise_maintain_throttle           throttle units
+#   idle_below low_below mid_below idle_hold_below low_hold_above low_hold_below
+#   mid_hold_above mid_hold_below cruise_rpm                 RPM units
+#   cruise_enabled decel_pop_chance
+#
+# Audio backend (AudioManager on pygame / soft_mixer, AudioManagerCP on audiomixer):
+#   current_loop_sound_key, crossfade_to_sound_key, is_crossfading
+#   update()                            step a running crossfade
+#   update_engine_sound(key)            make key the engine loop (crossfading to it)
+#   play_engine_sfx(key) -> bool        starter / shutdown one-shot
+#   is_engine_sfx_busy() -> bool        that one-shot still playing
+#   play_accel_burst() / play_decel_pop() -> bool   (cooldowns are the backend's)
+#   prewarm_engine_layers()             engine reached idle; may be a no-op
+#   stop_engine_sounds_for_shutdown(), stop_all_engine_sounds()
+#   is_any_engine_sound_playing(ignore_sfx=False)
+#
+# Gestures are gestures.py's machines in self.gestures (a GestureSet), on both builds: each
+# build only decides which machines to build (config.GESTURES on the desktop, config_cp's
+# accel burst / decel pop settings on the device) and binds them with _bind_effect_gestures,
+# so a match calls _fire_accel_burst / _fire_decel_pop here.
+import gestures
+
+
+class EngineState:
+    OFF = 0
+    STARTING = 1
+    IDLE = 2
+    RUNNING = 3
+    SHUTTING_DOWN = 4
+
+# Built once: a literal list/tuple in a membership test is rebuilt on every call
+ACTIVE_STATES = (EngineState.IDLE, EngineState.RUNNING)
+QUIET_STATES = (EngineState.OFF, EngineState.IDLE)
+POP_OVERRIDE_TO_LOW = ("high_rpm", "mid_rpm", "cruise", "idle")
+
+
+class EngineCore:
+    # Subclasses provide clock() (build time units), rng (anything with .random()) and
+    # _rpm_for_throttle(); the other hooks below default to doing nothing
+    def __init__(self, audio_manager, cfg, drive_audio=True):
+        self.audio_manager = audio_manager
+        self.cfg = cfg
+        self.drive_audio = drive_audio # False when something else steps the crossfade (tasks_cp.py)
+        self.state = EngineState.OFF
+        self.current_rpm = 0
+        self.throttle_position = 0
+        self.target_rpm = 0
+        self.previous_rpm = 0
+        self.rpm_change_rate = 0 # RPM/s
+
+        now = self.clock()
+        self.last_update_time = now
+        self.last_dt = 0
+        self.start_time_for_state = now
+        self.update_call_count = 0
+        self.starter_sound_played_once = False
+
+        self.accel_burst_effect_active_until = 0
+        self.decel_pop_linger_active_until = 0
+        self.decel_pop_background_override_key = None
+
+        self.time_at_cruise_throttle_start = 0
+        self.is_eligible_for_cruise_sound = False
+        self.is_currently_cruising = False
+
+        self.gestures = gestures.GestureSet(()) # Replaced by the build once its thresholds are known
+        self.target_sound_key = None # Loop chosen by the last _update_engine_sound()
+
+    # --- Build hooks ---
+    def _rpm_for_throttle(self, throttle):
+        raise NotImplementedError
+
+    def _rpm_change_rate(self, rpm_delta, dt):
+        return rpm_delta / dt
+
+    def _note_sfx_event(self, key): pass
+
+    def _choose_band(self, reactive_key, effective_current_sound, current_time):
+        return reactive_key
+
+    # band_key: what _choose_band picked; None outside RUNNING and while cruise, a burst or a
+    # pop decides the loop instead
+    def _sound_chosen(self, band_key, reactive_key, effective_current_sound, current_time): pass
+
+    # --- Engine control ---
+    def start_engine(self):
+        if self.state != EngineState.OFF: return
+        now = self.clock()
+        self.state = EngineState.STARTING
+        self.start_time_for_state = now
+        if self.audio_manager.play_engine_sfx("starter"): self._note_sfx_event("starter")
+        self.current_rpm = 0
+        self.throttle_position = 0
+        self.last_update_time = now
+        self.starter_sound_played_once = True
+        self._reset_cruise_state()
+        self._reset_special_effects_state()
+
+    def stop_engine(self):
+        if self.state == EngineState.OFF or self.state == EngineState.SHUTTING_DOWN: return
+        self.state = EngineState.SHUTTING_DOWN
+        self.start_time_for_state = self.clock()
+        self.throttle_position = 0
+        self.audio_manager.stop_engine_sounds_for_shutdown()
+        if self.audio_manager.play_engine_sfx("shutdown"): self._note_sfx_event("shutdown")
+        self._reset_cruise_state()
+        self._reset_special_effects_state()
+
+    def _reset_cruise_state(self):
+        self.time_at_cruise_throttle_start = 0
+        self.is_eligible_for_cruise_sound = False
+        self.is_currently_cruising = False
+
+    def _reset_special_effects_state(self):
+        self.accel_burst_effect_active_until = 0
+        self.decel_pop_linger_active_until = 0
+        self.decel_pop_background_override_key = None
+        self._reset_gestures()
+
+    # --- Gestures ---
+    def _bind_effect_gestures(self, gesture_set):
+        gesture_set.bind("accel_burst", self._on_accel_burst_gesture)
+        gesture_set.bind("decel_pop", self._on_decel_pop_gesture)
+        return gesture_set
+
+    def _feed_gestures(self, current_time, throttle, previous_throttle):
+        self.gestures.feed_throttle(current_time, throttle, previous_throttle)
+
+    def _tick_gestures(self, current_time):
+        self.gestures.tick(current_time, self.current_rpm)
+
+    def _reset_gestures(self):
+        self.gestures.clear()
+
+    def _on_accel_burst_gesture(self, gesture, current_time):
+        if self._fire_accel_burst(current_time):
+            gesture.reset() # Start a fresh window after a successful burst
+
+    def _on_decel_pop_gesture(self, gesture, current_time):
+        if self._fire_decel_pop(current_time):
+            gesture.reset() # Consume gesture
+
+    # --- Effects (called by the gesture handlers) ---
+    def _fire_accel_burst(self, current_time):
+        if current_time < self.accel_burst_effect_active_until: return False # Burst effect already running
+        if not self.audio_manager.play_accel_burst(): return False
+        self._note_sfx_event("accel_burst")
+        self.accel_burst_effect_active_until = current_time + self.cfg.accel_burst_effect
+        if self.is_currently_cruising: self._reset_cruise_state()
+        return True
+
+    def _fire_decel_pop(self, current_time):
+        am = self.audio_manager
+        if self.rng.random() >= self.cfg.decel_pop_chance or not am.play_decel_pop(): return False
+        self._note_sfx_event("decel_pop")
+        self.decel_pop_linger_active_until = current_time + self.cfg.decel_pop_linger
+        fading_to = am.crossfade_to_sound_key if am.is_crossfading else None
+        key = fading_to if fading_to else am.current_loop_sound_key
+        self.decel_pop_background_override_key = "low_rpm" if key in POP_OVERRIDE_TO_LOW else key
+        if self.is_currently_cruising: self._reset_cruise_state()
+        return True
+
+    # --- Tick ---
+    def _apply_throttle(self, current_time, new_throttle):
+        # new_throttle already clamped to the build's full scale
+        cfg = self.cfg
+        previous = self.throttle_position
+        if self.is_currently_cruising and new_throttle < cfg.cruise_maintain_throttle:
+            self._reset_cruise_state()
+        elif not self.is_currently_cruising and new_throttle >= cfg.cruise_enter_throttle and \
+             previous < cfg.cruise_enter_throttle:
+            if self.state == EngineState.RUNNING:
+                self.time_at_cruise_throttle_start = current_time
+                self.is_eligible_for_cruise_sound = False
+        elif not self.is_currently_cruising and new_throttle < cfg.cruise_enter_throttle:
+            if self.time_at_cruise_throttle_start != 0:
+                self.time_at_cruise_throttle_start = 0
+                self.is_eligible_for_cruise_sound = False
+
+        if self.state in ACTIVE_STATES:
+            self._feed_gestures(current_time, new_throttle, previous)
+        self.throttle_position = new_throttle
+
+    def update(self):
+        current_time = self.clock()
+        cfg = self.cfg
+        dt = current_time - self.last_update_time
+        if dt <= cfg.min_dt: dt = cfg.fallback_dt
+        self.last_update_time = current_time
+        self.last_dt = dt
+
+        am = self.audio_manager
+        if not am: return
+        if self.drive_audio: am.update()
+
+        self.previous_rpm = self.current_rpm
+        throttle = self.throttle_position
+
+        # --- State Machine ---
+        if self.state == EngineState.STARTING:
+            time_in_state = current_time - self.start_time_for_state
+            if self.current_rpm < cfg.idle_rpm:
+                self.current_rpm += cfg.starter_rate * dt
+            self.current_rpm = min(self.current_rpm, cfg.idle_rpm)
+            starter_done = not am.is_engine_sfx_busy() and self.starter_sound_played_once and \
+                time_in_state > cfg.starter_min_time
+            if (starter_done and self.current_rpm >= cfg.idle_rpm) or time_in_state > cfg.starter_timeout:
+                self.current_rpm = cfg.idle_rpm
+                self.state = EngineState.IDLE
+                self.starter_sound_played_once = False
+                self._reset_cruise_state()
+                am.prewarm_engine_layers()
+
+        elif self.state == EngineState.IDLE or self.state == EngineState.RUNNING:
+            target_rpm = cfg.idle_rpm
+            if throttle > cfg.throttle_effectively_zero:
+                if self.state == EngineState.IDLE: self.state = EngineState.RUNNING
+                if self.is_currently_cruising and throttle >= cfg.cruise_maintain_throttle:
+                    target_rpm = cfg.max_rpm
+                elif throttle >= cfg.cruise_enter_throttle:
+                    target_rpm = cfg.max_rpm
+                else:
+                    target_rpm = self._rpm_for_throttle(throttle)
+
+            self.target_rpm = target_rpm
+            rpm_diff = target_rpm - self.current_rpm
+            decel_rate = cfg.rpm_decel_rate
+            idle_return_rate = cfg.rpm_idle_return_rate
+            if current_time < self.decel_pop_linger_active_until and throttle < cfg.throttle_effectively_zero and rpm_diff < 0:
+                decel_rate = cfg.pop_decel_rate
+                if throttle < cfg.throttle_fully_closed: idle_return_rate = cfg.pop_idle_return_rate
+
+            rate_factor = cfg.rpm_accel_rate if rpm_diff > 0 else decel_rate
+            if throttle < cfg.throttle_effectively_zero and rpm_diff < 0:
+                rate_factor = idle_return_rate
+                if self.is_currently_cruising: self._reset_cruise_state()
+
+            change = rate_factor * dt
+            if rpm_diff > 0:
+                self.current_rpm += change
+                if self.current_rpm > target_rpm: self.current_rpm = target_rpm
+            elif rpm_diff < 0:
+                self.current_rpm -= change
+                if self.current_rpm < target_rpm: self.current_rpm = target_rpm
+
+            if throttle < cfg.throttle_effectively_zero and self.current_rpm <= cfg.idle_settle_rpm and \
+               self.state == EngineState.RUNNING:
+                if current_time >= self.decel_pop_linger_active_until and current_time >= self.accel_burst_effect_active_until: # Ensure SFX effects are done
+                    self.state = EngineState.IDLE
+                    self.current_rpm = cfg.idle_rpm
+                    self.decel_pop_background_override_key = None
+                    if self.is_currently_cruising: self._reset_cruise_state()
+
+            min_for_state = cfg.idle_rpm if self.state == EngineState.IDLE else cfg.min_rpm
+            self.current_rpm = max(min_for_state, min(self.current_rpm, cfg.max_rpm))
+
+        elif self.state == EngineState.SHUTTING_DOWN:
+            time_in_state = current_time - self.start_time_for_state
+            shutdown_done = not am.is_engine_sfx_busy() and time_in_state > cfg.shutdown_min_time
+            self.current_rpm -= cfg.shutdown_decel_rate * dt
+            if self.current_rpm <= cfg.shutdown_floor_rpm or \
+               (shutdown_done and self.current_rpm < cfg.shutdown_cutoff_rpm) or \
+               time_in_state > cfg.shutdown_max_time:
+                self.current_rpm = 0
+                self.state = EngineState.OFF
+                self._reset_cruise_state()
+
+        self.rpm_change_rate = self._rpm_change_rate(self.current_rpm - self.previous_rpm, dt)
+
+        if self.state in ACTIVE_STATES:
+            self._tick_gestures(current_time)
+
+        # Reset linger effect if throttle is opened again significantly
+        if throttle > cfg.throttle_significantly_open and current_time > self.decel_pop_linger_active_until:
+            self.decel_pop_linger_active_until = 0
+            self.decel_pop_background_override_key = None
+
+        self.update_call_count += 1
+        self._update_engine_sound(current_time)
+
+        if self.state == EngineState.OFF and am.is_any_engine_sound_playing(ignore_sfx=True):
+            am.stop_all_engine_sounds()
+
+    def _update_engine_sound(self, current_time):
+        cfg = self.cfg
+        am = self.audio_manager
+        target_sound_key = None
+        reactive_key = None
+        band_key = None
+        fading_to = am.crossfade_to_sound_key if am.is_crossfading else None
+        effective_current_sound = fading_to if fading_to else am.current_loop_sound_key
+
+        if self.state == EngineState.IDLE:
+            target_sound_key = "idle"
+        elif self.state == EngineState.RUNNING:
+            reactive_key = self._select_rpm_band(self.current_rpm, effective_current_sound)
+            band_key = self._choose_band(reactive_key, effective_current_sound, current_time)
+            target_sound_key = band_key
+
+            if cfg.cruise_enabled:
+                throttle = self.throttle_position
+                can_enter_cruise = throttle >= cfg.cruise_enter_throttle
+                is_at_cruise_rpm = self.current_rpm >= cfg.cruise_rpm
+                if self.is_currently_cruising:
+                    if throttle >= cfg.cruise_maintain_throttle and is_at_cruise_rpm:
+                        target_sound_key = "cruise"
+                    # Otherwise the RPM band takes over; set_throttle resets the cruise state
+                elif can_enter_cruise and is_at_cruise_rpm:
+                    if effective_current_sound == "high_rpm" and not am.is_crossfading and \
+                       self.time_at_cruise_throttle_start > 0:
+                        if current_time - self.time_at_cruise_throttle_start >= cfg.cruise_sustain:
+                            self.is_eligible_for_cruise_sound = True
+                    if self.is_eligible_for_cruise_sound:
+                        target_sound_key = "cruise"
+                        self.is_currently_cruising = True
+                elif not can_enter_cruise and self.time_at_cruise_throttle_start > 0:
+                    self.time_at_cruise_throttle_start = 0
+                    self.is_eligible_for_cruise_sound = False
+                if target_sound_key == "cruise": band_key = None
+
+            # --- SFX Overrides ---
+            # Accel burst: the loop under the burst is mid_rpm at most (cruise was reset when it played)
+            if current_time < self.accel_burst_effect_active_until:
+                band_key = None
+                if target_sound_key == "high_rpm" or target_sound_key == "cruise":
+                    target_sound_key = "mid_rpm"
+            # Decel pop: the loop stays on the pop's background while it lingers
+            elif current_time < self.decel_pop_linger_active_until and self.throttle_position < cfg.throttle_effectively_zero:
+                band_key = None
+                if self.decel_pop_background_override_key:
+                    target_sound_key = self.decel_pop_background_override_key
+                elif target_sound_key == "idle" or target_sound_key == "cruise":
+                    target_sound_key = "low_rpm"
+
+        elif self.state == EngineState.OFF:
+            if am.is_any_engine_sound_playing(ignore_sfx=True): am.stop_all_engine_sounds()
+            self._reset_cruise_state()
+            self.target_sound_key = None
+            return
+
+        self._sound_chosen(band_key, reactive_key, effective_current_sound, current_time)
+        self.target_sound_key = target_sound_key
+        if target_sound_key: am.update_engine_sound(target_sound_key)
+
+    def _select_rpm_band(self, rpm, effective_current_sound):
+        cfg = self.cfg
+        if rpm < cfg.idle_below: band_key = "idle"
+        elif rpm < cfg.low_below: band_key = "low_rpm"
+        elif rpm < cfg.mid_below: band_key = "mid_rpm"
+        else: band_key = "high_rpm"
+
+        if effective_current_sound and not self.is_currently_cruising:
+            if effective_current_sound == "idle" and rpm < cfg.idle_hold_below: band_key = "idle"
+            elif effective_current_sound == "low_rpm" and cfg.low_hold_above < rpm < cfg.low_hold_below: band_key = "low_rpm"
+            elif effective_current_sound == "mid_rpm" and cfg.mid_hold_above < rpm < cfg.mid_hold_below: band_key = "mid_rpm"
+        return band_key
+
+    def get_rpm(self): return self.current_rpm
+    def get_state(self): return self.state
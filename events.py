@@ -0,0 +1,66 @@
+# events.py
+# Engine event bus. AudioManager and EngineSimulator emit typed events; loggers, telemetry
+# or rig hardware (haptics) subscribe callbacks. Emitters guard every emit with
+#     if bus.listeners[KIND]: bus.emit(KIND, ...)
+# so with no subscribers the hot path pays one list lookup and nothing is built or called.
+# Callbacks get positional arguments (kind, timestamp, a, b) - no event objects are allocated.
+# They run on the sim thread, which emits every event (the UI only posts throttle and
+# start/stop requests that the sim loop applies), so they must be quick; slow consumers
+# should queue and return.
+from ringlog import log
+
+STATE_CHANGED = 0 # a: old EngineState, b: new EngineState
+BAND_CHANGED = 1 # a: old band key, b: new band key (None outside IDLE/RUNNING)
+CROSSFADE_STARTED = 2 # a: from loop key, b: to loop key (also emitted when a running fade is retargeted)
+CROSSFADE_FINISHED = 3 # a: from loop key, b: to loop key
+SFX_PLAYED = 4 # a: SFX key
+SFX_SUPPRESSED = 5 # a: SFX key, b: reason ("cooldown" / "no_voice")
+SOUND_PACK_SWAPPED = 6 # a: previous pack name, b: new pack name
+
+EVENT_NAMES = ("state_changed", "band_changed", "crossfade_started", "crossfade_finished",
+               "sfx_played", "sfx_suppressed", "sound_pack_swapped")
+
+
+class EventBus:
+    def __init__(self):
+        # Copy-on-write: (un)subscribing swaps in a new list, so emit() can iterate without a lock
+        self.listeners = [[] for _ in EVENT_NAMES]
+
+    def subscribe(self, kind, callback):
+        self.listeners[kind] = self.listeners[kind] + [callback]
+
+    def subscribe_all(self, callback):
+        for kind in range(len(EVENT_NAMES)):
+            self.subscribe(kind, callback)
+
+    def unsubscribe(self, kind, callback):
+        self.listeners[kind] = [cb for cb in self.listeners[kind] if cb is not callback]
+
+    def unsubscribe_all(self, callback):
+        for kind in range(len(EVENT_NAMES)):
+            self.unsubscribe(kind, callback)
+
+    def emit(self, kind, timestamp, a=None, b=None):
+        for callback in self.listeners[kind]:
+            try:
+                callback(kind, timestamp, a, b)
+            except Exception as e:
+                # A broken subscriber must not take the sim thread down with it
+                log.warning("EVENTS", "Subscriber {!r} failed on {}, unsubscribed: {}", callback, EVENT_NAMES[kind], e)
+                self.unsubscribe(kind, callback)
+
+
+class EventPrinter:
+    # Console logger subscriber (config.LOG_ENGINE_EVENTS)
+    def __init__(self, start_time=None):
+        self.start_time = start_time
+
+    def __call__(self, kind, timestamp, a, b):
+        if self.start_time is None: self.start_time = timestamp
+        if kind == STATE_CHANGED:
+            from engine_simulator import EngineState
+            names = {value: name for name, value in vars(EngineState).items() if not name.startswith("_")}
+            a, b = names.get(a, a), names.get(b, b)
+        detail = f"{a}" if b is None else f"{a} -> {b}"
+        if kind == SFX_SUPPRESSED: detail = f"{a} ({b})"
+        log.info("EVENT", "{:9.3f} {}: {}", timestamp - self.start_time, EVENT_NAMES[kind], detail)
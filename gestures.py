@@ -0,0 +1,220 @@
+# gestures.py
+# Throttle gestures as small incremental state machines, shared by both builds: the desktop
+# compiles config.GESTURES with compile_gestures(), the device (CircuitPy/engine_simulator_cp.py)
+# builds its accel burst and decel pop machines from config_cp directly. Like engine_core.py
+# this module is portable (no config import, nothing CPython-specific, no allocation per
+# sample) and is copied to the drive by device_pack.py --stage-code. Values are in the
+# build's own units, whatever the parameter names say: s / 0..1 throttle / RPM on the desktop,
+# ms / Q12 / milli-RPM on the device.
+#
+# Each machine keeps only what its pattern needs (a monotonic window minimum in a
+# preallocated ring, a couple of timestamps, a phase number), so feeding a throttle sample or
+# an RPM tick is O(1) (amortised for "rise") however long the window is.
+#
+# Kinds:
+#   rise           throttle from <= from_max to >= to_min, by at least min_jump, within within_s
+#   drop_then_rpm  throttle drop of >= min_drop from >= from_min to <= to_max within within_s,
+#                  then RPM above rpm_above within rpm_within_s (cancelled above cancel_above)
+#   double_blip    throttle <= low -> >= high -> <= low -> >= high, all within within_s
+#
+# A machine reports a match by calling its handler (handler(machine, now)); the handler
+# decides whether the effect actually plays and calls machine.reset() to consume it.
+# A match the handler does not consume is reported again on the next sample.
+#
+# Samples are sample-and-hold: the app feeds the throttle only when the conditioned value
+# changes (main.App._apply_throttle_input), so the previous value counts as held right up
+# to the new sample, however long ago it arrived.
+
+
+class RiseGesture:
+    uses_rpm = False
+
+    def __init__(self, name, from_max, to_min, min_jump, within_s, slots=64, **options):
+        self.name = name
+        self.from_max = from_max
+        self.to_min = to_min
+        self.min_jump = min_jump
+        self.within_s = within_s
+        self.options = options
+        self.handler = None
+        # Window of (time, throttle) with increasing throttle, as a ring of parallel slots: the
+        # oldest entry (head) is the window minimum. A full ring drops its oldest entry
+        self.times = [0] * slots
+        self.values = [0] * slots
+        self.head = 0
+        self.count = 0
+
+    def reset(self):
+        self.count = 0
+
+    clear = reset
+
+    def feed_throttle(self, now, value, previous):
+        times, values = self.times, self.values
+        size = len(times)
+        head, count = self.head, self.count
+        if count: # The last sample held until now
+            last = head + count - 1
+            times[last - size if last >= size else last] = now
+        while count:
+            last = head + count - 1
+            if last >= size: last -= size
+            if values[last] < value: break
+            count -= 1
+        while count and now - times[head] > self.within_s:
+            head += 1
+            if head == size: head = 0
+            count -= 1
+        if count == size:
+            head += 1
+            if head == size: head = 0
+            count -= 1
+        slot = head + count
+        if slot >= size: slot -= size
+        times[slot] = now
+        values[slot] = value
+        self.head, self.count = head, count + 1
+        if value < self.to_min: return False
+        low = values[head]
+        return low <= self.from_max and value - low >= self.min_jump
+
+    def tick(self, now, rpm):
+        return False
+
+
+class DropThenRpmGesture:
+    uses_rpm = True
+
+    def __init__(self, name, from_min, to_max, min_drop, within_s, rpm_above, rpm_within_s, cancel_above, **options):
+        self.name = name
+        self.from_min = from_min
+        self.to_max = to_max
+        self.min_drop = min_drop
+        self.within_s = within_s
+        self.rpm_above = rpm_above
+        self.rpm_within_s = rpm_within_s
+        self.cancel_above = cancel_above
+        self.options = options
+        self.handler = None
+        self.high_value = 0
+        self.high_time = 0
+        self.armed_at = None # When the throttle half matched, None while waiting for it
+
+    def reset(self):
+        # Consumes an armed gesture; the throttle has to go high again for the next one
+        self.armed_at = None
+
+    def clear(self):
+        self.high_value = self.high_time = 0
+        self.armed_at = None
+
+    def feed_throttle(self, now, value, previous):
+        if previous >= self.from_min: self.high_time = now # Held high until this sample
+        if value >= self.from_min:
+            if value > self.high_value: self.high_value = value
+            self.high_time = now
+        if self.armed_at is None and self.high_value >= self.from_min and \
+           value <= self.to_max and previous > self.to_max: # Just crossed into the low zone
+            if now - self.high_time <= self.within_s and self.high_value - value >= self.min_drop:
+                self.armed_at = now
+                self.high_value = 0
+        if self.armed_at is not None and value > self.cancel_above:
+            self.armed_at = None
+        return False # Only completes on the RPM half, in tick()
+
+    def tick(self, now, rpm):
+        if self.armed_at is None: return False
+        if now - self.armed_at > self.rpm_within_s:
+            self.armed_at = None # Timed out waiting for RPM
+            return False
+        return rpm > self.rpm_above
+
+
+class DoubleBlipGesture:
+    uses_rpm = False
+
+    def __init__(self, name, low, high, within_s, **options):
+        self.name = name
+        self.low = low
+        self.high = high
+        self.within_s = within_s
+        self.options = options
+        self.handler = None
+        self.phase = 0 # 0: waiting for the first rise, 1: first blip up, 2: back down, waiting for the second rise
+        self.last_low_time = None
+        self.started_at = 0
+
+    def reset(self):
+        self.phase = 0
+
+    def clear(self):
+        self.phase = 0
+        self.last_low_time = None
+
+    def feed_throttle(self, now, value, previous):
+        if self.phase and now - self.started_at > self.within_s: self.phase = 0
+        if previous <= self.low and self.phase == 0: self.last_low_time = now # Held low until this sample
+        if value <= self.low:
+            if self.phase == 1: self.phase = 2
+            if self.phase == 0: self.last_low_time = now
+            return False
+        if value < self.high: return False
+        if self.phase == 0:
+            if self.last_low_time is not None and now - self.last_low_time <= self.within_s:
+                self.phase = 1
+                self.started_at = self.last_low_time
+            return False
+        return self.phase == 2
+
+    def tick(self, now, rpm):
+        return False
+
+
+GESTURE_KINDS = {
+    "rise": RiseGesture,
+    "drop_then_rpm": DropThenRpmGesture,
+    "double_blip": DoubleBlipGesture,
+}
+
+
+class GestureSet:
+    def __init__(self, machines):
+        self.machines = {machine.name: machine for machine in machines}
+        self.throttle_machines = list(machines)
+        self.tick_machines = [machine for machine in machines if machine.uses_rpm]
+
+    def get(self, name):
+        return self.machines.get(name)
+
+    def bind(self, name, handler):
+        machine = self.machines.get(name)
+        if machine is not None: machine.handler = handler
+
+    def feed_throttle(self, now, value, previous):
+        for machine in self.throttle_machines:
+            if machine.feed_throttle(now, value, previous) and machine.handler:
+                machine.handler(machine, now)
+
+    def tick(self, now, rpm):
+        for machine in self.tick_machines:
+            if machine.tick(now, rpm) and machine.handler:
+                machine.handler(machine, now)
+
+    def clear(self):
+        for machine in self.throttle_machines:
+            machine.clear()
+
+
+def compile_gestures(declarations):
+    machines = []
+    for name, spec in declarations.items():
+        spec = dict(spec)
+        if not spec.pop("enabled", True): continue
+        kind = spec.pop("kind")
+        if kind not in GESTURE_KINDS:
+            raise ValueError(f"GESTURES: '{name}' has unknown kind '{kind}' (expected one of {sorted(GESTURE_KINDS)})")
+        try:
+            machines.append(GESTURE_KINDS[kind](name, **spec))
+        except TypeError as e:
+            raise ValueError(f"GESTURES: '{name}' ({kind}): {e}")
+    return GestureSet(machines)
@@ -0,0 +1,198 @@
+# golden_audio.py
+# Golden-audio regression suite: replays fixed throttle scenarios on the offline rig
+# (virtual clock, soft_mixer, seeded RNG) and compares the result with the fingerprints
+# stored in config.GOLDEN_AUDIO_FILE. A change to the tick or mixer paths that is meant
+# to be behaviour-preserving must reproduce every fingerprint exactly.
+#
+# Per scenario the fingerprint holds the SHA-256 of the rendered PCM, the event log
+# (state changes, loop/crossfade changes, SFX played or suppressed, timestamped from the
+# start of the run) and a coarse RMS envelope that is only used to say where audio diverged.
+#
+# Usage: python golden_audio.py [--update] [--scenario NAME ...]
+import argparse
+import hashlib
+import json
+import os
+import sys
+
+import numpy as np
+
+import config
+from engine_simulator import EngineState
+from offline_render import OfflineRig
+
+# name: (seed, run seconds after IDLE, throttle keyframes [(t, throttle)], stop_engine time or None,
+#        start_engine time or None)
+# Throttle is interpolated linearly between keyframes, quantised to the slider's 1% steps and
+# only sent to set_throttle when it changes, as the UI does.
+SCENARIOS = {
+    "idle_stop": (1, 5.0, [(0.0, 0.0)], 2.0, None),
+    "ramp_sweep": (2, 9.0, [(0.0, 0.0), (0.5, 0.0), (3.5, 1.0), (4.5, 1.0), (7.5, 0.0)], None, None),
+    "band_steps": (3, 7.0, [(0.0, 0.0), (0.5, 0.0), (0.501, 0.35), (2.0, 0.35), (2.001, 0.7),
+                            (3.5, 0.7), (3.501, 1.0), (5.0, 1.0), (5.001, 0.0)], None, None),
+    "flicks_and_pops": (4, 9.0, [(0.0, 0.3), (1.0, 0.3), (1.05, 1.0), (2.0, 1.0), (2.1, 0.0),
+                                 (3.5, 0.3), (4.0, 0.3), (4.05, 1.0), (5.0, 1.0), (5.1, 0.0),
+                                 (6.5, 0.0), (6.55, 1.0), (6.7, 1.0), (6.8, 0.0)], None, None),
+    "cruise": (5, 16.0, [(0.0, 0.0), (0.5, 0.0), (1.5, 1.0), (13.0, 1.0), (13.001, 0.0)], 15.0, None), # Ramp: cruise arms only while RUNNING
+}
+# Restart while the shutdown sound still rings: the starter has to replace it on the engine_sfx voice
+SCENARIOS["restart_during_shutdown"] = (6, 10.0, [(0.0, 0.0)], 1.0, 2.0)
+STATE_NAMES = {0: "OFF", 1: "STARTING", 2: "IDLE", 3: "RUNNING", 4: "SHUTTING_DOWN"}
+
+
+def _throttle_at(keyframes, t):
+    if t <= keyframes[0][0]: return keyframes[0][1]
+    for (t0, v0), (t1, v1) in zip(keyframes, keyframes[1:]):
+        if t <= t1:
+            return v0 + (v1 - v0) * (t - t0) / (t1 - t0)
+    return keyframes[-1][1]
+
+
+class EventLog:
+    # Polled after every tick; records only what changed, so the log stays short and readable
+    def __init__(self, rig):
+        self.rig = rig
+        self.lines = []
+        self.last_state = None
+        self.last_loop_key = None
+        self.last_fade_target = None
+        self.last_sfx_counts = dict(rig.audio_manager.sfx_play_counts)
+        self.last_suppressed_counts = dict(rig.audio_manager.sfx_suppressed_counts)
+
+    def _add(self, text):
+        self.lines.append(f"{self.rig.clock.now - self.rig.start_time:8.3f} {text}")
+
+    def poll(self):
+        sim, am = self.rig.engine_simulator, self.rig.audio_manager
+        if sim.state != self.last_state:
+            self.last_state = sim.state
+            self._add(f"state {STATE_NAMES.get(sim.state, sim.state)}")
+        if am.current_loop_sound_key != self.last_loop_key:
+            self.last_loop_key = am.current_loop_sound_key
+            self._add(f"loop {self.last_loop_key}")
+        fade_target = am.crossfade_to_sound_key if am.is_crossfading else None
+        if fade_target != self.last_fade_target:
+            self.last_fade_target = fade_target
+            if fade_target is not None:
+                self._add(f"crossfade {am.crossfade_from_sound_key} -> {fade_target}")
+        for key, count in am.sfx_play_counts.items():
+            if count != self.last_sfx_counts[key]:
+                self.last_sfx_counts[key] = count
+                self._add(f"sfx {key}")
+        for (key, reason), count in am.sfx_suppressed_counts.items():
+            if count != self.last_suppressed_counts[(key, reason)]:
+                self.last_suppressed_counts[(key, reason)] = count
+                self._add(f"sfx_suppressed {key} {reason}")
+
+
+def _envelope_db(pcm, frequency):
+    window = max(1, int(frequency * config.GOLDEN_AUDIO_ENVELOPE_WINDOW_S))
+    usable = (len(pcm) // window) * window
+    if usable == 0: return []
+    power = ((pcm[:usable].astype(np.float64) / 32768.0) ** 2).reshape(-1, window * pcm.shape[1]).mean(axis=1)
+    return [round(float(10.0 * np.log10(max(p, 1e-12))), 1) for p in power]
+
+
+def run_scenario(name):
+    seed, run_s, keyframes, stop_at, start_at = SCENARIOS[name]
+    rig = OfflineRig(seed=seed)
+    try:
+        log = EventLog(rig)
+        sim = rig.engine_simulator
+        if not rig.start_to_idle():
+            raise RuntimeError(f"GOLDEN: {name}: engine did not reach IDLE on the offline rig.")
+        log.poll()
+        origin = rig.clock.now
+        sent_throttle = None
+        while rig.next_tick_time <= origin + run_s:
+            t = rig.next_tick_time - origin
+            if start_at is not None and t >= start_at and sim.get_state() == EngineState.OFF:
+                sim.start_engine()
+                start_at = None
+            elif stop_at is not None and t >= stop_at:
+                if sim.get_state() not in (EngineState.OFF, EngineState.SHUTTING_DOWN): sim.stop_engine()
+                stop_at = None
+            else:
+                throttle = round(_throttle_at(keyframes, t), 2)
+                if throttle != sent_throttle:
+                    sim.set_throttle(throttle)
+                    sent_throttle = throttle
+            rig.tick()
+            log.poll()
+        pcm = rig.output()
+        return {
+            "frames": int(len(pcm)),
+            "audio_sha256": hashlib.sha256(pcm.tobytes()).hexdigest(),
+            "events": log.lines,
+            "envelope_db": _envelope_db(pcm, rig.frequency),
+        }
+    finally:
+        rig.close()
+
+
+def compare(expected, actual):
+    problems = []
+    if expected["events"] != actual["events"]:
+        for i, (e, a) in enumerate(zip(expected["events"] + [None] * len(actual["events"]),
+                                       actual["events"] + [None] * len(expected["events"]))):
+            if e != a:
+                problems.append(f"event log diverges at entry {i}: expected {e!r}, got {a!r}")
+                break
+    if expected["frames"] != actual["frames"]:
+        problems.append(f"rendered {actual['frames']} frames, expected {expected['frames']}")
+    if expected["audio_sha256"] != actual["audio_sha256"]:
+        detail = "no envelope difference above 0.1 dB"
+        for i, (e, a) in enumerate(zip(expected["envelope_db"], actual["envelope_db"])):
+            if e != a:
+                detail = f"first envelope difference at {i * config.GOLDEN_AUDIO_ENVELOPE_WINDOW_S:.2f} s: {e} dB -> {a} dB"
+                break
+        problems.append(f"audio hash differs ({detail})")
+    return problems
+
+
+def load_fingerprints(path=config.GOLDEN_AUDIO_FILE):
+    if not os.path.exists(path): return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_fingerprints(fingerprints, path=config.GOLDEN_AUDIO_FILE):
+    with open(path, "w") as f:
+        json.dump(fingerprints, f, indent=1, sort_keys=True)
+        f.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Golden-audio regression suite on the offline rig.")
+    parser.add_argument("--update", action="store_true", help="Re-record fingerprints instead of checking them")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="Scenario(s) to run (default: all)")
+    args = parser.parse_args()
+
+    stored = load_fingerprints()
+    failures = 0
+    for name in args.scenario or SCENARIOS:
+        actual = run_scenario(name)
+        if args.update:
+            stored[name] = actual
+            print(f"GOLDEN: {name}: recorded ({actual['frames']} frames, {len(actual['events'])} events)")
+            continue
+        if name not in stored:
+            print(f"GOLDEN: {name}: NO FINGERPRINT (run with --update)")
+            failures += 1
+            continue
+        problems = compare(stored[name], actual)
+        if problems:
+            failures += 1
+            print(f"GOLDEN: {name}: FAIL")
+            for problem in problems:
+                print(f"  {problem}")
+        else:
+            print(f"GOLDEN: {name}: ok")
+    if args.update:
+        save_fingerprints(stored)
+        print(f"GOLDEN: Saved {config.GOLDEN_AUDIO_FILE}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+# latency_harness.py
+# Measures throttle-to-audible latency on the offline rig (offline_render.py).
+#
+# Every trial is run twice from the same seed: once with the throttle input injected
+# and once without. The first 2 ms window where the two renders differ by more than
+# LATENCY_ONSET_THRESHOLD_DBFS is the audible onset. The input goes in the way main.py takes
+# it: the hand position is sampled once per sim tick through THROTTLE_INPUT_FILTER, and
+# set_throttle runs only when the conditioned value changes. The total is split into stages:
+#   dispatch - input until the next sim tick samples it
+#   sim      - that tick until the sim makes an audio change (crossfade / retarget / SFX),
+#              including the filter's smoothing; --unfiltered runs without it for comparison
+#   mixer    - audio change until the device buffer that carries the onset is rendered
+#   buffer   - that buffer waiting in the device queue until the onset frame plays
+#
+# Usage: python latency_harness.py [--trials N] [--buffer FRAMES] [--scenario NAME ...] [--unfiltered]
+import argparse
+import statistics
+
+import numpy as np
+
+import config
+import throttle_input
+from offline_render import OfflineRig
+
+# name: (baseline throttle, settle seconds at baseline, stepped throttle, hold seconds, release throttle or None)
+SCENARIOS = {
+    "step_low": (0.0, 0.5, 0.35, 1.5, None),
+    "step_mid": (0.0, 0.5, 0.70, 1.5, None),
+    "step_full": (0.0, 0.5, 1.00, 1.5, None),
+    "flick_up": (0.30, 1.5, 1.00, 1.0, None),
+    "flick_down": (1.00, 1.5, 0.00, 1.5, None),
+    "blip": (0.0, 0.5, 1.00, 0.12, 0.0),
+}
+STAGES = ("dispatch", "sim", "mixer", "buffer", "total")
+ONSET_WINDOW_S = 0.002
+
+
+class _ThrottleHand:
+    # main.py's input path on the rig: request is the slider position; each tick samples it
+    # through the filter and calls set_throttle only on a change (App._apply_throttle_input)
+    def __init__(self, rig, filter_declaration):
+        self.rig = rig
+        self.throttle_filter = throttle_input.compile_filter(filter_declaration)
+        self.request = 0.0
+        self.applied_q = None
+        rig.before_update = self.apply
+
+    def _read(self):
+        return int(self.request * throttle_input.THROTTLE_ONE + 0.5)
+
+    def apply(self):
+        value_q = self.throttle_filter.sample(self._read, int(self.rig.clock() * 1000))
+        if value_q != self.applied_q:
+            self.applied_q = value_q
+            self.rig.engine_simulator.set_throttle(value_q / throttle_input.THROTTLE_ONE)
+
+
+def _audio_action_count(audio_manager):
+    return audio_manager.crossfades_started + audio_manager.crossfade_retargets + sum(audio_manager.sfx_play_counts.values())
+
+
+def _run_trial(scenario, phase, seed, buffer_size, inject, filter_declaration):
+    baseline, settle_s, stepped, hold_s, release = scenario
+    rig = OfflineRig(buffer_size=buffer_size, seed=seed)
+    try:
+        hand = _ThrottleHand(rig, filter_declaration)
+        if not rig.start_to_idle():
+            raise RuntimeError("LATENCY: Engine did not reach IDLE on the offline rig.")
+        am = rig.audio_manager
+        hand.request = baseline
+        rig.run_for(settle_s)
+
+        input_time = rig.next_tick_time - rig.tick_interval + phase # Somewhere inside the current tick period
+        rig.advance_to(input_time)
+        actions_before = _audio_action_count(am)
+        action_time = None
+        if inject: hand.request = stepped
+        first_tick_time = rig.next_tick_time
+        release_time = input_time + hold_s if release is not None else None
+        end_time = input_time + hold_s + (1.0 if release is not None else 0.0)
+        while rig.next_tick_time <= end_time:
+            if inject and release_time is not None and rig.next_tick_time >= release_time:
+                rig.advance_to(release_time)
+                hand.request = release
+                release_time = None
+            tick_time = rig.next_tick_time
+            rig.tick()
+            if action_time is None and _audio_action_count(am) != actions_before:
+                action_time = tick_time
+        return rig, input_time, first_tick_time, action_time
+    finally:
+        rig.close()
+
+
+def _detect_onset(with_input, without_input, from_frame, frequency):
+    frames = min(len(with_input), len(without_input))
+    if frames <= from_frame: return None
+    diff = (with_input[from_frame:frames].astype(np.float32) - without_input[from_frame:frames].astype(np.float32)) / 32768.0
+    window = max(1, int(frequency * ONSET_WINDOW_S))
+    usable = (len(diff) // window) * window
+    if usable == 0: return None
+    power = (diff[:usable] ** 2).reshape(-1, window * diff.shape[1]).mean(axis=1)
+    threshold = 10.0 ** (config.LATENCY_ONSET_THRESHOLD_DBFS / 10.0)
+    loud = np.nonzero(power > threshold)[0]
+    if len(loud) == 0: return None
+    # Report the first changed frame inside that window, not the window start, so the onset
+    # is never attributed to the device buffer before the one that actually carried it
+    window_start = int(loud[0]) * window
+    changed = np.nonzero(np.abs(diff[window_start:window_start + window]).max(axis=1) > 0.0)[0]
+    return from_frame + window_start + (int(changed[0]) if len(changed) else 0)
+
+
+def measure_scenario(name, trials, buffer_size, filter_declaration=config.THROTTLE_INPUT_FILTER):
+    scenario = SCENARIOS[name]
+    tick_interval = 1.0 / 120
+    results = {stage: [] for stage in STAGES}
+    silent_trials = 0
+    for i in range(trials):
+        phase = (i + 0.5) / trials * tick_interval
+        rig, input_time, first_tick_time, action_time = _run_trial(scenario, phase, i, buffer_size, True, filter_declaration)
+        baseline_rig, _, _, _ = _run_trial(scenario, phase, i, buffer_size, False, filter_declaration)
+        input_chunk = rig.chunk_index_at(input_time)
+        onset_frame = _detect_onset(rig.output(), baseline_rig.output(), input_chunk * rig.buffer_size, rig.frequency)
+        if onset_frame is None or action_time is None:
+            silent_trials += 1
+            continue
+        onset_chunk = onset_frame // rig.buffer_size
+        render_time = rig.chunk_render_time(onset_chunk)
+        audible_time = rig.chunk_playout_time(onset_chunk) + (onset_frame - onset_chunk * rig.buffer_size) / float(rig.frequency)
+        results["dispatch"].append(first_tick_time - input_time)
+        results["sim"].append(action_time - first_tick_time)
+        results["mixer"].append(render_time - action_time)
+        results["buffer"].append(audible_time - render_time)
+        results["total"].append(audible_time - input_time)
+    return results, silent_trials
+
+
+def _summary_ms(values):
+    if not values: return "      -       -       -"
+    ordered = sorted(values)
+    p90 = ordered[min(len(ordered) - 1, int(0.9 * len(ordered)))]
+    return f"{statistics.median(ordered) * 1000:7.1f} {p90 * 1000:7.1f} {ordered[-1] * 1000:7.1f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throttle-to-audible latency on the offline rig.")
+    parser.add_argument("--trials", type=int, default=config.LATENCY_HARNESS_TRIALS)
+    parser.add_argument("--buffer", type=int, default=config.MIXER_BUFFER_SIZE, help="Mixer buffer size in frames")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="Scenario(s) to run (default: all)")
+    parser.add_argument("--unfiltered", action="store_true", help="Skip THROTTLE_INPUT_FILTER (raw slider value each tick)")
+    args = parser.parse_args()
+    filter_declaration = [] if args.unfiltered else config.THROTTLE_INPUT_FILTER
+
+    print(f"LATENCY: buffer={args.buffer} frames, trials={args.trials}, "
+          f"predictive={config.ENABLE_PREDICTIVE_CROSSFADE}, layers={config.ENABLE_PREWARMED_ENGINE_LAYERS}, "
+          f"input filter={'off' if args.unfiltered else 'on'}")
+    for name in args.scenario or SCENARIOS:
+        results, silent_trials = measure_scenario(name, args.trials, args.buffer, filter_declaration)
+        print(f"\n{name}: {args.trials - silent_trials}/{args.trials} trials with an audible change (ms: median p90 max)")
+        for stage in STAGES:
+            print(f"  {stage:<9} {_summary_ms(results[stage])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,29 +5,53 @@ import time
 import config
 from audio_manager import AudioManager
 from engine_simulator import EngineSimulator, EngineState
+from telemetry import TelemetryWriter
+from metrics import TickMetrics, MetricsRenderer, MetricsServer, STATE_NAMES
+from buffer_calibration import load_calibrated_buffer_size, UnderrunMonitor
+from audio_sinks import create_sinks, MixerPump, ScopeSink
+from scope_panel import LivePanel
+from events import EventPrinter
+from tick_trace import TickTrace
+from config_snapshot import ConfigReloader
+from ringlog import log
+import soft_mixer
+import throttle_input
 import threading
 import pygame # Keep pygame import here
 
 # --- Pygame Initialization ---
 pygame.init()
-print("MAIN_APP: Pygame initialized (pygame.init()).")
+log.info("MAIN_APP", "Pygame initialized (pygame.init()).")
 
 class App:
     def __init__(self, root):
         self.root = root
         self.root.title("Electric Scooter Sound Simulator")
-        self.root.geometry("400x350")
+        self.root.geometry("400x790" if config.ENABLE_SCOPE_PANEL else "400x350")
 
         self.running = True
         self.audio_manager = None
         self.engine_simulator = None
+        self.telemetry_writer = None
+        self.tick_metrics = None
+        self.metrics_server = None
+        self.underrun_monitor = None
+        self.config_reloader = None
+        self.live_panel = None
+        # Slider position, written by the Tk thread; the sim thread conditions it each tick
+        self.throttle_request = 0.0
+        self.throttle_filter = throttle_input.compile_filter(config.THROTTLE_INPUT_FILTER)
+        self.applied_throttle_q = None
+        # Start/Stop button press ("start" or "stop"), posted by the Tk thread; the sim thread
+        # acts on it at the top of its next tick, so every engine event is emitted there
+        self.engine_request = None
 
         self._init_ui()
 
-        print("MAIN_APP: Initializing and starting simulation thread...")
+        log.info("MAIN_APP", "Initializing and starting simulation thread...")
         self.simulation_thread = threading.Thread(target=self._simulation_init_and_loop, daemon=True)
         self.simulation_thread.start()
-        print("MAIN_APP: Simulation thread has been started.")
+        log.info("MAIN_APP", "Simulation thread has been started.")
 
         self.root.protocol("WM_DELETE_WINDOW", self._on_closing)
 
@@ -63,16 +87,30 @@ class App:
         self.status_label = ttk.Label(self.root, text="Initializing...", font=("Arial", 10))
         self.status_label.pack(pady=10)
 
+        if config.ENABLE_SCOPE_PANEL:
+            self.live_panel = LivePanel(self.root)
+            self.live_panel.pack(pady=5)
+            self.live_panel.start()
+
     def _simulation_init_and_loop(self):
-        print("SIM_THREAD: _simulation_init_and_loop started.")
+        log.info("SIM_THREAD", "_simulation_init_and_loop started.")
         try:
             self.root.after(0, lambda: self.status_label.config(text="Initializing Audio..."))
-            print("SIM_THREAD: Initializing AudioManager...")
+            log.info("SIM_THREAD", "Initializing AudioManager...")
+            mixer_buffer_size = load_calibrated_buffer_size(config.MIXER_BUFFER_SIZE)
+            log.info("SIM_THREAD", "Using mixer buffer of {} frames.", mixer_buffer_size)
+            output_sinks = create_sinks(config.AUDIO_OUTPUT_SINKS, mixer_buffer_size) if config.AUDIO_OUTPUT_SINKS else []
+            scope_sink = None
+            if config.ENABLE_SCOPE_PANEL and output_sinks:
+                scope_sink = ScopeSink(mixer_buffer_size)
+                output_sinks.append(scope_sink)
+            if output_sinks:
+                log.info("SIM_THREAD", "Rendering through soft_mixer into sinks: {}", ', '.join(sink.name for sink in output_sinks))
             self.audio_manager = AudioManager(
                 mixer_frequency=config.MIXER_FREQUENCY,
                 mixer_size=config.MIXER_SIZE,
                 mixer_channels=config.MIXER_CHANNELS,
-                mixer_buffer=config.MIXER_BUFFER_SIZE,
+                mixer_buffer=mixer_buffer_size,
                 num_audio_channels=config.NUM_AUDIO_CHANNELS,
                 sound_files=config.SOUND_FILES,
                 sfx_volume=config.SFX_VOLUME,
@@ -81,48 +119,90 @@ class App:
                 accel_burst_cooldown_ms=config.ACCEL_BURST_COOLDOWN_MS,
                 decel_pop_cooldown_ms=config.DECEL_POP_COOLDOWN_MS,
                 enable_accel_burst=config.ENABLE_ACCEL_BURST,
-                enable_decel_pops=config.ENABLE_DECEL_POPS
+                enable_decel_pops=config.ENABLE_DECEL_POPS,
+                mixer_module=soft_mixer if output_sinks else None
             )
-            print("SIM_THREAD: AudioManager initialized.")
+            if output_sinks:
+                self.audio_manager.output_pump = MixerPump(soft_mixer, output_sinks, self.audio_manager.clock,
+                                                           mixer_buffer_size, config.MIXER_FREQUENCY)
+            log.info("SIM_THREAD", "AudioManager initialized.")
 
-            if not pygame.mixer.get_init():
-                print("SIM_THREAD: Pygame Mixer not initialized after AudioManager init. Disabling controls.")
+            if not self.audio_manager.mixer.get_init():
+                log.error("SIM_THREAD", "Pygame Mixer not initialized after AudioManager init. Disabling controls.")
                 self.root.after(0, lambda: self.status_label.config(text="ERROR: Pygame Mixer failed. No audio."))
                 while self.running:
                     time.sleep(0.1)
-                print("SIM_THREAD: Exiting due to mixer init failure and app closing.")
+                log.info("SIM_THREAD", "Exiting due to mixer init failure and app closing.")
                 return
 
             self.root.after(0, lambda: self.status_label.config(text="Initializing Engine Simulator..."))
-            print("SIM_THREAD: Initializing EngineSimulator...")
+            log.info("SIM_THREAD", "Initializing EngineSimulator...")
             self.engine_simulator = EngineSimulator(self.audio_manager)
-            print("SIM_THREAD: EngineSimulator initialized.")
+            log.info("SIM_THREAD", "EngineSimulator initialized.")
+            if self.live_panel:
+                self.root.after(0, lambda: self.live_panel.attach(self.engine_simulator, scope_sink, STATE_NAMES))
+
+            if config.ENABLE_CONFIG_RELOAD:
+                self.config_reloader = ConfigReloader(config.__file__, self.engine_simulator.apply_config)
+                self.config_reloader.start()
+
+            if config.LOG_ENGINE_EVENTS:
+                self.engine_simulator.events.subscribe_all(EventPrinter())
+
+            if config.ENABLE_TICK_TRACE:
+                self.engine_simulator.trace = TickTrace(config.TRACE_CAPACITY, config.TRACE_DUMP_DIR)
+                self.root.after(0, lambda: self.root.bind("<F9>", self._dump_trace))
+
+            if config.ENABLE_TELEMETRY_RING:
+                try:
+                    self.telemetry_writer = TelemetryWriter(config.TELEMETRY_RING_NAME, config.TELEMETRY_RING_SLOTS)
+                    self.engine_simulator.telemetry = self.telemetry_writer
+                except OSError as e:
+                    log.warning("SIM_THREAD", "Telemetry ring unavailable: {}", e)
+
+            self.underrun_monitor = UnderrunMonitor(mixer_buffer_size, config.MIXER_FREQUENCY, output_sinks)
+
+            if config.ENABLE_METRICS_ENDPOINT:
+                self.tick_metrics = TickMetrics(config.METRICS_TICK_WINDOW)
+                try:
+                    self.metrics_server = MetricsServer(
+                        MetricsRenderer(self.tick_metrics, self.engine_simulator, self.audio_manager,
+                                        self.underrun_monitor),
+                        config.METRICS_HOST, config.METRICS_PORT)
+                except OSError as e:
+                    log.warning("SIM_THREAD", "Metrics endpoint unavailable: {}", e)
+                    self.tick_metrics = None
             
             self.root.after(0, lambda: self.start_button.config(state=tk.NORMAL))
             self.root.after(0, lambda: self.throttle_slider.config(state=tk.NORMAL)) # Enable slider after init
             self.root.after(0, lambda: self.status_label.config(text="Ready."))
 
-            print("SIM_THREAD: Entering main simulation loop...")
+            log.info("SIM_THREAD", "Entering main simulation loop...")
             target_fps = 120 
             target_sleep_time = 1.0 / target_fps
             
             while self.running:
                 loop_start_time = time.perf_counter()
+                self.underrun_monitor.record_tick(loop_start_time, target_sleep_time)
 
                 if self.engine_simulator:
+                    self._apply_engine_request()
+                    self._apply_throttle_input()
                     self.engine_simulator.update() 
                 
                 self.root.after(0, self._update_gui_data)
 
                 loop_end_time = time.perf_counter()
                 processing_time = loop_end_time - loop_start_time
+                if self.tick_metrics: self.tick_metrics.record_tick(processing_time, target_sleep_time)
                 sleep_time = target_sleep_time - processing_time
                 if sleep_time > 0:
                     time.sleep(sleep_time)
-            print("SIM_THREAD: Exited main simulation loop because self.running is False.")
+            log.info("SIM_THREAD", "Exited main simulation loop because self.running is False.")
 
         except Exception as e:
-            print(f"SIM_THREAD: ***** EXCEPTION IN SIMULATION THREAD *****")
+            log.error("SIM_THREAD", "***** EXCEPTION IN SIMULATION THREAD *****")
+            log.flush() # Keep the log ahead of the traceback, which goes straight to stderr
             import traceback
             traceback.print_exc()
             try:
@@ -130,25 +210,51 @@ class App:
             except tk.TclError: 
                 pass
 
-        print("SIM_THREAD: Starting cleanup...")
+        log.info("SIM_THREAD", "Starting cleanup...")
+        if self.config_reloader:
+            self.config_reloader.stop()
+        if self.metrics_server:
+            self.metrics_server.stop()
+        if self.telemetry_writer:
+            if self.engine_simulator: self.engine_simulator.telemetry = None
+            self.telemetry_writer.close()
         if self.audio_manager:
-            if 'pygame' in globals() and pygame.mixer and pygame.mixer.get_init():
-                print("SIM_THREAD: Stopping all sounds and quitting mixer via AudioManager.")
+            if self.audio_manager.mixer and self.audio_manager.mixer.get_init():
+                log.info("SIM_THREAD", "Stopping all sounds and quitting mixer via AudioManager.")
                 self.audio_manager.stop_all_sounds() 
                 self.audio_manager.quit()
             else:
-                print("SIM_THREAD: Mixer not initialized or pygame module gone at cleanup, skipping audio_manager quit.")
+                log.info("SIM_THREAD", "Mixer not initialized or pygame module gone at cleanup, skipping audio_manager quit.")
         else:
-            print("SIM_THREAD: No audio_manager to clean up.")
+            log.info("SIM_THREAD", "No audio_manager to clean up.")
         
-        print("SIM_THREAD: _simulation_init_and_loop finished.")
+        log.info("SIM_THREAD", "_simulation_init_and_loop finished.")
+
+    def _read_throttle_request(self):
+        return int(self.throttle_request * throttle_input.THROTTLE_ONE + 0.5)
+
+    def _apply_throttle_input(self):
+        # Runs on the sim thread: one filtered sample per tick, set_throttle only on a change
+        value_q = self.throttle_filter.sample(self._read_throttle_request, int(time.monotonic() * 1000))
+        if value_q != self.applied_throttle_q:
+            self.applied_throttle_q = value_q
+            # Regardless of engine state; the simulator decides what the throttle does
+            self.engine_simulator.set_throttle(value_q / throttle_input.THROTTLE_ONE)
+
+    def _apply_engine_request(self):
+        # Runs on the sim thread
+        request, self.engine_request = self.engine_request, None
+        if request is None: return
+        state = self.engine_simulator.get_state()
+        if request == "start" and state == EngineState.OFF:
+            self.engine_simulator.start_engine()
+        elif request == "stop" and state not in [EngineState.OFF, EngineState.SHUTTING_DOWN]:
+            self.engine_simulator.stop_engine()
 
     def _on_throttle_change(self, value_str):
         if not self.engine_simulator or not self.running:
             return
-        value = float(value_str) / 100.0
-        # Call set_throttle regardless of engine state, let simulator handle it
-        self.engine_simulator.set_throttle(value)
+        self.throttle_request = float(value_str) / 100.0
 
         if hasattr(self, 'throttle_value_label'):
             try:
@@ -157,19 +263,13 @@ class App:
                  pass
 
     def _start_engine(self):
-        print("MAIN_APP: Start Engine button clicked.")
-        if self.engine_simulator and self.engine_simulator.get_state() == EngineState.OFF:
-            self.engine_simulator.start_engine()
-        # Update GUI immediately after trying to start
-        self._update_gui_data()
+        log.info("MAIN_APP", "Start Engine button clicked.")
+        if self.engine_simulator: self.engine_request = "start" # The GUI follows on the next tick
 
 
     def _stop_engine(self):
-        print("MAIN_APP: Stop Engine button clicked.")
-        if self.engine_simulator and self.engine_simulator.get_state() not in [EngineState.OFF, EngineState.SHUTTING_DOWN]:
-            self.engine_simulator.stop_engine()
-        # Update GUI immediately
-        self._update_gui_data()
+        log.info("MAIN_APP", "Stop Engine button clicked.")
+        if self.engine_simulator: self.engine_request = "stop"
 
 
     def _update_gui_data(self):
@@ -208,13 +308,13 @@ class App:
                 is_busy_transition = (state == EngineState.STARTING or state == EngineState.SHUTTING_DOWN)
                 
                 if hasattr(self, 'start_button') and self.start_button.winfo_exists():
-                    self.start_button.config(state=tk.NORMAL if is_off and pygame.mixer.get_init() else tk.DISABLED)
+                    self.start_button.config(state=tk.NORMAL if is_off and self.audio_manager.mixer.get_init() else tk.DISABLED)
                 if hasattr(self, 'stop_button') and self.stop_button.winfo_exists():
                     self.stop_button.config(state=tk.DISABLED if (is_off or is_busy_transition) else tk.NORMAL)
                 if hasattr(self, 'throttle_slider') and self.throttle_slider.winfo_exists():
                      # Throttle slider should be enabled if engine is IDLE or RUNNING, and not busy.
                      # And pygame mixer must be initialized.
-                     slider_state = tk.NORMAL if state in [EngineState.IDLE, EngineState.RUNNING] and not is_busy_transition and pygame.mixer.get_init() else tk.DISABLED
+                     slider_state = tk.NORMAL if state in [EngineState.IDLE, EngineState.RUNNING] and not is_busy_transition and self.audio_manager.mixer.get_init() else tk.DISABLED
                      self.throttle_slider.config(state=slider_state)
             else: 
                 if hasattr(self, 'start_button') and self.start_button.winfo_exists(): self.start_button.config(state=tk.DISABLED)
@@ -227,34 +327,41 @@ class App:
         except tk.TclError:
             pass 
         except Exception as e:
-            print(f"MAIN_APP: Error in _update_gui_data: {e}")
+            log.error("MAIN_APP", "_update_gui_data failed: {}", e)
             import traceback
             traceback.print_exc()
 
 
+    def _dump_trace(self, event=None):
+        trace = self.engine_simulator.trace if self.engine_simulator else None
+        if trace is None: return
+        path = trace.dump("manual")
+        self.status_label.config(text=f"Trace saved to {path}")
+
     def _on_closing(self):
-        print("MAIN_APP: _on_closing called. Setting self.running to False.")
+        log.info("MAIN_APP", "_on_closing called. Setting self.running to False.")
         self.running = False
+        if self.live_panel: self.live_panel.stop()
         if hasattr(self, 'simulation_thread') and self.simulation_thread.is_alive():
-            print("MAIN_APP: Waiting for simulation thread to join...")
+            log.info("MAIN_APP", "Waiting for simulation thread to join...")
             self.simulation_thread.join(timeout=5) 
             if self.simulation_thread.is_alive():
-                print("MAIN_APP: WARNING! Simulation thread did not join in time.")
+                log.warning("MAIN_APP", "Simulation thread did not join in time.")
             else:
-                print("MAIN_APP: Simulation thread joined successfully.")
+                log.info("MAIN_APP", "Simulation thread joined successfully.")
         
         if hasattr(self, 'root') and self.root.winfo_exists():
             self.root.destroy()
-        print("MAIN_APP: Root window destroyed or was already gone.")
+        log.info("MAIN_APP", "Root window destroyed or was already gone.")
 
 
 if __name__ == "__main__":
-    print("MAIN_APP: Application started.")
+    log.info("MAIN_APP", "Application started.")
     main_root = tk.Tk()
     app = App(main_root)
     main_root.mainloop()
 
     if pygame.get_init():
-        print("MAIN_APP: Quitting Pygame (pygame.quit()).")
+        log.info("MAIN_APP", "Quitting Pygame (pygame.quit()).")
         pygame.quit()
-    print("MAIN_APP: mainloop finished.")
\ No newline at end of file
+    log.info("MAIN_APP", "mainloop finished.")
\ No newline at end of file
@@ -0,0 +1,181 @@
+# metrics.py
+# Optional local HTTP endpoint serving Prometheus text format.
+# Nothing is formatted on the sim thread: the loop only drops tick durations into a
+# preallocated array and bumps ints; everything else is read from the plain counters
+# AudioManager / EngineSimulator already keep and rendered when /metrics is scraped.
+# render() keeps no state between scrapes, so any number of scrapers can share it; rates
+# such as the tick rate are left to PromQL (rate(scooter_sim_ticks_total[1m])).
+import threading
+import time
+from array import array
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import config
+from ringlog import log
+from engine_simulator import EngineState
+
+STATE_NAMES = {
+    EngineState.OFF: "off",
+    EngineState.STARTING: "starting",
+    EngineState.IDLE: "idle",
+    EngineState.RUNNING: "running",
+    EngineState.SHUTTING_DOWN: "shutting_down",
+}
+TICK_QUANTILES = (0.5, 0.9, 0.99, 1.0)
+
+
+class TickMetrics:
+    def __init__(self, window=config.METRICS_TICK_WINDOW):
+        self.window = window
+        self.tick_durations_s = array("d", bytes(8 * window))
+        self.ticks_total = 0
+        self.tick_seconds_total = 0.0 # Summary _sum: every tick, not just the window
+        self.loop_overruns_total = 0
+        self.started_at = time.time()
+
+    def record_tick(self, processing_time_s, budget_s):
+        n = self.ticks_total
+        self.tick_durations_s[n % self.window] = processing_time_s
+        self.ticks_total = n + 1
+        self.tick_seconds_total += processing_time_s
+        if processing_time_s > budget_s: self.loop_overruns_total += 1
+
+    def latency_quantiles(self):
+        filled = min(self.ticks_total, self.window)
+        if filled == 0: return {q: 0.0 for q in TICK_QUANTILES}
+        samples = sorted(self.tick_durations_s[:filled])
+        return {q: samples[min(filled - 1, int(q * filled))] for q in TICK_QUANTILES}
+
+
+class MetricsRenderer:
+    def __init__(self, tick_metrics, engine_simulator, audio_manager, underrun_monitor=None):
+        self.tick_metrics = tick_metrics
+        self.underrun_monitor = underrun_monitor
+        self.engine_simulator = engine_simulator
+        self.audio_manager = audio_manager
+
+    def render(self):
+        now = time.time()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels) if labels else ""
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+        tm = self.tick_metrics
+        if tm:
+            ticks = tm.ticks_total
+            metric("scooter_sim_ticks_total", "counter", "Simulation ticks executed.", [((), ticks)])
+            quantiles = tm.latency_quantiles()
+            metric("scooter_sim_tick_latency_seconds", "summary",
+                   f"Tick processing time: quantiles over the last {tm.window} ticks, _sum/_count over all ticks.",
+                   [((("quantile", str(q)),), f"{v:.9f}") for q, v in quantiles.items()])
+            lines.append(f"scooter_sim_tick_latency_seconds_sum {tm.tick_seconds_total:.9f}")
+            lines.append(f"scooter_sim_tick_latency_seconds_count {ticks}")
+            metric("scooter_sim_loop_overruns_total", "counter", "Ticks that exceeded the loop budget.",
+                   [((), tm.loop_overruns_total)])
+
+        um = self.underrun_monitor
+        if um:
+            if um.sinks:
+                metric("scooter_audio_underruns_total", "counter",
+                       "Output device callbacks that found less rendered audio than they needed, by sink.",
+                       [((("sink", sink.name),), sink.underruns) for sink in um.sinks])
+                metric("scooter_audio_sink_dropped_blocks_total", "counter",
+                       "Mixer blocks a sink dropped because its queue was full, by sink.",
+                       [((("sink", sink.name),), sink.dropped_blocks) for sink in um.sinks])
+            metric("scooter_audio_suspected_underruns_total", "counter",
+                   "Sim ticks that arrived more than one mixer buffer late.", [((), um.suspected_underruns)])
+            metric("scooter_audio_worst_tick_gap_seconds", "gauge", "Longest late tick gap seen.",
+                   [((), f"{um.worst_gap_s:.6f}")])
+
+        am = self.audio_manager
+        if am:
+            metric("scooter_audio_crossfades_total", "counter", "Engine loop crossfades started.",
+                   [((), am.crossfades_started)])
+            metric("scooter_audio_crossfades_per_minute", "gauge", "Crossfades started in the last 60 s (whole seconds).",
+                   [((), am.crossfades_last_minute(now))])
+            metric("scooter_audio_crossfades_aborted_total", "counter", "Crossfades cut off by a new target and restarted from silence.",
+                   [((), am.crossfades_aborted)])
+            metric("scooter_audio_crossfade_retargets_total", "counter",
+                   "Interrupted crossfades continued from their current gains, by kind.",
+                   [((("kind", "reversal"),), am.crossfade_reversals),
+                    ((("kind", "new_target"),), am.crossfade_retargets - am.crossfade_reversals)])
+            metric("scooter_audio_channel_restarts_avoided_total", "counter",
+                   "Channel restarts a stop-and-restart crossfade would have needed.",
+                   [((), am.channel_restarts_avoided)])
+            metric("scooter_audio_sfx_plays_total", "counter", "SFX started, by sound.",
+                   [((("sfx", key),), count) for key, count in list(am.sfx_play_counts.items())])
+            metric("scooter_audio_sfx_suppressed_total", "counter", "SFX requests dropped, by sound and reason.",
+                   [((("sfx", key), ("reason", reason)), count)
+                    for (key, reason), count in list(am.sfx_suppressed_counts.items())])
+            metric("scooter_audio_voices", "gauge", "Mixer channels reserved, by role.",
+                   [((("role", role),), count) for role, count in am.voice_usage.items()])
+            pool = am.sfx_voices
+            metric("scooter_audio_voice_drops_total", "counter", "SFX plays that found no free or stealable voice, by category.",
+                   [((("category", key),), count) for key, count in list(pool.drops.items())])
+            metric("scooter_audio_voice_steals_total", "counter", "SFX voices taken over by a higher priority, by the category that lost them.",
+                   [((("category", key),), count) for key, count in list(pool.steals.items())])
+            metric("scooter_audio_mixer_buffer_frames", "gauge", "Mixer buffer size in use.",
+                   [((), am.mixer_buffer_size)])
+            metric("scooter_audio_load_seconds", "gauge", "Time spent loading the active sound pack.",
+                   [((), f"{am.sound_load_time_s:.6f}")])
+            pack = am.sound_pack
+            if pack is not None:
+                metric("scooter_audio_sound_pack_info", "gauge", "Sound pack in use.", [((("pack", pack.name),), 1)])
+                metric("scooter_audio_sound_pack_bytes", "gauge", "PCM size of the sound pack in use.", [((), pack.bytes)])
+            metric("scooter_audio_sound_pack_swaps_total", "counter", "Sound packs swapped in while running.",
+                   [((), am.sound_pack_swaps)])
+
+        sim = self.engine_simulator
+        if sim:
+            dwell = dict(sim.state_dwell_s)
+            observed_state, since = sim.observed_state, sim.observed_state_since
+            dwell[observed_state] = dwell.get(observed_state, 0.0) + max(0.0, now - since)
+            metric("scooter_engine_state_dwell_seconds_total", "counter", "Time spent in each engine state.",
+                   [((("state", STATE_NAMES.get(state, str(state))),), f"{seconds:.3f}")
+                    for state, seconds in dwell.items()])
+            metric("scooter_engine_crossfade_predictions_total", "counter",
+                   "Predictive band crossfades, by whether the RPM actually reached the band.",
+                   [((("result", "hit"),), sim.prediction_hits), ((("result", "miss"),), sim.prediction_misses)])
+            stats = sim.get_prediction_stats()
+            metric("scooter_engine_crossfade_prediction_error_seconds", "gauge",
+                   "Mean |actual band crossing - predicted crossing| over hits.",
+                   [((), f"{stats['mean_abs_error_s']:.4f}")])
+
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    def __init__(self, renderer, host=config.METRICS_HOST, port=config.METRICS_PORT):
+        self.renderer = renderer
+        render_lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(handler):
+                if handler.path not in ("/metrics", "/"):
+                    handler.send_error(404); return
+                with render_lock:
+                    body = renderer.render().encode("utf-8")
+                handler.send_response(200)
+                handler.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                handler.send_header("Content-Length", str(len(body)))
+                handler.end_headers()
+                handler.wfile.write(body)
+
+            def log_message(handler, format, *args):
+                pass # Scrapes every few seconds would otherwise spam the console
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        log.info("METRICS", "Serving Prometheus metrics on http://{}:{}/metrics", host, port)
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        log.info("METRICS", "Endpoint stopped.")
@@ -0,0 +1,101 @@
+# offline_render.py
+# Runs AudioManager + EngineSimulator against soft_mixer on a virtual clock, so a
+# session can be rendered faster than real time and replayed exactly.
+#
+# The mixer is modelled like SDL's device callback: every MIXER_BUFFER_SIZE frames a
+# whole buffer is rendered with the channel gains as they are at that moment, and that
+# buffer starts playing one buffer later. Sim ticks run at tick_hz in between.
+import random
+
+import numpy as np
+
+import config
+import soft_mixer
+from audio_manager import AudioManager
+from engine_simulator import EngineSimulator, EngineState
+
+
+class VirtualClock:
+    def __init__(self, start_time=1000.0):
+        self.now = start_time
+
+    def __call__(self):
+        return self.now
+
+
+class OfflineRig:
+    def __init__(self, tick_hz=120, buffer_size=config.MIXER_BUFFER_SIZE, frequency=config.MIXER_FREQUENCY, seed=None):
+        if soft_mixer.get_init(): soft_mixer.quit()
+        soft_mixer.init(frequency=frequency, size=config.MIXER_SIZE, channels=config.MIXER_CHANNELS, buffer=buffer_size)
+        self.clock = VirtualClock()
+        self.start_time = self.clock.now
+        self.frequency = frequency
+        self.buffer_size = buffer_size
+        self.buffer_period = buffer_size / float(frequency)
+        self.tick_interval = 1.0 / tick_hz
+        self.next_tick_time = self.start_time
+        self.chunks = []
+        self.before_update = None # Called at each tick, just before the sim update (main.py samples input there)
+
+        self.audio_manager = AudioManager(
+            mixer_frequency=frequency,
+            mixer_size=config.MIXER_SIZE,
+            mixer_channels=config.MIXER_CHANNELS,
+            mixer_buffer=buffer_size,
+            num_audio_channels=config.NUM_AUDIO_CHANNELS,
+            sound_files=config.SOUND_FILES,
+            sfx_volume=config.SFX_VOLUME,
+            main_engine_volume=config.MAIN_ENGINE_VOLUME,
+            crossfade_duration_ms=config.CROSSFADE_DURATION_MS,
+            accel_burst_cooldown_ms=config.ACCEL_BURST_COOLDOWN_MS,
+            decel_pop_cooldown_ms=config.DECEL_POP_COOLDOWN_MS,
+            enable_accel_burst=config.ENABLE_ACCEL_BURST,
+            enable_decel_pops=config.ENABLE_DECEL_POPS,
+            mixer_module=soft_mixer,
+            clock=self.clock,
+        )
+        self.engine_simulator = EngineSimulator(self.audio_manager, clock=self.clock, rng=random.Random(seed))
+
+    # --- Timeline ---
+    def chunk_render_time(self, chunk_index):
+        return self.start_time + chunk_index * self.buffer_period
+
+    def chunk_playout_time(self, chunk_index):
+        return self.chunk_render_time(chunk_index) + self.buffer_period
+
+    def advance_to(self, t):
+        # Render every device buffer that falls due before t, then move the clock
+        while self.chunk_render_time(len(self.chunks)) <= t:
+            self.clock.now = self.chunk_render_time(len(self.chunks))
+            self.chunks.append(soft_mixer.render(self.buffer_size))
+        self.clock.now = t
+
+    def tick(self):
+        self.advance_to(self.next_tick_time)
+        if self.before_update: self.before_update()
+        self.engine_simulator.update()
+        self.next_tick_time += self.tick_interval
+
+    def run_for(self, seconds, on_tick=None):
+        end_time = self.clock.now + seconds
+        while self.next_tick_time <= end_time:
+            self.tick()
+            if on_tick: on_tick(self)
+
+    def start_to_idle(self, timeout_s=config.STARTER_TIMEOUT_S + 1.0):
+        self.engine_simulator.start_engine()
+        end_time = self.clock.now + timeout_s
+        while self.engine_simulator.get_state() != EngineState.IDLE and self.clock.now < end_time:
+            self.tick()
+        return self.engine_simulator.get_state() == EngineState.IDLE
+
+    # --- Output ---
+    def output(self, from_chunk=0):
+        if from_chunk >= len(self.chunks): return np.zeros((0, config.MIXER_CHANNELS), dtype=np.int16)
+        return np.concatenate(self.chunks[from_chunk:])
+
+    def chunk_index_at(self, t):
+        return int((t - self.start_time) / self.buffer_period)
+
+    def close(self):
+        self.audio_manager.quit()
@@ -0,0 +1,101 @@
+# ringlog.py
+# Leveled logger for the sim/audio path. A log call only appends a tuple (timestamp, level,
+# tag, format string, args) to an in-memory ring (collections.deque, lock-free under the
+# GIL); a background thread formats the records and writes them to stdout every
+# LOG_FLUSH_INTERVAL_S. A slow or piped console therefore only delays the log, never the
+# tick. When the ring is full the oldest records are dropped and counted.
+#
+#   from ringlog import log
+#   log.info("AUDIO_MAN", "Voice usage {} of {} channels.", usage, total)
+#   log.warning_limited("AUDIO_MAN", "Rate mismatch for {}!", key) # At most once per LOG_RATE_LIMIT_S
+#
+# Messages are str.format templates, formatted on the flush thread (pass immutable args or
+# copies). Output keeps the existing "TAG: [WARNING - ]message" console format.
+import atexit
+import sys
+import threading
+import time
+from collections import deque
+
+import config
+
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+LEVELS = {"DEBUG": DEBUG, "INFO": INFO, "WARNING": WARNING, "ERROR": ERROR}
+LEVEL_PREFIX = {DEBUG: "", INFO: "", WARNING: "WARNING - ", ERROR: "ERROR - "}
+
+
+class RingLogger:
+    def __init__(self, level=config.LOG_LEVEL, capacity=config.LOG_RING_SIZE,
+                 flush_interval_s=config.LOG_FLUSH_INTERVAL_S, rate_limit_s=config.LOG_RATE_LIMIT_S):
+        self.level = LEVELS[level] if isinstance(level, str) else level
+        self.capacity = capacity
+        self.flush_interval_s = flush_interval_s
+        self.rate_limit_s = rate_limit_s
+        self.records = deque(maxlen=capacity)
+        self.dropped = 0
+        self.rate_limits = {} # (tag, template) -> [last emitted (monotonic), suppressed since]
+        self.thread = None
+        self.flush_lock = threading.Lock() # Only taken by flushers, never by log calls
+
+    def log(self, level, tag, template, args, suppressed=0):
+        if level < self.level: return
+        records = self.records
+        if len(records) == self.capacity: self.dropped += 1
+        records.append((time.time(), level, tag, template, args, suppressed))
+        if self.thread is None: self._start()
+
+    def debug(self, tag, template, *args): self.log(DEBUG, tag, template, args)
+    def info(self, tag, template, *args): self.log(INFO, tag, template, args)
+    def warning(self, tag, template, *args): self.log(WARNING, tag, template, args)
+    def error(self, tag, template, *args): self.log(ERROR, tag, template, args)
+
+    def warning_limited(self, tag, template, *args):
+        # Repeats of the same template within rate_limit_s are counted instead of logged
+        if WARNING < self.level: return
+        now = time.monotonic()
+        key = (tag, template)
+        entry = self.rate_limits.get(key)
+        if entry is not None and now - entry[0] < self.rate_limit_s:
+            entry[1] += 1
+            return
+        self.rate_limits[key] = [now, 0]
+        self.log(WARNING, tag, template, args, entry[1] if entry else 0)
+
+    def _start(self):
+        self.thread = threading.Thread(target=self._run, name="ringlog", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval_s)
+            self.flush()
+
+    def flush(self):
+        with self.flush_lock:
+            lines = []
+            records = self.records
+            while True:
+                try:
+                    _, level, tag, template, args, suppressed = records.popleft()
+                except IndexError:
+                    break
+                try:
+                    message = template.format(*args) if args else template
+                except (IndexError, KeyError, ValueError) as e:
+                    message = f"{template!r} {args!r} (bad log format: {e})"
+                if suppressed: message += f" ({suppressed} similar suppressed)"
+                lines.append(f"{tag}: {LEVEL_PREFIX[level]}{message}\n")
+            if self.dropped:
+                lines.append(f"LOG: WARNING - {self.dropped} messages dropped (ring full)\n")
+                self.dropped = 0
+            if not lines: return
+            stream = sys.stdout # Looked up each time: RawPcmSink moves stdout to stderr
+            try:
+                stream.write("".join(lines))
+                stream.flush()
+            except (OSError, ValueError):
+                pass
+
+
+log = RingLogger()
+atexit.register(log.flush)
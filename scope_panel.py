@@ -0,0 +1,216 @@
+# scope_panel.py
+# Live RPM gauge plus waveform and spectrum of the mixed output for the Tk window.
+# Everything here runs on the Tk thread at config.SCOPE_FPS, independent of the 120 Hz sim
+# tick: the gauge reads the simulator's current RPM, the scope copies the newest output
+# blocks out of audio_sinks.ScopeSink (lock-free, the sim thread never waits on it) and
+# runs one NumPy FFT per frame. All canvas items are created once and only moved or
+# retexted afterwards (coords / itemconfigure), so a frame costs the same every time; the
+# panel shows its own cost per frame and share of one core.
+import math
+import time
+import tkinter as tk
+
+import numpy as np
+
+import config
+
+BACKGROUND = "#101418"
+GRID = "#2a3038"
+TRACE = "#4fd18b"
+BAND_COLOURS = ("#5a6470", "#3f9e5a", "#d6b43a", "#e0702e") # idle, low, mid, high RPM bands
+
+
+class RpmGauge:
+    SWEEP_DEG = 270.0
+    START_DEG = 225.0 # Zero RPM at the lower left, full scale at the lower right
+
+    def __init__(self, parent, width=380, height=190):
+        self.canvas = tk.Canvas(parent, width=width, height=height, bg=BACKGROUND, highlightthickness=0)
+        self.cx, self.cy = width / 2.0, height * 0.56
+        self.radius = min(width / 2.0, height * 0.56) - 12
+        self.scale_key = None
+        self.max_rpm = 1.0
+        self.shown_rpm = None
+        self.shown_state = None
+        c = self.canvas
+        r = self.radius
+        c.create_arc(self.cx - r, self.cy - r, self.cx + r, self.cy + r, start=self.START_DEG - self.SWEEP_DEG,
+                     extent=self.SWEEP_DEG, style=tk.ARC, outline=GRID, width=2)
+        self.needle = c.create_line(self.cx, self.cy, self.cx, self.cy - r, fill="#ff4040", width=3)
+        c.create_oval(self.cx - 6, self.cy - 6, self.cx + 6, self.cy + 6, fill="#d0d0d0", outline="")
+        self.rpm_text = c.create_text(self.cx, self.cy + r * 0.45, text="0", fill="white", font=("Arial", 18, "bold"))
+        self.state_text = c.create_text(self.cx, self.cy + r * 0.72, text="", fill="#a0a8b0", font=("Arial", 9))
+
+    def pack(self, **kwargs):
+        self.canvas.pack(**kwargs)
+
+    def _point(self, fraction, radius):
+        angle = math.radians(self.START_DEG - self.SWEEP_DEG * fraction)
+        return self.cx + radius * math.cos(angle), self.cy - radius * math.sin(angle)
+
+    def set_scale(self, max_rpm, band_edges):
+        # Static dial: 1000 RPM ticks and the band arcs. Redrawn only when the tuning (sound
+        # pack) changes; band_edges are the idle/low/mid upper bounds
+        key = (max_rpm, tuple(band_edges))
+        if key == self.scale_key: return
+        self.scale_key = key
+        self.max_rpm = float(max_rpm)
+        c = self.canvas
+        c.delete("scale")
+        r = self.radius
+        edges = [0.0] + [min(1.0, edge / self.max_rpm) for edge in band_edges] + [1.0]
+        for colour, low, high in zip(BAND_COLOURS, edges, edges[1:]):
+            if high <= low: continue
+            c.create_arc(self.cx - r + 4, self.cy - r + 4, self.cx + r - 4, self.cy + r - 4,
+                         start=self.START_DEG - self.SWEEP_DEG * high, extent=self.SWEEP_DEG * (high - low),
+                         style=tk.ARC, outline=colour, width=6, tags="scale")
+        for thousand in range(int(max_rpm // 1000) + 1):
+            fraction = thousand * 1000 / self.max_rpm
+            x0, y0 = self._point(fraction, r - 10)
+            x1, y1 = self._point(fraction, r - 22)
+            c.create_line(x0, y0, x1, y1, fill="#c0c8d0", width=2, tags="scale")
+            lx, ly = self._point(fraction, r - 34)
+            c.create_text(lx, ly, text=str(thousand), fill="#c0c8d0", font=("Arial", 9), tags="scale")
+        c.tag_raise(self.needle)
+
+    def show(self, rpm, state_text):
+        fraction = min(1.0, max(0.0, rpm / self.max_rpm))
+        x, y = self._point(fraction, self.radius - 16)
+        self.canvas.coords(self.needle, self.cx, self.cy, x, y)
+        shown = int(rpm) // 10 * 10 # Steadier digits; the needle carries the detail
+        if shown != self.shown_rpm:
+            self.shown_rpm = shown
+            self.canvas.itemconfigure(self.rpm_text, text=f"{shown} rpm")
+        if state_text != self.shown_state:
+            self.shown_state = state_text
+            self.canvas.itemconfigure(self.state_text, text=state_text)
+
+
+class ScopeView:
+    # Waveform (triggered on a rising zero crossing, so a steady loop stands still) above a
+    # log-frequency bar spectrum with a slow fall, both drawn from the same FFT window
+    def __init__(self, parent, scope_sink=None, width=380, height=230, frequency=config.MIXER_FREQUENCY,
+                 channels=config.MIXER_CHANNELS, fft_size=config.SCOPE_FFT_SIZE,
+                 points=config.SCOPE_WAVEFORM_POINTS, bands=config.SCOPE_SPECTRUM_BANDS,
+                 floor_db=config.SCOPE_SPECTRUM_FLOOR_DB):
+        self.sink = scope_sink
+        self.canvas = tk.Canvas(parent, width=width, height=height, bg=BACKGROUND, highlightthickness=0)
+        self.width, self.height = width, height
+        self.wave_height = height * 0.45
+        self.fft_size = fft_size
+        self.points = points
+        self.floor_db = float(floor_db)
+        self.fall_db = 1.5 # Per frame
+
+        # Buffers and tables, allocated once
+        self.samples = np.zeros(fft_size, dtype=np.float32)
+        self.window = np.hanning(fft_size).astype(np.float32)
+        full_scale = 32768.0 * channels # read_latest sums the channels
+        self.reference = float(self.window.sum()) * full_scale / 2.0 # A full-scale sine reads 0 dB
+        self.wave_scale = (self.wave_height / 2.0 - 4) / full_scale
+        self.wave_x = np.linspace(0, width, points)
+        self.wave_coords = np.empty(2 * points)
+        self.wave_coords[0::2] = self.wave_x
+        bin_hz = frequency / float(fft_size)
+        edges_hz = np.geomspace(40.0, frequency / 2.0, bands + 1)
+        starts = np.unique(np.clip((edges_hz[:-1] / bin_hz).astype(int), 1, fft_size // 2))
+        self.band_starts = starts
+        self.band_db = np.full(len(starts), self.floor_db)
+
+        c = self.canvas
+        mid = self.wave_height / 2.0
+        c.create_line(0, mid, width, mid, fill=GRID)
+        c.create_line(0, self.wave_height, width, self.wave_height, fill=GRID)
+        self.wave_line = c.create_line(*self.wave_coords_for(np.zeros(points)), fill=TRACE)
+        bar_width = width / float(len(starts))
+        self.bars = [c.create_rectangle(i * bar_width + 1, height, (i + 1) * bar_width - 1, height,
+                                        fill="#3a8fd6", outline="") for i in range(len(starts))]
+        self.bar_width = bar_width
+        self.note = c.create_text(width / 2.0, mid, fill="#a0a8b0", font=("Arial", 9),
+                                  text="" if scope_sink else "Gauge only: set AUDIO_OUTPUT_SINKS, e.g. (\"speakers\",), for the scope")
+
+    def pack(self, **kwargs):
+        self.canvas.pack(**kwargs)
+
+    def wave_coords_for(self, values):
+        self.wave_coords[1::2] = self.wave_height / 2.0 - values * self.wave_scale
+        return self.wave_coords.tolist()
+
+    def refresh(self):
+        if self.sink is None: return
+        samples = self.samples
+        valid = self.sink.read_latest(samples)
+        if valid < self.fft_size: return # Not enough output yet (or every block was being rewritten)
+
+        # Waveform: half the window, starting at the first rising zero crossing in the first half
+        span = self.fft_size // 2
+        crossings = np.flatnonzero((samples[:span - 1] < 0) & (samples[1:span] >= 0))
+        start = int(crossings[0]) if len(crossings) else 0
+        step = span / float(self.points)
+        picked = samples[(start + np.arange(self.points) * step).astype(int)]
+        self.canvas.coords(self.wave_line, self.wave_coords_for(picked))
+
+        # Spectrum: peak magnitude per log band, falling back slowly
+        spectrum = np.abs(np.fft.rfft(samples * self.window))
+        peaks = np.maximum.reduceat(spectrum, self.band_starts)
+        db = 20.0 * np.log10(peaks / self.reference + 1e-12)
+        self.band_db = np.maximum(np.maximum(db, self.band_db - self.fall_db), self.floor_db)
+        spectrum_height = self.height - self.wave_height - 6
+        heights = np.clip((self.band_db - self.floor_db) / -self.floor_db, 0.0, 1.0) * spectrum_height
+        c, bar_width, bottom = self.canvas, self.bar_width, self.height
+        for i, bar in enumerate(self.bars):
+            c.coords(bar, i * bar_width + 1, bottom - heights[i], (i + 1) * bar_width - 1, bottom)
+
+
+class LivePanel:
+    # Drives both views from the Tk event loop at fps; attach() once the simulator exists
+    def __init__(self, root, fps=config.SCOPE_FPS):
+        self.root = root
+        self.period_ms = max(1, int(1000 / fps))
+        self.frame = tk.Frame(root, bg=BACKGROUND)
+        self.gauge = RpmGauge(self.frame)
+        self.gauge.pack()
+        self.scope = None
+        self.cost_text = self.gauge.canvas.create_text(6, 6, anchor=tk.NW, text="", fill="#606870", font=("Arial", 8))
+        self.engine_simulator = None
+        self.state_names = {}
+        self.running = False
+        self.frame_cost_s = 0.0 # EMA of one refresh
+        self.cost_shown_at = 0.0
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    def attach(self, engine_simulator, scope_sink, state_names):
+        self.engine_simulator = engine_simulator
+        self.state_names = state_names
+        self.scope = ScopeView(self.frame, scope_sink)
+        self.scope.pack(pady=(4, 0))
+
+    def start(self):
+        self.running = True
+        self.root.after(self.period_ms, self._refresh)
+
+    def stop(self):
+        self.running = False
+
+    def _refresh(self):
+        if not self.running: return
+        started = time.perf_counter()
+        try:
+            sim = self.engine_simulator
+            if sim is not None:
+                cfg = sim.cfg
+                self.gauge.set_scale(cfg.max_rpm, (cfg.idle_below, cfg.low_below, cfg.mid_below))
+                self.gauge.show(sim.get_rpm(), self.state_names.get(sim.get_state(), ""))
+            if self.scope is not None: self.scope.refresh()
+        except tk.TclError:
+            return # Window is going away
+        cost = time.perf_counter() - started
+        self.frame_cost_s += (cost - self.frame_cost_s) * 0.1
+        if started - self.cost_shown_at >= 1.0:
+            self.cost_shown_at = started
+            share = self.frame_cost_s * 1000.0 / self.period_ms * 100.0
+            self.gauge.canvas.itemconfigure(self.cost_text, text=f"{self.frame_cost_s * 1000.0:.2f} ms/frame, {share:.1f}% of a core")
+        # Keep the frame rate without drifting: the next frame is due one period after this one started
+        self.root.after(max(1, self.period_ms - int(cost * 1000)), self._refresh)
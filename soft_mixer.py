@@ -0,0 +1,216 @@
+# soft_mixer.py
+# Software mixer with the subset of the pygame.mixer API that AudioManager uses
+# (init/get_init/quit, Channel, Sound, set_num_channels, stop), rendering into NumPy
+# blocks instead of the sound card. Pass the module as AudioManager(mixer_module=...)
+# for offline rendering (latency harness, regression runs) or to feed output sinks.
+#
+# Like SDL_mixer, nothing happens between render() calls: channel state (position,
+# busy, fades) only advances when a block is rendered, so the caller owns the timeline.
+import wave
+
+import numpy as np
+
+
+class error(RuntimeError):
+    pass
+
+
+_settings = None # (frequency, size, channels, buffer)
+_voices = []
+_frames_rendered = 0
+
+
+def init(frequency=44100, size=-16, channels=2, buffer=1024):
+    global _settings, _voices, _frames_rendered
+    if size != -16:
+        raise error(f"soft_mixer only renders signed 16-bit output (size=-16), got {size}")
+    _settings = (frequency, size, channels, buffer)
+    _voices = [_Voice() for _ in range(8)]
+    _frames_rendered = 0
+
+
+def get_init():
+    if _settings is None: return None
+    return _settings[:3]
+
+
+def get_buffer_size():
+    return _settings[3] if _settings else 0
+
+
+def quit():
+    global _settings, _voices
+    _settings = None
+    _voices = []
+
+
+def get_num_channels():
+    return len(_voices)
+
+
+def set_num_channels(count):
+    global _voices
+    if count > len(_voices):
+        _voices = _voices + [_Voice() for _ in range(count - len(_voices))]
+    else:
+        _voices = _voices[:count]
+
+
+def stop():
+    for voice in _voices:
+        voice.stop()
+
+
+def get_frames_rendered():
+    return _frames_rendered
+
+
+class Sound:
+    def __init__(self, file):
+        if _settings is None: raise error("soft_mixer not initialized")
+        frequency, _, channels, _ = _settings
+        try:
+            with wave.open(file, "rb") as wav:
+                if wav.getsampwidth() != 2:
+                    raise error(f"{file}: only 16-bit PCM WAV is supported")
+                source_rate = wav.getframerate()
+                source_channels = wav.getnchannels()
+                raw = wav.readframes(wav.getnframes())
+        except (OSError, wave.Error, EOFError) as e:
+            raise error(f"{file}: {e}")
+        data = np.frombuffer(raw, dtype="<i2").astype(np.float32).reshape(-1, source_channels) / 32768.0
+        self.samples = _convert(data, source_rate, frequency, channels)
+        self.volume = 1.0
+
+    def get_length(self):
+        return len(self.samples) / float(_settings[0]) if _settings else 0.0
+
+    def get_num_frames(self):
+        return len(self.samples)
+
+    def set_volume(self, value):
+        self.volume = min(1.0, max(0.0, float(value)))
+
+    def get_volume(self):
+        return self.volume
+
+
+def _convert(data, source_rate, rate, channels):
+    if data.shape[1] != channels:
+        if channels == 1:
+            data = data.mean(axis=1, keepdims=True)
+        else:
+            data = np.repeat(data[:, :1], channels, axis=1) if data.shape[1] == 1 else data[:, :channels]
+    if source_rate != rate and len(data) > 1:
+        # Linear interpolation is plenty for engine loops; offline packs should be pre-resampled
+        out_frames = int(round(len(data) * rate / float(source_rate)))
+        src_positions = np.arange(out_frames, dtype=np.float64) * (source_rate / float(rate))
+        src_index = np.arange(len(data))
+        data = np.stack([np.interp(src_positions, src_index, data[:, ch]) for ch in range(data.shape[1])], axis=1)
+    return np.ascontiguousarray(data, dtype=np.float32)
+
+
+class _Voice:
+    def __init__(self):
+        self.sound = None
+        self.position = 0
+        self.loops = 0
+        self.volume = 1.0
+        self.last_gain = None
+        self.fade_total = 0 # Frames of an active fadeout, 0 if none
+        self.fade_left = 0
+
+    def stop(self):
+        self.sound = None
+        self.fade_total = self.fade_left = 0
+
+    def render_into(self, out):
+        frames = len(out)
+        sound = self.sound
+        data = sound.samples
+        length = len(data)
+        if length == 0:
+            self.stop(); return
+        # Gather the next `frames` frames, wrapping for loops and zero-padding at the end
+        chunk = np.zeros_like(out)
+        written = 0
+        while written < frames:
+            take = min(frames - written, length - self.position)
+            chunk[written:written + take] = data[self.position:self.position + take]
+            written += take
+            self.position += take
+            if self.position >= length:
+                if self.loops == 0:
+                    self.sound = None
+                    break
+                if self.loops > 0: self.loops -= 1
+                self.position = 0
+
+        # Gains change at block boundaries; ramp across the block so volume steps do not click
+        gain = self.volume * sound.volume
+        start_gain = gain if self.last_gain is None else self.last_gain
+        ramp = np.linspace(start_gain, gain, frames, endpoint=False, dtype=np.float32)
+        self.last_gain = gain
+        if self.fade_total:
+            fade_start = self.fade_left / float(self.fade_total)
+            self.fade_left = max(0, self.fade_left - frames)
+            ramp *= np.linspace(fade_start, self.fade_left / float(self.fade_total), frames, endpoint=False, dtype=np.float32)
+            if self.fade_left == 0: self.sound = None
+        out += chunk * ramp[:, None]
+
+
+class Channel:
+    def __init__(self, id):
+        if id < 0 or id >= len(_voices): raise IndexError(f"soft_mixer: invalid channel {id}")
+        self.id = id
+        self._voice = _voices[id]
+
+    def __eq__(self, other):
+        return isinstance(other, Channel) and other._voice is self._voice
+
+    def __hash__(self):
+        return id(self._voice)
+
+    def play(self, sound, loops=0, maxtime=0, fade_ms=0):
+        voice = self._voice
+        voice.sound = sound
+        voice.position = 0
+        voice.loops = loops
+        voice.last_gain = None
+        voice.fade_total = voice.fade_left = 0
+
+    def stop(self):
+        self._voice.stop()
+
+    def fadeout(self, time):
+        voice = self._voice
+        if voice.sound is None: return
+        frames = int(_settings[0] * time / 1000.0)
+        if frames <= 0:
+            voice.stop(); return
+        voice.fade_total = voice.fade_left = frames
+
+    def set_volume(self, value):
+        self._voice.volume = min(1.0, max(0.0, float(value)))
+
+    def get_volume(self):
+        return self._voice.volume
+
+    def get_busy(self):
+        return self._voice.sound is not None
+
+    def get_sound(self):
+        return self._voice.sound
+
+
+def render(frames):
+    # Mix the next `frames` frames of every busy channel into an int16 (frames, channels) array
+    global _frames_rendered
+    if _settings is None: raise error("soft_mixer not initialized")
+    mix = np.zeros((frames, _settings[2]), dtype=np.float32)
+    for voice in _voices:
+        if voice.sound is not None:
+            voice.render_into(mix)
+    _frames_rendered += frames
+    np.clip(mix, -1.0, 32767.0 / 32768.0, out=mix)
+    return (mix * 32768.0).astype(np.int16)
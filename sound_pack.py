@@ -0,0 +1,107 @@
+# sound_pack.py
+# Engine sound packs (config.SOUND_PACKS) for AudioManager. A SoundPack owns the Sound
+# objects of one vehicle profile; PackLoader builds the next one on a background thread
+# while the current pack keeps playing. The swap itself is AudioManager.swap_sound_pack(),
+# run by EngineSimulator on the sim thread at the next idle moment; the previous pack is
+# released as soon as the channel fading it out has stopped, so its sample memory goes
+# back right then instead of whenever the garbage collector gets to it.
+import os
+import threading
+import time
+
+from ringlog import log
+
+
+class SoundPack:
+    def __init__(self, name, files):
+        self.name = name
+        self.files = files # key -> path, as declared
+        self.sounds = {}
+        self.failed = [] # Keys whose file was missing, empty or unreadable
+        self.load_time_s = 0.0
+        self.bytes = 0 # PCM size at the mixer format (approximate on soft_mixer)
+
+    def load(self, mixer, mixer_error, frame_bytes):
+        load_start_time = time.perf_counter()
+        for key, path in self.files.items():
+            if os.path.exists(path):
+                try:
+                    sound_obj = mixer.Sound(path)
+                    length = sound_obj.get_length()
+                    if length > 0:
+                        self.sounds[key] = sound_obj
+                        self.bytes += int(length * frame_bytes)
+                    else:
+                        log.warning("AUDIO_MAN", "ZERO LENGTH: {} from {}", key, path)
+                        self.failed.append(key)
+                except mixer_error as e:
+                    log.error("AUDIO_MAN", "Could not load sound {} from {}: {}", key, path, e)
+                    self.failed.append(key)
+            else:
+                log.error("AUDIO_MAN", "Sound file NOT FOUND: {} for key: {}", path, key)
+                self.failed.append(key)
+        self.load_time_s = time.perf_counter() - load_start_time
+        return self
+
+    def release(self):
+        # Drops every Sound; only call once no channel plays one of them any more
+        self.sounds.clear()
+        freed, self.bytes = self.bytes, 0
+        return freed
+
+
+class PackLoader:
+    # One background load at a time; a newer request supersedes (and releases) an older one.
+    # request()/cancel()/take() run on the sim or UI thread and _load() on the loader thread,
+    # so generation, requested and loaded only change together under self.lock. Packs are
+    # released outside it: release() only drops references, but nobody should wait on that.
+    def __init__(self, mixer, mixer_error, frame_bytes):
+        self.mixer = mixer
+        self.mixer_error = mixer_error
+        self.frame_bytes = frame_bytes # Bytes per second of audio at the mixer format
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.requested = None # (name, files) of the newest request
+        self.loaded = None # Finished pack, waiting for take()
+
+    def request(self, name, files):
+        with self.lock:
+            if self.requested == (name, files): return
+            self.generation += 1
+            generation = self.generation
+            self.requested = (name, files)
+            stale, self.loaded = self.loaded, None
+        if stale is not None: stale.release()
+        thread = threading.Thread(target=self._load, args=(generation, name, files),
+                                  name="sound-pack-load", daemon=True)
+        thread.start()
+
+    def cancel(self):
+        with self.lock:
+            self.generation += 1
+            self.requested = None
+            stale, self.loaded = self.loaded, None
+        if stale is not None: stale.release()
+
+    def _load(self, generation, name, files):
+        pack = SoundPack(name, files).load(self.mixer, self.mixer_error, self.frame_bytes)
+        with self.lock:
+            current = generation == self.generation
+            # Publishing is checked and done in one step: a request() in between would
+            # otherwise be answered with this (superseded) pack
+            if current: replaced, self.loaded = self.loaded, pack
+        if not current:
+            pack.release() # Superseded while it loaded
+            return
+        if replaced is not None: replaced.release()
+        log.info("AUDIO_MAN", "Sound pack '{}' loaded in the background: {} sounds, {:.1f} MB in {:.2f} s.",
+                 name, len(pack.sounds), pack.bytes / 1e6, pack.load_time_s)
+
+    def take(self):
+        # The finished pack for the newest request, or None while it is still loading
+        with self.lock:
+            pack = self.loaded
+            if pack is None or (pack.name, pack.files) != self.requested: return None
+            self.loaded = None
+            self.requested = None
+        return pack
@@ -0,0 +1,162 @@
+# telemetry.py
+# Shared-memory ring buffer that the simulator writes every tick into, so that
+# external dashboards / loggers can follow the engine without touching the sim loop.
+#
+# Layout (little endian):
+#   header : magic(4s) version(H) slot_size(H) capacity(I) write_count(Q) padding -> HEADER_SIZE bytes
+#   slot[i]: seq(Q) timestamp(d) rpm(f) throttle(f) xfade_progress(f)
+#            state(b) loop_key(b) xfade_to_key(b) sfx_events(B)
+#
+# Every slot is guarded by a sequence number (seqlock): the writer makes it odd
+# before touching the payload and even again afterwards. Readers copy the slot
+# and retry/skip it if the sequence changed under them, so the writer never waits.
+import struct
+import sys
+import time
+from multiprocessing import shared_memory
+
+import config
+from ringlog import log
+
+MAGIC = b"SCTR"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIQ")
+HEADER_SIZE = 32
+WRITE_COUNT_OFFSET = 12
+SLOT = struct.Struct("<QdfffbbbB")
+SEQ = struct.Struct("<Q")
+COUNT = struct.Struct("<Q")
+
+# Index tables for the small integer fields of a slot
+LOOP_KEYS = ("idle", "low_rpm", "mid_rpm", "high_rpm", "cruise")
+LOOP_KEY_INDEX = {key: i for i, key in enumerate(LOOP_KEYS)}
+SFX_EVENTS = ("starter", "shutdown", "accel_burst", "decel_pop")
+SFX_EVENT_BITS = {key: 1 << i for i, key in enumerate(SFX_EVENTS)}
+
+
+class TelemetryWriter:
+    def __init__(self, name=config.TELEMETRY_RING_NAME, capacity=config.TELEMETRY_RING_SLOTS):
+        self.name = name
+        self.capacity = capacity
+        self.write_count = 0
+        size = HEADER_SIZE + SLOT.size * capacity
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Left over from a previous run that did not shut down cleanly
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close(); stale.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.buf = self.shm.buf
+        HEADER.pack_into(self.buf, 0, MAGIC, VERSION, SLOT.size, capacity, 0)
+        log.info("TELEMETRY", "Ring '{}' created ({} slots, {} bytes).", name, capacity, size)
+
+    def publish(self, timestamp, rpm, throttle, state, loop_key, xfade_to_key, xfade_progress, sfx_events):
+        n = self.write_count
+        offset = HEADER_SIZE + (n % self.capacity) * SLOT.size
+        buf = self.buf
+        SLOT.pack_into(buf, offset, 2 * n + 1, timestamp, rpm, throttle, xfade_progress,
+                       state, LOOP_KEY_INDEX.get(loop_key, -1), LOOP_KEY_INDEX.get(xfade_to_key, -1), sfx_events)
+        SEQ.pack_into(buf, offset, 2 * n + 2)
+        self.write_count = n + 1
+        COUNT.pack_into(buf, WRITE_COUNT_OFFSET, n + 1)
+
+    def close(self):
+        if self.shm is None: return
+        self.buf = None
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+        self.shm = None
+        log.info("TELEMETRY", "Ring '{}' closed.", self.name)
+
+
+class TelemetryReader:
+    def __init__(self, name=config.TELEMETRY_RING_NAME):
+        # Attaching registers the segment with this process' resource tracker, which would
+        # unlink it (from under the writer) when the reader exits
+        if sys.version_info >= (3, 13):
+            self.shm = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+        self.buf = self.shm.buf
+        magic, version, slot_size, capacity, write_count = HEADER.unpack_from(self.buf, 0)
+        if magic != MAGIC or version != VERSION or slot_size != SLOT.size:
+            self.shm.close()
+            raise ValueError(f"TELEMETRY: '{name}' is not a compatible telemetry ring.")
+        self.capacity = capacity
+        self.next_index = write_count # Start at the live edge; readers only see new ticks
+        self.dropped = 0
+
+    def read_new(self, max_records=None):
+        records = []
+        write_count = COUNT.unpack_from(self.buf, WRITE_COUNT_OFFSET)[0]
+        if write_count - self.next_index > self.capacity: # Reader fell behind a full lap
+            self.dropped += write_count - self.capacity - self.next_index
+            self.next_index = write_count - self.capacity
+        while self.next_index < write_count:
+            if max_records is not None and len(records) >= max_records: break
+            n = self.next_index
+            offset = HEADER_SIZE + (n % self.capacity) * SLOT.size
+            record = SLOT.unpack_from(self.buf, offset)
+            if record[0] != 2 * n + 2 or SEQ.unpack_from(self.buf, offset)[0] != 2 * n + 2:
+                # Being written right now or already overwritten by a newer lap
+                self.dropped += 1
+            else:
+                records.append(self._decode(record))
+            self.next_index = n + 1
+        return records
+
+    def _decode(self, record):
+        _, timestamp, rpm, throttle, xfade_progress, state, loop_idx, xfade_idx, sfx_events = record
+        return {
+            "timestamp": timestamp,
+            "rpm": rpm,
+            "throttle": throttle,
+            "state": state,
+            "loop_key": LOOP_KEYS[loop_idx] if loop_idx >= 0 else None,
+            "xfade_to_key": LOOP_KEYS[xfade_idx] if xfade_idx >= 0 else None,
+            "xfade_progress": xfade_progress,
+            "sfx_events": [key for key in SFX_EVENTS if sfx_events & SFX_EVENT_BITS[key]],
+        }
+
+    def close(self):
+        if self.shm is None: return
+        self.buf = None
+        self.shm.close()
+        self.shm = None
+
+
+if __name__ == "__main__":
+    # Minimal console consumer: python telemetry.py [ring_name]
+    ring_name = sys.argv[1] if len(sys.argv) > 1 else config.TELEMETRY_RING_NAME
+    reader = None
+    while reader is None:
+        try:
+            reader = TelemetryReader(ring_name)
+        except FileNotFoundError:
+            print(f"TELEMETRY: Waiting for ring '{ring_name}'...")
+            time.sleep(1.0)
+    print(f"TELEMETRY: Attached to '{ring_name}'.")
+    last_print_time = 0
+    try:
+        while True:
+            records = reader.read_new()
+            for record in records:
+                if record["sfx_events"]:
+                    print(f"TELEMETRY: SFX {record['sfx_events']} at RPM {record['rpm']:.0f}")
+            if records and time.time() - last_print_time >= 0.5:
+                last = records[-1]
+                print(f"TELEMETRY: RPM={last['rpm']:.0f} Thr={last['throttle']:.2f} State={last['state']} "
+                      f"Loop={last['loop_key']} XFade->{last['xfade_to_key']} {last['xfade_progress']:.2f} "
+                      f"(dropped {reader.dropped})")
+                last_print_time = time.time()
+            time.sleep(0.05)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reader.close()
@@ -0,0 +1,120 @@
+# throttle_curves.py
+# Throttle response curves declared in THROTTLE_CURVES (config.py / config_cp.py), compiled
+# into fixed-size lookup tables. The tick maps throttle to a 0..1 fraction of the idle-to-max
+# RPM span with one table lookup and a linear interpolation, instead of a pow() call:
+# evaluate() for the desktop's float throttle, evaluate_q() for the device's Q12 integer tick.
+# Shared by both builds; like throttle_input.py it is portable (no config import, the curves
+# and table size are passed in) and is copied to the drive by device_pack.py --stage-code.
+#
+# Kinds:
+#   power        throttle ** exponent (the original response is exponent 0.7)
+#   breakpoints  straight lines through points [(throttle, effect), ...]
+#   spline       smooth monotone curve through points (Fritsch-Carlson cubic Hermite, so a
+#                rising set of points never overshoots or dips between them)
+# Points must start at throttle 0.0, end at 1.0, rise strictly in throttle and keep the
+# effect within 0..1.
+from throttle_input import THROTTLE_BITS, THROTTLE_ONE
+
+
+class ThrottleCurve:
+    def __init__(self, name, table):
+        self.name = name
+        self.table = tuple(table)
+        self.scale = len(self.table) - 1
+        self.last = self.table[-1]
+        self.table_q = tuple(int(v * THROTTLE_ONE + 0.5) for v in self.table)
+        self.last_q = self.table_q[-1]
+
+    def evaluate(self, throttle):
+        # throttle is already clamped to 0..1 by the caller
+        pos = throttle * self.scale
+        i = int(pos)
+        if i >= self.scale: return self.last
+        table = self.table
+        low = table[i]
+        return low + (table[i + 1] - low) * (pos - i)
+
+    def evaluate_q(self, throttle_q):
+        # Q12 throttle (0..THROTTLE_ONE) -> Q12 effect, integer-only
+        pos = throttle_q * self.scale
+        i = pos >> THROTTLE_BITS
+        if i >= self.scale: return self.last_q
+        table = self.table_q
+        low = table[i]
+        return low + (((table[i + 1] - low) * (pos & (THROTTLE_ONE - 1))) >> THROTTLE_BITS)
+
+    def __eq__(self, other):
+        return isinstance(other, ThrottleCurve) and self.table == other.table
+
+    __hash__ = None
+
+
+def _check_points(name, points):
+    points = [(float(x), float(y)) for x, y in points]
+    if len(points) < 2 or points[0][0] != 0.0 or points[-1][0] != 1.0:
+        raise ValueError(f"THROTTLE_CURVES: '{name}' points must start at throttle 0.0 and end at 1.0")
+    for (x0, _), (x1, _) in zip(points, points[1:]):
+        if x1 <= x0:
+            raise ValueError(f"THROTTLE_CURVES: '{name}' throttle values must rise strictly ({x0} then {x1})")
+    if any(not 0.0 <= y <= 1.0 for _, y in points):
+        raise ValueError(f"THROTTLE_CURVES: '{name}' effect values must be within 0..1")
+    return points
+
+
+def _linear(points):
+    def f(x):
+        for (x0, y0), (x1, y1) in zip(points, points[1:]):
+            if x <= x1:
+                return y0 + (y1 - y0) * (x - x0) / (x1 - x0)
+        return points[-1][1]
+    return f
+
+
+def _monotone_spline(points):
+    xs = [x for x, _ in points]
+    ys = [y for _, y in points]
+    n = len(points)
+    h = [xs[i + 1] - xs[i] for i in range(n - 1)]
+    slopes = [(ys[i + 1] - ys[i]) / h[i] for i in range(n - 1)]
+    tangents = [slopes[0]] + [0.0 if slopes[i - 1] * slopes[i] <= 0 else (slopes[i - 1] + slopes[i]) / 2.0
+                              for i in range(1, n - 1)] + [slopes[-1]]
+    for i, slope in enumerate(slopes): # Fritsch-Carlson: limit tangents so each segment stays monotone
+        if slope == 0.0:
+            tangents[i] = tangents[i + 1] = 0.0
+            continue
+        a, b = tangents[i] / slope, tangents[i + 1] / slope
+        if a * a + b * b > 9.0:
+            k = 3.0 / (a * a + b * b) ** 0.5
+            tangents[i], tangents[i + 1] = k * a * slope, k * b * slope
+
+    def f(x):
+        i = 0
+        while i < n - 2 and x > xs[i + 1]: i += 1
+        t = (x - xs[i]) / h[i]
+        t2, t3 = t * t, t * t * t
+        return ((2 * t3 - 3 * t2 + 1) * ys[i] + (t3 - 2 * t2 + t) * h[i] * tangents[i] +
+                (-2 * t3 + 3 * t2) * ys[i + 1] + (t3 - t2) * h[i] * tangents[i + 1])
+    return f
+
+
+def compile_curve(name, spec, size):
+    kind = spec.get("kind")
+    if kind == "power":
+        exponent = spec["exponent"]
+        f = lambda x: pow(x, exponent)
+    elif kind == "breakpoints":
+        f = _linear(_check_points(name, spec["points"]))
+    elif kind == "spline":
+        f = _monotone_spline(_check_points(name, spec["points"]))
+    else:
+        raise ValueError(f"THROTTLE_CURVES: '{name}' has unknown kind '{kind}' (expected power, breakpoints or spline)")
+    if size < 2:
+        raise ValueError(f"THROTTLE_CURVES: table size must be at least 2, got {size}")
+    scale = size - 1
+    return ThrottleCurve(name, [min(1.0, max(0.0, f(i / scale))) for i in range(size)])
+
+
+def compile_profile(curves, profile, size):
+    if profile not in curves:
+        raise ValueError(f"THROTTLE_PROFILE '{profile}' is not in THROTTLE_CURVES (have {sorted(curves)})")
+    return compile_curve(profile, curves[profile], size)
@@ -0,0 +1,188 @@
+# throttle_input.py
+# Throttle input conditioning shared by both builds: the desktop UI runs it on the slider
+# value every sim tick (config.THROTTLE_INPUT_FILTER), the CircuitPython build on the
+# potentiometer in tasks_cp's ADC task (config_cp.THROTTLE_INPUT_FILTER). The module is
+# portable on purpose: no config import, integers only, nothing CPython-specific, so the
+# same file runs on the board (device_pack.py --stage-code copies it to the drive).
+#
+# Values are Q12 throttle (0..THROTTLE_ONE for 0.0..1.0, as in CircuitPy/fixedpoint_cp.py),
+# times are integer ms. A chain is declared as a list of stages, applied in order:
+#   oversample  {"count": n}            average n reads per sample (must come first)
+#   deadband    {"width": w, "snap_low": a, "snap_high": b}
+#                                       hold the output until the input moves more than w
+#                                       from it; below a reads as 0.0, above b as 1.0
+#   hysteresis  {"width": w}            follow moves in the current direction at once, but a
+#                                       reversal only once it exceeds w (kills dither at a
+#                                       band edge or threshold without lagging a ramp)
+#   ema         {"tau_s": t}            exponential smoothing with time constant t
+#   slew        {"rate_per_s": r}       move at most r (full scale per second)
+#   debounce    {"width": w, "hold_s": h}
+#                                       accept a change of more than w only once the input
+#                                       has stayed there for h
+# Widths and points are 0..1 fractions of full scale. Keep EMA and debounce short and the
+# slew rate high where gestures matter: a flick is full scale in about 0.2 s.
+
+THROTTLE_BITS = 12
+THROTTLE_ONE = 1 << THROTTLE_BITS
+TICKS_MAX = (1 << 29) - 1 # dt is taken modulo the ticks_ms wrap, so device ticks can be passed as-is
+EMA_FRACTION_BITS = 8 # Extra state bits so the average settles on the input instead of short of it
+
+
+def _q(fraction):
+    return int(fraction * THROTTLE_ONE + 0.5)
+
+
+def _ms(seconds):
+    return int(seconds * 1000 + 0.5)
+
+
+class Deadband:
+    def __init__(self, width, snap_low=0.0, snap_high=1.0):
+        self.width = _q(width)
+        self.snap_low = _q(snap_low)
+        self.snap_high = _q(snap_high)
+        self.value = 0
+
+    def reset(self, x):
+        self.value = x
+
+    def process(self, x, dt_ms):
+        if x <= self.snap_low: x = 0
+        elif x >= self.snap_high: x = THROTTLE_ONE
+        if x == 0 or x == THROTTLE_ONE or abs(x - self.value) > self.width:
+            self.value = x
+        return self.value
+
+
+class Hysteresis:
+    def __init__(self, width):
+        self.width = _q(width)
+        self.value = 0
+        self.direction = 0
+
+    def reset(self, x):
+        self.value = x
+        self.direction = 0
+
+    def process(self, x, dt_ms):
+        delta = x - self.value
+        if delta == 0: return self.value
+        direction = 1 if delta > 0 else -1
+        if direction == self.direction or abs(delta) > self.width:
+            self.value = x
+            self.direction = direction
+        return self.value
+
+
+class Ema:
+    def __init__(self, tau_s):
+        self.tau_ms = _ms(tau_s)
+        self.state = 0 # Output << EMA_FRACTION_BITS
+
+    def reset(self, x):
+        self.state = x << EMA_FRACTION_BITS
+
+    def process(self, x, dt_ms):
+        target = x << EMA_FRACTION_BITS
+        if self.tau_ms <= 0:
+            self.state = target
+        else:
+            delta = target - self.state
+            step = delta * dt_ms // (self.tau_ms + dt_ms)
+            if step == 0 and delta: step = 1 if delta > 0 else -1
+            self.state += step
+        return (self.state + (1 << (EMA_FRACTION_BITS - 1))) >> EMA_FRACTION_BITS
+
+
+class Slew:
+    def __init__(self, rate_per_s):
+        self.rate = _q(rate_per_s) # Q12 per second
+        self.value = 0
+
+    def reset(self, x):
+        self.value = x
+
+    def process(self, x, dt_ms):
+        max_step = max(1, self.rate * dt_ms // 1000)
+        delta = x - self.value
+        if delta > max_step: delta = max_step
+        elif delta < -max_step: delta = -max_step
+        self.value += delta
+        return self.value
+
+
+class Debounce:
+    def __init__(self, width, hold_s):
+        self.width = _q(width)
+        self.hold_ms = _ms(hold_s)
+        self.value = 0
+        self.pending_ms = 0
+
+    def reset(self, x):
+        self.value = x
+        self.pending_ms = 0
+
+    def process(self, x, dt_ms):
+        if abs(x - self.value) <= self.width:
+            self.pending_ms = 0
+            return self.value
+        self.pending_ms += dt_ms
+        if self.pending_ms >= self.hold_ms:
+            self.value = x
+            self.pending_ms = 0
+        return self.value
+
+
+STAGE_KINDS = {"deadband": Deadband, "hysteresis": Hysteresis, "ema": Ema, "slew": Slew, "debounce": Debounce}
+
+
+class ThrottleFilter:
+    def __init__(self, oversample, stages):
+        self.oversample = oversample
+        self.stages = stages
+        self.last_ms = None
+        self.value = 0
+
+    def sample(self, read, now_ms):
+        # read() returns one raw Q12 reading; returns the conditioned Q12 throttle
+        n = self.oversample
+        if n == 1:
+            x = read()
+        else:
+            total = 0
+            for _ in range(n): total += read()
+            x = (total + n // 2) // n
+        x = max(0, min(THROTTLE_ONE, x))
+        if self.last_ms is None: # First sample seeds every stage, so nothing ramps up from 0
+            for stage in self.stages: stage.reset(x)
+            dt_ms = 0
+        else:
+            dt_ms = (now_ms - self.last_ms) & TICKS_MAX
+        self.last_ms = now_ms
+        for stage in self.stages:
+            x = stage.process(x, dt_ms)
+        self.value = x
+        return x
+
+
+def compile_filter(declaration):
+    # [{"kind": ..., params}, ...] -> ThrottleFilter; raises ValueError on a bad declaration
+    oversample = 1
+    stages = []
+    for i, spec in enumerate(declaration):
+        params = dict(spec)
+        kind = params.pop("kind", None)
+        if kind == "oversample":
+            if i != 0:
+                raise ValueError("THROTTLE_INPUT_FILTER: 'oversample' must be the first stage")
+            oversample = int(params.get("count", 1))
+            if oversample < 1:
+                raise ValueError("THROTTLE_INPUT_FILTER: oversample count must be at least 1")
+            continue
+        if kind not in STAGE_KINDS:
+            raise ValueError(f"THROTTLE_INPUT_FILTER: unknown stage kind '{kind}' (expected oversample, {', '.join(sorted(STAGE_KINDS))})")
+        try:
+            stages.append(STAGE_KINDS[kind](**params))
+        except TypeError as e:
+            raise ValueError(f"THROTTLE_INPUT_FILTER: bad parameters for '{kind}': {e}")
+    return ThrottleFilter(oversample, stages)
@@ -0,0 +1,102 @@
+# tick_trace.py
+# Per-tick trace of the simulator's internal state for debugging odd sound behaviour.
+#
+# Every EngineSimulator.update() packs one fixed-size row into a preallocated ring buffer
+# (the last TRACE_CAPACITY ticks) with a single struct.pack_into, ~0.5 us, so it can stay
+# on. A NumPy structured dtype over the same bytes gives zero-copy columns: dump()
+# snapshots the ring in time order (well under a millisecond) and writes a .npz from a
+# background thread, so dumping (on demand or on an anomaly trigger) never holds up the tick.
+#
+# Load with numpy.load(path): one array per column plus loop_keys / state_names / reason.
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+import config
+from telemetry import LOOP_KEYS, LOOP_KEY_INDEX
+from ringlog import log
+
+STATE_NAMES = ("OFF", "STARTING", "IDLE", "RUNNING", "SHUTTING_DOWN")
+
+# name: struct format / NumPy dtype
+COLUMNS = (
+    ("time", "d"),
+    ("rpm", "f"),
+    ("target_rpm", "f"),
+    ("throttle", "f"),
+    ("state", "b"),
+    ("target_sound_key", "b"), # Index into LOOP_KEYS, -1 for none
+    ("xfade_progress", "f"), # -1 when no crossfade is running
+    ("pop_linger_left_s", "f"),
+    ("burst_effect_left_s", "f"),
+)
+ROW = struct.Struct("<" + "".join(code for _, code in COLUMNS))
+ROW_DTYPE = np.dtype([(name, "<" + code) for name, code in COLUMNS])
+
+
+class TickTrace:
+    def __init__(self, capacity=config.TRACE_CAPACITY, dump_dir=config.TRACE_DUMP_DIR):
+        self.capacity = capacity
+        self.dump_dir = dump_dir
+        self.buffer = bytearray(ROW.size * capacity)
+        self.rows = np.frombuffer(self.buffer, dtype=ROW_DTYPE) # Zero-copy view; rows["rpm"] is a column
+        self._pack_into = ROW.pack_into
+        self._row_size = ROW.size
+        self._end = len(self.buffer)
+        self.offset = 0 # Byte offset of the next row
+        self.wrapped = False
+        self.last_trigger_time = None
+        self.dumps_written = 0
+        self.last_dump_path = None
+
+    def record(self, timestamp, rpm, target_rpm, throttle, state, target_sound_key, xfade_progress,
+               pop_linger_left_s, burst_effect_left_s):
+        offset = self.offset
+        self._pack_into(self.buffer, offset, timestamp, rpm, target_rpm, throttle, state,
+                        LOOP_KEY_INDEX.get(target_sound_key, -1), xfade_progress,
+                        pop_linger_left_s, burst_effect_left_s)
+        offset += self._row_size
+        if offset == self._end:
+            offset = 0
+            self.wrapped = True
+        self.offset = offset
+
+    def __len__(self):
+        return self.capacity if self.wrapped else self.offset // self._row_size
+
+    def snapshot(self):
+        # Oldest row first. Rows written while copying may be torn; fine for a debugging trace
+        start = self.offset // self._row_size
+        rows = np.concatenate((self.rows[start:], self.rows[:start])) if self.wrapped else self.rows[:start].copy()
+        return {name: np.ascontiguousarray(rows[name]) for name, _ in COLUMNS}
+
+    def dump(self, reason="manual", path=None):
+        data = self.snapshot()
+        if path is None:
+            stamp = time.strftime("%Y%m%d_%H%M%S")
+            path = os.path.join(self.dump_dir, f"trace_{stamp}_{self.dumps_written:03d}_{reason}.npz")
+        self.dumps_written += 1
+        self.last_dump_path = path
+        threading.Thread(target=self._write, args=(path, data, reason), name="trace-dump", daemon=True).start()
+        return path
+
+    def _write(self, path, data, reason):
+        try:
+            directory = os.path.dirname(path)
+            if directory: os.makedirs(directory, exist_ok=True)
+            np.savez_compressed(path, loop_keys=np.array(LOOP_KEYS), state_names=np.array(STATE_NAMES),
+                                reason=np.array(reason), **data)
+            log.info("TRACE", "Wrote {} ticks to {} ({})", len(data['time']), path, reason)
+        except OSError as e:
+            log.warning("TRACE", "Could not write {}: {}", path, e)
+
+    def trigger(self, reason, now):
+        # Anomaly hook: dump at most once per TRACE_ANOMALY_COOLDOWN_S
+        if not config.TRACE_DUMP_ON_ANOMALY: return None
+        if self.last_trigger_time is not None and now - self.last_trigger_time < config.TRACE_ANOMALY_COOLDOWN_S:
+            return None
+        self.last_trigger_time = now
+        return self.dump(reason)
@@ -0,0 +1,91 @@
+# voice_pool.py
+# One-shot SFX voice allocation shared by both audio backends: AudioManager hands it the
+# pygame / soft_mixer channels left over after the engine loops, AudioManagerCP the spare
+# audiomixer voice indices. Like engine_core.py it is portable (no config import) and is
+# staged to the drive by device_pack.py --stage-code.
+#
+# Categories are declared as {name: (priority, max_voices)} (config VOICE_CATEGORIES). A
+# play takes a free voice if there is one; otherwise it steals the voice of the lowest
+# priority below its own, the quietest of those, then the oldest. A category already holding
+# max_voices (None: no limit) replaces its own oldest voice instead, so a new starter cuts off
+# a shutdown still ringing. A play with nothing free, lower or own to take is dropped. Plays,
+# drops and steals are counted per category; a steal is counted against the category that
+# lost the voice (replacing its own counts against itself).
+#
+# Voices are opaque to the pool; is_busy(voice) asks the backend whether one still sounds.
+
+
+class VoicePool:
+    def __init__(self, voices, categories, is_busy):
+        self.voices = list(voices)
+        self.categories = categories
+        self.is_busy = is_busy
+        n = len(self.voices)
+        self.owner = [None] * n # Category of each voice's last play; it counts as held while busy
+        self.level = [0.0] * n
+        self.started = [0] * n
+        self.serial = 0 # Play order; "oldest" needs no clock
+        self.plays = {name: 0 for name in categories}
+        self.drops = {name: 0 for name in categories}
+        self.steals = {name: 0 for name in categories}
+
+    def __len__(self):
+        return len(self.voices)
+
+    def _pick(self, category):
+        # Index of the voice a play of category would get, or None
+        priority, max_voices = self.categories[category]
+        free = None
+        victim = None
+        own_oldest = None
+        held = 0
+        for i in range(len(self.voices)):
+            owner = self.owner[i]
+            if owner is None or not self.is_busy(self.voices[i]):
+                if free is None: free = i
+                continue
+            if owner == category:
+                held += 1
+                if own_oldest is None or self.started[i] < self.started[own_oldest]: own_oldest = i
+            owner_priority = self.categories[owner][0]
+            if owner_priority < priority and (victim is None or
+                    (owner_priority, self.level[i], self.started[i]) <
+                    (self.categories[self.owner[victim]][0], self.level[victim], self.started[victim])):
+                victim = i
+        if max_voices is not None and held >= max_voices: return own_oldest
+        return free if free is not None else victim
+
+    def available(self, category):
+        # Whether a play of category would get a voice; nothing is counted
+        return self._pick(category) is not None
+
+    def acquire(self, category, level=1.0):
+        # Returns the voice to play on (already assigned to category), or None when dropped
+        i = self._pick(category)
+        if i is None:
+            self.drops[category] += 1
+            return None
+        if self.owner[i] is not None and self.is_busy(self.voices[i]): self.steals[self.owner[i]] += 1
+        self.owner[i] = category
+        self.level[i] = level
+        self.serial += 1
+        self.started[i] = self.serial
+        self.plays[category] += 1
+        return self.voices[i]
+
+    def holds(self, category):
+        # True while any voice last played for category still sounds
+        for i in range(len(self.voices)):
+            if self.owner[i] == category and self.is_busy(self.voices[i]): return True
+        return False
+
+    def any_busy(self):
+        for voice in self.voices:
+            if self.is_busy(voice): return True
+        return False
+
+    def release_all(self):
+        for i in range(len(self.voices)): self.owner[i] = None
+
+    def stats(self):
+        return {"voices": len(self.voices), "plays": dict(self.plays), "drops": dict(self.drops), "steals": dict(self.steals)}